@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+from src.envs.persecucion_env import PersecucionPygameEnv
+from src.ia.smart_chase_algorithm import AlgoritmoPersecucionInteligente, calcular_acciones_inteligentes
+from src.model.agentes import Jugador, Enemigo
+from src.model.entorno import ObstaculoFuturista
+
+MODOS = ["hibrido", "predictivo", "campo_potencial", "genetico", "flujo", "incremental", "jerarquico",
+         "visibilidad", "cooperativo"]
+# Modos que cargan sus búsquedas a PresupuestoTick (en "hibrido", solo los submodos con búsqueda en grid); en
+# el resto el contador de expansiones no significa nada.
+MODOS_CON_EXPANSIONES = {"hibrido", "predictivo", "flujo", "incremental", "jerarquico", "cooperativo"}
+
+MOVIMIENTOS = [(0, -1), (1, -1), (1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, 0)]
+
+
+def generar_corpus(ancho, alto, num_enemigos, num_mapas, semilla):
+    # Cada escenario sale de `PersecucionPygameEnv.reset` con `random` sembrado, así que el corpus es el mismo
+    # en cada ejecución y usa exactamente la lógica de colocación del entorno.
+    env = PersecucionPygameEnv(ancho, alto, modo_entrenamiento=True, num_enemigos=num_enemigos)
+    corpus = []
+    for k in range(num_mapas):
+        random.seed(semilla + k)
+        env.reset()
+        corpus.append({
+            "jugador": (env.jugador.x, env.jugador.y),
+            "enemigos": [(e.x, e.y) for e in env.enemigos],
+            "obstaculos": [(o.rect.x, o.rect.y, o.rect.width, o.rect.height) for o in env.obstaculos]
+        })
+    env.close()
+    return corpus
+
+
+def _planificar_tick(algoritmo, jugador, enemigos, obstaculos, modo):
+    # Lo mismo que hace PersecucionPygameEnv.step con la IA en el hilo principal.
+    algoritmo.iniciar_tick(jugador, enemigos, obstaculos)
+    acciones = calcular_acciones_inteligentes(enemigos, jugador, obstaculos, algoritmo, modo)
+    algoritmo.presupuesto.finalizar()
+    return acciones
+
+
+def _recorrer_escenario(algoritmo, escenario, modo, ticks, semilla, medir):
+    # Simula `ticks` pasos: el jugador hace un paseo aleatorio sembrado y los enemigos aplican la acción
+    # planificada. `medir(llamada)` envuelve la planificación completa de cada tick.
+    jugador = Jugador(*escenario["jugador"])
+    enemigos = [Enemigo(x, y) for x, y in escenario["enemigos"]]
+    obstaculos = [ObstaculoFuturista(*r) for r in escenario["obstaculos"]]
+
+    algoritmo.actualizar_obstaculos(obstaculos)
+    algoritmo.historial_jugador.clear()
+    for _ in range(3):
+        algoritmo.historial_jugador.append((jugador.x, jugador.y))
+
+    rng = random.Random(semilla)
+    accion_jugador = rng.randrange(8)
+    for tick in range(ticks):
+        if tick % 10 == 0:
+            accion_jugador = rng.randrange(8)
+        jugador.mover(*MOVIMIENTOS[accion_jugador], obstaculos, None, algoritmo.ancho_mapa, algoritmo.alto_mapa)
+
+        acciones = medir(lambda: _planificar_tick(algoritmo, jugador, enemigos, obstaculos, modo))
+        for enemigo, accion in zip(enemigos, acciones):
+            enemigo.mover(*MOVIMIENTOS[accion], obstaculos, enemigos, algoritmo.ancho_mapa, algoritmo.alto_mapa)
+
+
+def medir_modo(modo, ancho, alto, corpus, ticks, cell_size, medir_memoria):
+    tiempos = []
+    expansiones = []
+
+    algoritmo = AlgoritmoPersecucionInteligente(ancho, alto, cell_size)
+    presupuesto = algoritmo.presupuesto
+
+    def cronometrar(llamada):
+        inicio = time.perf_counter()
+        resultado = llamada()
+        tiempos.append((time.perf_counter() - inicio) * 1000.0)
+        # `iniciar_tick` pone el contador a cero, así que al terminar tiene las expansiones del tick.
+        expansiones.append(presupuesto.expansiones)
+        return resultado
+
+    for k, escenario in enumerate(corpus):
+        _recorrer_escenario(algoritmo, escenario, modo, ticks, k, cronometrar)
+
+    cuenta_expansiones = modo in MODOS_CON_EXPANSIONES
+    resultado = {
+        "modo": modo,
+        "ancho": ancho,
+        "alto": alto,
+        "enemigos": len(corpus[0]["enemigos"]) if corpus else 0,
+        # Cada medida es un tick completo: iniciar_tick más las acciones de todos los enemigos.
+        "ticks_medidos": len(tiempos),
+        "media_ms": float(np.mean(tiempos)),
+        "mediana_ms": float(np.percentile(tiempos, 50)),
+        "p95_ms": float(np.percentile(tiempos, 95)),
+        "p99_ms": float(np.percentile(tiempos, 99)),
+        "max_ms": float(np.max(tiempos)),
+        "expansiones_media": float(np.mean(expansiones)) if cuenta_expansiones else None,
+        "expansiones_total": int(np.sum(expansiones)) if cuenta_expansiones else None
+    }
+
+    if medir_memoria:
+        # Pasada aparte: tracemalloc ralentiza mucho y falsearía los tiempos.
+        picos = []
+        retenidos = []
+        algoritmo = AlgoritmoPersecucionInteligente(ancho, alto, cell_size)
+
+        def trazar(llamada):
+            tracemalloc.reset_peak()
+            antes = tracemalloc.get_traced_memory()[0]
+            resultado = llamada()
+            actual, pico = tracemalloc.get_traced_memory()
+            picos.append(pico - antes)
+            retenidos.append(actual - antes)
+            return resultado
+
+        tracemalloc.start()
+        try:
+            for k, escenario in enumerate(corpus):
+                _recorrer_escenario(algoritmo, escenario, modo, ticks, k, trazar)
+        finally:
+            tracemalloc.stop()
+
+        resultado["memoria_pico_mediana_kb"] = float(np.percentile(picos, 50)) / 1024.0
+        resultado["memoria_pico_max_kb"] = float(np.max(picos)) / 1024.0
+        # Memoria que sigue viva tras la llamada (cachés, rutas guardadas), sumada sobre todo el corpus.
+        resultado["memoria_retenida_total_kb"] = float(np.sum(retenidos)) / 1024.0
+
+    return resultado
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _tamano(texto):
+    ancho, alto = texto.lower().split("x")
+    return int(ancho), int(alto)
+
+
+def _clave(resultado):
+    return resultado["modo"], resultado["ancho"], resultado["alto"], resultado["enemigos"]
+
+
+def comparar(resultados, ruta_base):
+    with open(ruta_base, encoding="utf-8") as f:
+        base = {_clave(r): r for r in json.load(f)["resultados"]}
+    print(f"\nComparación con {ruta_base} (actual / base):")
+    for r in resultados:
+        anterior = base.get(_clave(r))
+        if anterior is None:
+            continue
+        print(f"  {r['modo']:<16} {r['ancho']}x{r['alto']} e={r['enemigos']}: "
+              f"mediana x{r['mediana_ms'] / max(anterior['mediana_ms'], 1e-9):.2f}  "
+              f"p95 x{r['p95_ms'] / max(anterior['p95_ms'], 1e-9):.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark de los planificadores de persecución")
+    parser.add_argument("--modos", nargs="+", default=MODOS, choices=MODOS)
+    parser.add_argument("--tamanos", nargs="+", type=_tamano, default=[(600, 400), (1200, 800)],
+                        help="tamaños de mapa como ANCHOxALTO")
+    parser.add_argument("--enemigos", nargs="+", type=int, default=[4, 8])
+    parser.add_argument("--mapas", type=int, default=5, help="escenarios del corpus por configuración")
+    parser.add_argument("--ticks", type=int, default=40, help="pasos simulados por escenario")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--tam-celda", type=int, default=15)
+    parser.add_argument("--sin-memoria", action="store_true", help="omite la pasada con tracemalloc")
+    parser.add_argument("--salida", default="benchmarks/resultados.json")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior con el que comparar")
+    args = parser.parse_args()
+
+    resultados = []
+    for ancho, alto in args.tamanos:
+        for num_enemigos in args.enemigos:
+            try:
+                corpus = generar_corpus(ancho, alto, num_enemigos, args.mapas, args.semilla)
+            except RuntimeError as e:
+                # En mapas pequeños `reset` no siempre consigue separar tantos enemigos.
+                print(f"Se omite {ancho}x{alto} con {num_enemigos} enemigos: {e}")
+                continue
+            for modo in args.modos:
+                r = medir_modo(modo, ancho, alto, corpus, args.ticks, args.tam_celda, not args.sin_memoria)
+                resultados.append(r)
+                memoria = (f"  pico {r['memoria_pico_mediana_kb']:.1f} KB" if "memoria_pico_mediana_kb" in r
+                           else "")
+                exp = "-" if r["expansiones_media"] is None else f"{r['expansiones_media']:.0f}"
+                print(f"{modo:<16} {ancho}x{alto} e={num_enemigos}: mediana {r['mediana_ms']:.3f} ms/tick  "
+                      f"p95 {r['p95_ms']:.3f}  p99 {r['p99_ms']:.3f}  exp {exp}{memoria}")
+
+    informe = {
+        "commit": _commit_actual(),
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "procesador": platform.processor(),
+        "numpy": np.__version__,
+        "parametros": {
+            "tamanos": args.tamanos,
+            "enemigos": args.enemigos,
+            "mapas": args.mapas,
+            "ticks": args.ticks,
+            "semilla": args.semilla,
+            "tam_celda": args.tam_celda
+        },
+        "resultados": resultados
+    }
+    salida = Path(args.salida)
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=2)
+    print(f"\nResultados guardados en {salida}")
+
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
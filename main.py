@@ -1,7 +1,8 @@
 
 from src.utils.modos_juego import jugar_con_modelo_mejorado, entrenar_modelo_mejorado
 
-def main(modo = "jugar", modo_ia = "hibrido", modelo_path = "src/ml_model/best_model.zip", velocidad_juego = 240, timesteps = 300000):
+def main(modo = "jugar", modo_ia = "hibrido", modelo_path = "src/ml_model/best_model.zip", velocidad_juego = 240, timesteps = 300000,
+         entorno_lote = False, num_entornos = 8):
     MODO = modo
     MODO_IA = modo_ia
     MODELO_PATH = modelo_path
@@ -17,7 +18,9 @@ def main(modo = "jugar", modo_ia = "hibrido", modelo_path = "src/ml_model/best_m
                 modelo_path = MODELO_PATH,
                 timesteps = TIMESTEPS,
                 modo_ia = MODO_IA,
-                velocidad_juego = VELOCIDAD_JUEGO
+                velocidad_juego = VELOCIDAD_JUEGO,
+                entorno_lote = entorno_lote,
+                num_entornos = num_entornos
             )
         elif MODO == "jugar":
             jugar_con_modelo_mejorado(
@@ -45,5 +48,7 @@ if __name__ == "__main__":
         - MODELO_PATH: Ruta donde se guardará el modelo entrenado
         - VELOCIDAD_JUEGO: FPS del juego (mayor velocidad = entrenamiento más rápido)
         - TIMESTEPS: Número de pasos de entrenamiento (solo para modo entrenar)
+        - entorno_lote / num_entornos: entrena con el entorno vectorizado en lote (p. ej. 256 partidas);
+          requiere MODO_IA = "flujo"
     """
     main(modo="jugar", modo_ia="hibrido", modelo_path="src/ml_model/best_model", velocidad_juego=240, timesteps=300000)
\ No newline at end of file
@@ -0,0 +1,273 @@
+import math
+
+import numpy as np
+
+# Distancia a la que `dist_norm` satura en 1.
+DISTANCIA_NORMALIZACION = 300.0
+# Sectores angulares del resumen de densidad de los enemigos que no entran entre los k más cercanos.
+SECTORES_DENSIDAD = 8
+# Por debajo de este número de enemigos ordenarlos todos es más barato que argpartition y ordenar los k.
+MAX_ENEMIGOS_ORDEN_COMPLETO = 64
+
+
+class EstadoDerivado:
+    # Magnitudes jugador-enemigo de un tick, calculadas una sola vez y leídas por la observación, la info, la
+    # captura y la recompensa. `forma` es la de las distancias: (enemigos,) para una partida o
+    # (partidas, enemigos) para un lote; todos los arrays se reservan aquí y se reescriben en cada tick.
+
+    def __init__(self, forma, radios):
+        forma = tuple(forma)
+        self.delta = np.zeros(forma + (2,))
+        self.distancias = np.zeros(forma)
+        self.distancias_acotadas = np.ones(forma)
+        self.direcciones = np.zeros(forma + (2,))
+        self.contacto = np.zeros(forma, dtype=bool)
+        self.min_dist = np.full(forma[:-1], np.inf)
+        self._umbral_contacto = radios[1:] + radios[0]
+        # Distancias con infinito en los enemigos muertos.
+        self.distancias_vivos = np.zeros(forma)
+
+        self._dx, self._dy = self.delta[..., 0], self.delta[..., 1]
+        self._acotadas_columna = self.distancias_acotadas[..., None]
+        self._pos = None
+
+    def calcular(self, pos, vivo):
+        # `pos` (... x agentes x 2) con el jugador en el agente 0, `vivo` (... x agentes). Las vistas sobre
+        # `pos` se guardan mientras la simulación no cambie de array.
+        if pos is not self._pos:
+            self._pos = pos
+            self._pos_jugador, self._pos_enemigos = pos[..., :1, :], pos[..., 1:, :]
+        np.subtract(self._pos_jugador, self._pos_enemigos, out=self.delta)
+        np.hypot(self._dx, self._dy, out=self.distancias)
+        np.maximum(self.distancias, 1.0, out=self.distancias_acotadas)
+        np.divide(self.delta, self._acotadas_columna, out=self.direcciones)
+
+        vivos = vivo[..., 1:]
+        np.less(self.distancias, self._umbral_contacto, out=self.contacto)
+        self.contacto &= vivos
+        np.copyto(self.distancias_vivos, np.inf)
+        np.copyto(self.distancias_vivos, self.distancias, where=vivos)
+        self.distancias_vivos.min(axis=-1, out=self.min_dist)
+        return self
+
+
+def dimension_observacion(num_enemigos):
+    return 5 * num_enemigos + 3
+
+
+class ConstructorObservacion:
+    # Escribe el vector de PersecucionPygameEnv (por enemigo su posición normalizada, la dirección hacia el
+    # jugador y la distancia normalizada; después la posición del jugador y el progreso del episodio) en uno
+    # de dos buffers float32 que se alternan: la observación devuelta por un paso sigue intacta durante la
+    # llamada siguiente, como la `terminal_observation` de un reset automático.
+
+    def __init__(self, forma_lote, num_enemigos, ancho, alto):
+        self.num_enemigos = num_enemigos
+        self.escala = np.array([ancho, alto], dtype=np.float64)
+        n = num_enemigos
+        self.dimension = dimension_observacion(n)
+        self.buffers = np.zeros((2,) + tuple(forma_lote) + (self.dimension,), dtype=np.float32)
+        self._vistas = []
+        for buffer in self.buffers:
+            por_enemigo = buffer[..., :5 * n].reshape(buffer.shape[:-1] + (n, 5))
+            self._vistas.append((buffer, por_enemigo[..., :2], por_enemigo[..., 2:4], por_enemigo[..., 4],
+                                 buffer[..., 5 * n:5 * n + 2], buffer[..., -1]))
+        self.actual = 0
+
+    def escribir(self, pos, estado, progreso, mismo_buffer=False):
+        # Con `mismo_buffer` se reescribe el último buffer devuelto en vez de pasar al otro.
+        if not mismo_buffer:
+            self.actual ^= 1
+        salida, posiciones, direcciones, distancias, jugador, ultimo = self._vistas[self.actual]
+        np.divide(pos[..., 1:, :], self.escala, out=posiciones)
+        np.copyto(direcciones, estado.direcciones, casting="same_kind")
+        np.divide(estado.distancias_acotadas, DISTANCIA_NORMALIZACION, out=distancias)
+        np.minimum(distancias, 1.0, out=distancias)
+        np.divide(pos[..., 0, :], self.escala, out=jugador)
+        ultimo[...] = progreso
+        return salida
+
+
+class ConstructorObservacionCercanos:
+    # Observación de tamaño fijo con solo los `k` enemigos vivos más cercanos, del más cercano al más lejano
+    # y con los mismos cinco valores por enemigo que ConstructorObservacion. Los huecos sin enemigo llevan
+    # posición y dirección 0 y distancia 1. Después van la posición del jugador, el progreso y la fracción
+    # de huecos ocupados; con `resumen_densidad`, además, la proporción de enemigos que quedan fuera y cómo
+    # se reparten por sectores angulares alrededor del jugador.
+
+    def __init__(self, forma_lote, k, ancho, alto, resumen_densidad=False):
+        if k <= 0:
+            raise ValueError(f"k_enemigos_obs debe ser positivo (recibido {k})")
+        self.k = k
+        self.resumen_densidad = resumen_densidad
+        self.escala = np.array([ancho, alto], dtype=np.float64)
+        self.dimension = 5 * k + 4 + (1 + SECTORES_DENSIDAD if resumen_densidad else 0)
+        self.buffers = np.zeros((2,) + tuple(forma_lote) + (self.dimension,), dtype=np.float32)
+        self.actual = 0
+
+        # Todo se calcula sobre (partidas x ...) aplanando las dimensiones de lote.
+        lote = int(np.prod(forma_lote, dtype=np.intp))
+        self._filas = np.arange(lote)[:, None]
+        self._vistas = [buffer.reshape(lote, self.dimension) for buffer in self.buffers]
+        self._relleno = np.array([0.0, 0.0, 0.0, 0.0, 1.0])
+        self._tabla = None
+        self._resto = None
+        self._desplazamiento_sectores = self._filas * SECTORES_DENSIDAD
+
+    def escribir(self, pos, estado, progreso, mismo_buffer=False):
+        if not mismo_buffer:
+            self.actual ^= 1
+        salida = self._vistas[self.actual]
+        k = self.k
+        lote = len(salida)
+        filas = self._filas
+        n = estado.distancias.shape[-1]
+        distancias = estado.distancias_vivos.reshape(lote, n)
+
+        # Los cinco valores de cada enemigo en una tabla (partidas x enemigos x 5), de la que se copian los k.
+        if self._tabla is None or self._tabla.shape[1] != n:
+            self._tabla = np.empty((lote, n, 5))
+            self._resto = np.empty((lote, n), dtype=bool)
+            self._sectores = np.empty((lote, n), dtype=np.intp)
+        tabla = self._tabla
+        np.divide(pos[..., 1:, :].reshape(lote, n, 2), self.escala, out=tabla[..., :2])
+        tabla[..., 2:4] = estado.direcciones.reshape(lote, n, 2)
+        np.divide(estado.distancias_acotadas.reshape(lote, n), DISTANCIA_NORMALIZACION, out=tabla[..., 4])
+        np.minimum(tabla[..., 4], 1.0, out=tabla[..., 4])
+
+        # Con muchos enemigos, argpartition deja los k menores delante sin ordenar el resto y solo se
+        # ordenan esos k.
+        if k < n and n > MAX_ENEMIGOS_ORDEN_COMPLETO:
+            cercanos = np.argpartition(distancias, k - 1, axis=1)[:, :k]
+            cercanos = cercanos[filas, np.argsort(distancias[filas, cercanos], axis=1)]
+        else:
+            cercanos = np.argsort(distancias, axis=1)[:, :k]
+        presentes = np.isfinite(distancias[filas, cercanos])
+        m = cercanos.shape[1]
+
+        por_enemigo = salida[:, :5 * k].reshape(lote, k, 5)
+        por_enemigo[:, :m] = tabla[filas, cercanos]
+        np.copyto(por_enemigo[:, :m], self._relleno, where=~presentes[..., None], casting="same_kind")
+        por_enemigo[:, m:] = self._relleno
+
+        base = 5 * k
+        np.divide(pos[..., 0, :].reshape(lote, 2), self.escala, out=salida[:, base:base + 2])
+        salida[:, base + 2] = progreso
+        np.divide(presentes.sum(axis=1), k, out=salida[:, base + 3])
+
+        if self.resumen_densidad:
+            resto = self._resto
+            np.isfinite(distancias, out=resto)
+            resto[filas, cercanos] = False
+            num_resto = resto.sum(axis=1)
+            salida[:, base + 4] = num_resto / (num_resto + k)
+            # Las direcciones guardadas apuntan del enemigo al jugador, así que el sector del ángulo
+            # jugador -> enemigo medido desde -pi coincide con el del ángulo guardado medido desde 0.
+            sectores = self._sectores
+            np.floor_divide(np.arctan2(tabla[..., 3], tabla[..., 2]), 2 * math.pi / SECTORES_DENSIDAD,
+                            out=sectores, casting="unsafe")
+            sectores %= SECTORES_DENSIDAD
+            sectores += self._desplazamiento_sectores
+            por_sector = np.bincount(sectores.ravel(), weights=resto.ravel(), minlength=lote * SECTORES_DENSIDAD)
+            np.divide(por_sector.reshape(lote, SECTORES_DENSIDAD), np.maximum(num_resto, 1)[:, None],
+                      out=salida[:, base + 5:])
+        return self.buffers[self.actual]
+
+
+def crear_constructor_observacion(forma_lote, num_enemigos, ancho, alto, k_enemigos=None, resumen_densidad=False):
+    # Sin `k_enemigos` la observación codifica a todos los enemigos y su tamaño depende de `num_enemigos`.
+    if k_enemigos is None:
+        return ConstructorObservacion(forma_lote, num_enemigos, ancho, alto)
+    return ConstructorObservacionCercanos(forma_lote, k_enemigos, ancho, alto, resumen_densidad)
+
+
+class ConstructorRaster:
+    # Ventana egocéntrica de (2 * radio + 1) celdas del grid de planificación centrada en la celda del jugador,
+    # con un canal por capa: obstáculos (inflados como en GridOcupacion, y el exterior del mapa como
+    # obstáculo), enemigos vivos y power-ups. Se escribe como imagen uint8 0/255 con los canales delante,
+    # el formato que esperan las políticas CNN de stable-baselines3 (NatureCNN necesita radio 18 o más; con
+    # ventanas menores hace falta un extractor propio). Nada se renderiza: los obstáculos se recortan de una
+    # copia con borde del grid y enemigos y power-ups se dispersan por índice.
+
+    CANALES = 3
+
+    def __init__(self, forma_lote, radio, rows, cols, tam_celda):
+        self.radio = radio
+        self.lado = 2 * radio + 1
+        self.rows, self.cols = rows, cols
+        self.tam_celda = tam_celda
+        lote = int(np.prod(forma_lote, dtype=np.intp))
+        self.lote = lote
+        self.buffers = np.zeros((2,) + tuple(forma_lote) + (self.CANALES, self.lado, self.lado), dtype=np.uint8)
+        self._vistas = [buffer.reshape(lote, self.CANALES, self.lado, self.lado) for buffer in self.buffers]
+        self.actual = 0
+
+        # Grid de cada partida con `radio` celdas de borde bloqueado; la ventana de la celda (i, j) empieza en
+        # (i, j) de esta copia, así que se lee con un único `take` de índices planos.
+        alto, ancho = rows + 2 * radio, cols + 2 * radio
+        self._obstaculos = np.full((lote, alto, ancho), 255, dtype=np.uint8)
+        desplazamientos = np.arange(self.lado)
+        self._ventana = desplazamientos[:, None] * ancho + desplazamientos[None, :]
+        self._inicio_partida = np.arange(lote) * (alto * ancho)
+        self._ancho_relleno = ancho
+        self._indices_ventana = np.empty((lote, self.lado, self.lado), dtype=np.intp)
+        self._inicios = np.empty(lote, dtype=np.intp)
+        # Celdas (col, fila) de los agentes y de la ventana; las posiciones nunca son negativas, así que basta
+        # con acotar por arriba la del jugador.
+        self._celdas = np.empty((lote, 0, 2), dtype=np.intp)
+        self._origen = np.empty((lote, 1, 2), dtype=np.intp)
+        self._max_celda = np.array([cols - 1, rows - 1])
+        # Índice plano del comienzo de cada canal de cada partida dentro del buffer de salida.
+        area = self.lado * self.lado
+        self._inicio_canal = [(np.arange(lote) * (self.CANALES * area) + c * area)[:, None]
+                              for c in range(self.CANALES)]
+
+    def cargar_obstaculos(self, celdas, partidas=slice(None)):
+        # `celdas` (rows x cols) de una partida o (partidas x rows x cols), distinto de cero donde hay obstáculo.
+        r = self.radio
+        self._obstaculos[partidas, r:r + self.rows, r:r + self.cols] = np.where(celdas, 255, 0)
+
+    def escribir(self, pos, vivo, pos_powerups=None, mismo_buffer=False):
+        # `pos` (... x agentes x 2) con el jugador en el agente 0, `vivo` (... x agentes) y, si los hay,
+        # `pos_powerups` (... x powerups x 2).
+        if not mismo_buffer:
+            self.actual ^= 1
+        salida = self._vistas[self.actual]
+        lote = self.lote
+        pos = pos.reshape(lote, -1, 2)
+        if self._celdas.shape != pos.shape:
+            self._celdas = np.empty(pos.shape, dtype=np.intp)
+        celdas, origen = self._celdas, self._origen
+        np.floor_divide(pos, self.tam_celda, out=celdas, casting="unsafe")
+        np.minimum(celdas[:, :1], self._max_celda, out=origen)
+
+        np.multiply(origen[:, 0, 1], self._ancho_relleno, out=self._inicios)
+        self._inicios += origen[:, 0, 0]
+        self._inicios += self._inicio_partida
+        np.add(self._inicios[:, None, None], self._ventana, out=self._indices_ventana)
+        np.take(self._obstaculos, self._indices_ventana, out=salida[:, 0], mode="clip")
+
+        self._dispersar(salida, 1, celdas[:, 1:], origen, vivo.reshape(lote, -1)[:, 1:])
+        if pos_powerups is not None and np.size(pos_powerups):
+            celdas_powerups = np.floor_divide(np.reshape(pos_powerups, (lote, -1, 2)), self.tam_celda)
+            celdas_powerups = celdas_powerups.astype(np.intp)
+            self._dispersar(salida, 2, celdas_powerups, origen)
+        else:
+            salida[:, 2] = 0
+        return self.buffers[self.actual]
+
+    def _dispersar(self, salida, canal, celdas, origen, validos=None):
+        # Marca en el canal `canal` de `salida` (lote x canales x lado x lado) las celdas (lote x k x 2, en
+        # (col, fila)) que caen en la ventana. Vistas como enteros sin signo, las posiciones relativas
+        # negativas quedan enormes y bastan una comparación y un máximo para descartar las de fuera.
+        salida[:, canal] = 0
+        relativas = celdas - origen
+        relativas += self.radio
+        sin_signo = relativas.view(np.uintp)
+        dentro = np.maximum(sin_signo[..., 0], sin_signo[..., 1]) < self.lado
+        if validos is not None:
+            dentro &= validos
+        planos = relativas[..., 1] * self.lado
+        planos += relativas[..., 0]
+        planos += self._inicio_canal[canal]
+        salida.reshape(-1)[planos[dentro]] = 255
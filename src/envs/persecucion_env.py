@@ -11,21 +11,37 @@ import sys
 sys.path.append("src")
 
 from src.utils.mapa_utils import GeneradorDeMapas
-from src.ia.smart_chase_algorithm import AlgoritmoPersecucionInteligente, calcular_accion_inteligente
+from src.ia.smart_chase_algorithm import AlgoritmoPersecucionInteligente, calcular_acciones_inteligentes
+from src.ia.programador_replanes import ProgramadorReplanes
+from src.ia.planificacion_asincrona import PlanificadorAsincrono
+from src.ia.campo_flujo import ACCION_QUIETO
 from src.model.agentes import Jugador, Enemigo
 from src.model.entorno import ObstaculoFuturista, PowerUpSalud
+from src.model.proyectil import Proyectil
+from src.model.simulacion import SimulacionPersecucion
+from src.envs.observaciones import EstadoDerivado, ConstructorRaster, crear_constructor_observacion
 from src.utils.visual_effects import VisualEffects
 from src.utils.pantallas import pantalla_bienvenida, pantalla_game_over
+from src.utils.banco_escenarios import BancoEscenarios
 
 generador_mapa = GeneradorDeMapas()
 
+MOVIMIENTOS = np.array([
+    (0, -1), (1, -1), (1, 0), (1, 1),
+    (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, 0)
+])
+
 
 class PersecucionPygameEnv(gym.Env):
 
     metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 60}
 
     def __init__(self, ancho_pantalla=600, alto_pantalla=400, render_mode=None,
-                 modo_entrenamiento=False, modo_ia="hibrido", velocidad_juego=60, num_enemigos=4):
+                 modo_entrenamiento=False, modo_ia="hibrido", velocidad_juego=60, num_enemigos=4,
+                 backend_busqueda="a_star", presupuesto_ia_ms=None, presupuesto_ia_expansiones=None,
+                 replanes_por_tick=None, edad_maxima_plan=20, trabajadores_ia=None, max_retraso_ia=2,
+                 trabajadores_en_procesos=True, usar_landmarks=False, tam_celda=15, k_enemigos_obs=None,
+                 resumen_densidad=False, radio_raster=None, banco_escenarios=None):
 
         super().__init__()
         self.ancho_pantalla = ancho_pantalla
@@ -41,12 +57,28 @@ class PersecucionPygameEnv(gym.Env):
         self.puntos = 0
 
 
+        # Con `k_enemigos_obs` la observación solo incluye a los k enemigos vivos más cercanos y su tamaño no
+        # depende de `num_enemigos`, así que un modelo entrenado sirve para enjambres de otro tamaño.
+        self._constructor_obs = crear_constructor_observacion((), num_enemigos, ancho_pantalla, alto_pantalla,
+                                                              k_enemigos_obs, resumen_densidad)
         self.observation_space = spaces.Box(
             low=-1.0,
             high=1.0,
-            shape=(5 * self.num_enemigos + 3,),
+            shape=(self._constructor_obs.dimension,),
             dtype=np.float32
         )
+        # Con `radio_raster` la observación es un Dict con el vector anterior y una ventana del grid de
+        # planificación alrededor del jugador (obstáculos, enemigos y power-ups).
+        self._raster = None
+        self._version_raster = -1
+        if radio_raster is not None:
+            self._raster = ConstructorRaster((), radio_raster, alto_pantalla // tam_celda, ancho_pantalla // tam_celda,
+                                             tam_celda)
+            lado = self._raster.lado
+            self.observation_space = spaces.Dict({
+                "vector": self.observation_space,
+                "raster": spaces.Box(low=0, high=255, shape=(ConstructorRaster.CANALES, lado, lado), dtype=np.uint8)
+            })
 
         self.tiempo_ultimo_mapa = [time.time()]
         self.INTERVALO_MAPA = 15
@@ -65,61 +97,140 @@ class PersecucionPygameEnv(gym.Env):
         self.enemigos = []
         self.obstaculos = []
         self.distancia_anterior = None
+        self._mascara_acciones = np.ones(self.action_space.n, dtype=bool)
         self.pasos = 0
         self.max_pasos = 1500 if self.modo_entrenamiento else float("inf")
         self.score = 0
         self.capturas = 0
 
-        self.algoritmo_ia = AlgoritmoPersecucionInteligente(ancho_pantalla, alto_pantalla)
+        # El presupuesto de la IA se reparte entre todos los enemigos de cada paso.
+        self.algoritmo_ia = AlgoritmoPersecucionInteligente(ancho_pantalla, alto_pantalla, tam_celda,
+                                                            backend_busqueda=backend_busqueda,
+                                                            presupuesto_ms=presupuesto_ia_ms,
+                                                            presupuesto_expansiones=presupuesto_ia_expansiones,
+                                                            usar_landmarks=usar_landmarks)
         self.usar_ia_inteligente = True
+        # Con `replanes_por_tick` los enemigos siguen su ruta y solo unos pocos replanifican en cada paso.
+        self.programador_replanes = None
+        if replanes_por_tick is not None:
+            self.programador_replanes = ProgramadorReplanes(self.algoritmo_ia, replanes_por_tick, edad_maxima_plan)
+        # Con `trabajadores_ia` la planificación sale del hilo principal y cada enemigo aplica la última acción
+        # terminada, con un retraso máximo de `max_retraso_ia` ticks.
+        self.planificador_asincrono = None
+        if trabajadores_ia:
+            self.planificador_asincrono = PlanificadorAsincrono(self.algoritmo_ia, trabajadores_ia, max_retraso_ia,
+                                                                trabajadores_en_procesos)
+
+        # Con `banco_escenarios` (ruta o BancoEscenarios) `reset` toma un escenario ya generado, con su grid de
+        # ocupación, en vez de colocar agentes y obstáculos por muestreo con rechazo.
+        self.banco_escenarios = banco_escenarios
+        if banco_escenarios is not None:
+            if not isinstance(banco_escenarios, BancoEscenarios):
+                self.banco_escenarios = BancoEscenarios(banco_escenarios)
+            self.banco_escenarios.comprobar(ancho_pantalla, alto_pantalla, num_enemigos, tam_celda,
+                                            self.algoritmo_ia.grid_ocupacion.margen_inflacion)
 
         self.tiempo_captura_promedio = []
         self.efectividad_ia = 0.0
 
-    def _get_obs(self):
-
-        player_x_norm = self.jugador.x / self.ancho_pantalla
-        player_y_norm = self.jugador.y / self.alto_pantalla
-
-        obs_list = []
-
-        for enemigo in self.enemigos:
-            ex_norm = enemigo.x / self.ancho_pantalla
-            ey_norm = enemigo.y / self.alto_pantalla
-
-            dx = self.jugador.x - enemigo.x
-            dy = self.jugador.y - enemigo.y
-            dist = max(math.hypot(dx, dy), 1.0)
-
-            dir_x = dx / dist
-            dir_y = dy / dist
+        # Estado de la partida en arrays; `jugador` y `enemigos` son vistas que se refrescan en cada paso para
+        # la IA y el renderizado.
+        self.simulacion = SimulacionPersecucion(ancho_pantalla, alto_pantalla, velocidad_juego)
+        self._obstaculos_simulacion = None
+        self._vistas_proyectiles = {}
+        # Distancias y direcciones jugador-enemigo del tick, compartidas por observación, info, captura y
+        # recompensa; la observación se escribe en buffers reservados una sola vez.
+        self._estado = None
 
-            dist_norm = min(dist / 300.0, 1.0)
-
-            obs_list.extend([ex_norm, ey_norm, dir_x, dir_y, dist_norm])
-
-        prog = self.pasos / self.max_pasos
-        obs_list.extend([player_x_norm, player_y_norm, prog])
+    def _get_obs(self):
 
-        return np.array(obs_list, dtype=np.float32)
+        vector = self._constructor_obs.escribir(self.simulacion.pos, self._estado, self.pasos / self.max_pasos)
+        if self._raster is None:
+            return vector
+
+        grid = self.algoritmo_ia.grid_ocupacion
+        celdas = grid.sincronizar(self.obstaculos)
+        if grid.version != self._version_raster:
+            self._raster.cargar_obstaculos(celdas)
+            self._version_raster = grid.version
+        pos_powerups = [(p.x, p.y) for p in self.powerups_salud if p.activo] or None
+        raster = self._raster.escribir(self.simulacion.pos, self.simulacion.vivo, pos_powerups)
+        return {"vector": vector, "raster": raster}
+
+    def _actualizar_estado(self):
+        simulacion = self.simulacion
+        if self._estado is None or self._estado.distancias.shape != (simulacion.num_enemigos,):
+            self._estado = EstadoDerivado((simulacion.num_enemigos,), simulacion.radio)
+        return self._estado.calcular(simulacion.pos, simulacion.vivo)
 
     def _get_info(self):
 
-        distancias = [
-            math.hypot(e.x - self.jugador.x, e.y - self.jugador.y)
-            for e in self.enemigos
-        ]
+        self._mascara_acciones = self._calcular_mascara_acciones()
         return {
-            "distancias": distancias,
+            "distancias": self._estado.distancias.tolist(),
+            "mascara_acciones": self._mascara_acciones,
             "pasos": self.pasos,
             "capturas": self.capturas,
             "efectividad_ia": self.efectividad_ia,
-            "modo_ia": self.modo_ia
+            "modo_ia": self.modo_ia,
+            "presupuesto_ia": self.algoritmo_ia.presupuesto.informe(),
+            "replanes_ia": (self.programador_replanes.replanes_tick
+                            if self.programador_replanes is not None else None)
         }
 
+    def _calcular_mascara_acciones(self):
+        # La acción mueve a los enemigos vivos (sin IA, o si la IA falla), no al jugador. Una acción es válida
+        # si mueve al menos a uno: `mover` rechaza sin avisar las que chocan con un obstáculo o con otro
+        # enemigo y el borde del mapa anula las que empujan contra él. Quedarse quieto siempre es válido.
+        simulacion = self.simulacion
+        indices_vivos = np.flatnonzero(simulacion.vivo[1:]) + 1
+        mascara = simulacion.acciones_validas(indices_vivos, MOVIMIENTOS, indices_vivos).any(axis=0)
+        mascara[ACCION_QUIETO] = True
+        return mascara
+
+    def action_masks(self):
+        # Interfaz que usan los entrenadores con máscara de acciones (p. ej. MaskablePPO de sb3-contrib).
+        return self._mascara_acciones
+
     def reset(self, seed=None):
 
         super().reset(seed=seed)
+        if self.banco_escenarios is not None:
+            celdas = self._cargar_escenario_banco()
+        else:
+            self._generar_escenario()
+            celdas = None
+
+        self.simulacion.cargar((self.jugador.x, self.jugador.y), [(e.x, e.y) for e in self.enemigos],
+                               self.obstaculos)
+        self._obstaculos_simulacion = self.obstaculos
+        self._vistas_proyectiles = {}
+        self.jugador.proyectiles = []
+        self._actualizar_estado()
+
+        if celdas is None:
+            self.algoritmo_ia.actualizar_obstaculos(self.obstaculos)
+        else:
+            self.algoritmo_ia.grid_ocupacion.cargar(celdas, self.obstaculos)
+
+        self.distancia_anterior = None
+        self.pasos = 0
+        self.juego_terminado = False
+        self.victoria = False
+        self.puntos = 0
+
+        self.algoritmo_ia.historial_jugador.clear()
+        for _ in range(3):
+            self.algoritmo_ia.historial_jugador.append((self.jugador.x, self.jugador.y))
+
+        observation = self._get_obs()
+        info = self._get_info()
+        if self.render_mode == "human":
+            self._render_frame()
+        return observation, info
+
+    def _generar_escenario(self):
+        # Colocación por muestreo con rechazo del jugador, los enemigos y los obstáculos.
         intentos = 0
         jugador_valido = False
 
@@ -245,21 +356,14 @@ class PersecucionPygameEnv(gym.Env):
 
             intentos_obs += 1
 
-        self.distancia_anterior = None
-        self.pasos = 0
-        self.juego_terminado = False
-        self.victoria = False
-        self.puntos = 0
-
-        self.algoritmo_ia.historial_jugador.clear()
-        for _ in range(3):
-            self.algoritmo_ia.historial_jugador.append((self.jugador.x, self.jugador.y))
-
-        observation = self._get_obs()
-        info = self._get_info()
-        if self.render_mode == "human":
-            self._render_frame()
-        return observation, info
+    def _cargar_escenario_banco(self):
+        banco = self.banco_escenarios
+        registro = banco.registros[self.np_random.integers(len(banco))]
+        self.jugador = Jugador(*registro["jugador"].tolist())
+        self.enemigos = [Enemigo(x, y) for x, y in registro["enemigos"].tolist()]
+        self.obstaculos = [ObstaculoFuturista(*rect)
+                           for rect in registro["obstaculos"][:registro["num_obstaculos"]].tolist()]
+        return banco.grid(registro)
 
     def step(self, action):
 
@@ -267,72 +371,66 @@ class PersecucionPygameEnv(gym.Env):
             return self._get_obs(), 0, True, False, self._get_info()
 
         self.pasos += 1
+        simulacion = self.simulacion
+        simulacion.avanzar_reloj()
+        if self.obstaculos is not self._obstaculos_simulacion:
+            simulacion.cargar_obstaculos(self.obstaculos)
+            self._obstaculos_simulacion = self.obstaculos
 
         if not self.modo_entrenamiento:
-            self.jugador.actualizar_proyectiles(self.ancho_pantalla, self.alto_pantalla, self.obstaculos)
-
-            for proyectil in self.jugador.proyectiles[:]:
-                for enemigo in self.enemigos[:]:
-                    if not enemigo.esta_vivo:
-                        continue
-                    if proyectil.colisiona_con(enemigo):
-                        proyectil.activo = False
-                        if proyectil in self.jugador.proyectiles:
-                            self.jugador.proyectiles.remove(proyectil)
-
-                        murio = enemigo.recibir_dano(20)
-                        if murio:
-                            enemigo.esta_vivo = False
-                            self.puntos += 100
-                        else:
-                            self.puntos += 10
-                        break
+            for _, murio in simulacion.actualizar_proyectiles():
+                self.puntos += 100 if murio else 10
+            self._sincronizar_proyectiles()
+            self._sincronizar_agentes()
 
         acciones_enemigos = []
-        enemigos_vivos = [e for e in self.enemigos if e.esta_vivo]
+        indices_vivos = np.flatnonzero(simulacion.vivo[1:]) + 1
+        enemigos_vivos = [self.enemigos[i - 1] for i in indices_vivos]
 
         if self.usar_ia_inteligente:
-            for enemigo in enemigos_vivos:
-                try:
-                    accion_ia = calcular_accion_inteligente(
-                        enemigo, self.jugador, self.obstaculos,
+            self.algoritmo_ia.iniciar_tick(self.jugador, enemigos_vivos, self.obstaculos)
+            try:
+                if self.planificador_asincrono is not None:
+                    acciones_enemigos = self.planificador_asincrono.calcular_acciones(
+                        enemigos_vivos, self.jugador, self.obstaculos, self.modo_ia
+                    )
+                elif self.programador_replanes is not None:
+                    acciones_enemigos = self.programador_replanes.calcular_acciones(
+                        enemigos_vivos, self.jugador, self.obstaculos, self.modo_ia
+                    )
+                else:
+                    acciones_enemigos = calcular_acciones_inteligentes(
+                        enemigos_vivos, self.jugador, self.obstaculos,
                         self.algoritmo_ia, self.modo_ia
                     )
-                except Exception as e:
-                    print(f"Error en IA inteligente: {e}")
-                    accion_ia = action
-                acciones_enemigos.append(accion_ia)
+            except Exception as e:
+                print(f"Error en IA inteligente: {e}")
+                acciones_enemigos = [action] * len(enemigos_vivos)
+            self.algoritmo_ia.presupuesto.finalizar()
         else:
             acciones_enemigos = [action] * len(enemigos_vivos)
 
-        movimientos_enemigo = [
-            (0, -1), (1, -1), (1, 0), (1, 1),
-            (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, 0)
-        ]
-
-        for idx, enemigo in enumerate(enemigos_vivos):
-            if idx < len(acciones_enemigos):
-                act = acciones_enemigos[idx]
-                dx, dy = movimientos_enemigo[act]
-                enemigo.mover(dx, dy, self.obstaculos, enemigos_vivos)
+        # Todos los enemigos vivos se mueven a la vez; los que no tienen acción no se mueven.
+        con_accion = indices_vivos[:len(acciones_enemigos)]
+        if len(con_accion):
+            desplazamientos = MOVIMIENTOS[np.asarray(acciones_enemigos[:len(con_accion)], dtype=np.intp)]
+            movidos = simulacion.mover(con_accion, desplazamientos, indices_vivos)
+            self._sincronizar_agentes(con_accion[movidos])
 
         if self.modo_entrenamiento:
             terminado = False
             recompensa = 0
+            estado = self._actualizar_estado()
 
-            for enemigo in enemigos_vivos:
-                distancia = math.hypot(enemigo.x - self.jugador.x, enemigo.y - self.jugador.y)
-                if distancia < (enemigo.radio + self.jugador.radio):
-                    terminado = True
-                    self.capturas += 1
-                    self.tiempo_captura_promedio.append(self.pasos)
-                    recompensa += 300
-                    break
+            if estado.contacto.any():
+                terminado = True
+                self.capturas += 1
+                self.tiempo_captura_promedio.append(self.pasos)
+                recompensa += 300
 
 
             if not terminado:
-                min_dist = min(math.hypot(e.x - self.jugador.x, e.y - self.jugador.y)
-                               for e in enemigos_vivos) if enemigos_vivos else float('inf')
+                min_dist = float(estado.min_dist)
 
                 if self.distancia_anterior is not None and enemigos_vivos:
                     dif_dist = self.distancia_anterior - min_dist
@@ -345,21 +443,28 @@ class PersecucionPygameEnv(gym.Env):
             truncado = self.pasos >= self.max_pasos
 
         else:
-            self.jugador.manejar_input(self.obstaculos)
-
-            for enemigo in enemigos_vivos:
-                distancia = math.hypot(enemigo.x - self.jugador.x, enemigo.y - self.jugador.y)
-                if distancia < (enemigo.radio + self.jugador.radio):
-                    murio_jugador = self.jugador.recibir_dano(enemigo.dano_contacto)
-                    if murio_jugador:
-                        if self.puntos >= 50:
-                            self.puntos -= 10
-                        self.juego_terminado = True
-                        self.victoria = False
-                        break
-                    elif murio_jugador == False:
-                        if self.puntos >= 50:
-                            self.puntos -= 10
+            dx, dy, objetivo = self.jugador.leer_input()
+            if objetivo is not None:
+                hueco = simulacion.disparar(*objetivo)
+                if hueco is not None:
+                    self._vistas_proyectiles[hueco] = Proyectil(self.jugador.x, self.jugador.y, *objetivo)
+                    self.jugador.proyectiles = list(self._vistas_proyectiles.values())
+            simulacion.velocidad[0] = self.jugador.velocidad
+            movido = simulacion.mover([0], [(dx, dy)])
+            self._sincronizar_agentes([0] if movido[0] else ())
+
+            for indice in np.flatnonzero(self._actualizar_estado().contacto) + 1:
+                murio_jugador = simulacion.aplicar_dano(0, self.enemigos[indice - 1].dano_contacto)
+                if murio_jugador:
+                    if self.puntos >= 50:
+                        self.puntos -= 10
+                    self.juego_terminado = True
+                    self.victoria = False
+                    break
+                elif murio_jugador == False:
+                    if self.puntos >= 50:
+                        self.puntos -= 10
+            self._sincronizar_agentes()
 
 
             if not enemigos_vivos and not self.juego_terminado:
@@ -401,6 +506,7 @@ class PersecucionPygameEnv(gym.Env):
             distancia = math.hypot(powerup.x - self.jugador.x, powerup.y - self.jugador.y)
             if distancia < (self.jugador.radio + powerup.radio):
                 self.jugador.vida_actual = min(self.jugador.vida_maxima, self.jugador.vida_actual + 15)
+                self.simulacion.vida[0] = self.jugador.vida_actual
                 self.powerups_salud.remove(powerup)
 
         if time.time() - self.tiempo_ultimo_mapa[0] > self.INTERVALO_MAPA and not hasattr(self,
@@ -409,6 +515,8 @@ class PersecucionPygameEnv(gym.Env):
 
             def set_mapa(nuevo_mapa):
                 if nuevo_mapa:
+                    # Se asigna una lista nueva: el grid de ocupación de la IA detecta el cambio y se
+                    # reconstruye en el hilo principal la próxima vez que se planifique.
                     self.obstaculos = generador_mapa.filtrar_obstaculos_sin_colision(nuevo_mapa,
                                                                                      [self.jugador] + self.enemigos)
                 if hasattr(self, "actualizando_mapa"):
@@ -419,6 +527,35 @@ class PersecucionPygameEnv(gym.Env):
 
         return observation, recompensa, terminado, truncado, info
 
+    def _sincronizar_agentes(self, movidos=()):
+        # Copia el estado de la simulación a las vistas de jugador y enemigos. Los efectos visuales (estela,
+        # destello de daño) solo se actualizan cuando se renderiza.
+        simulacion = self.simulacion
+        agentes = [self.jugador] + self.enemigos
+        for agente, (x, y), vida, vivo in zip(agentes, simulacion.pos.tolist(), simulacion.vida.tolist(),
+                                              simulacion.vivo.tolist()):
+            agente.x = x
+            agente.y = y
+            agente.vida_actual = vida
+            agente.esta_vivo = vivo
+
+        if self.render_mode == "human":
+            for indice in movidos:
+                agentes[indice].update_effects()
+            for indice in np.flatnonzero(simulacion.tiempo_dano == simulacion.tiempo_ms):
+                agentes[indice].tiempo_dano = pygame.time.get_ticks()
+
+    def _sincronizar_proyectiles(self):
+        simulacion = self.simulacion
+        for hueco, proyectil in list(self._vistas_proyectiles.items()):
+            if not simulacion.proy_activo[hueco]:
+                proyectil.activo = False
+                del self._vistas_proyectiles[hueco]
+                continue
+            proyectil.x, proyectil.y = simulacion.proy_pos[hueco].tolist()
+            proyectil.actualizar_estela()
+        self.jugador.proyectiles = list(self._vistas_proyectiles.values())
+
     def _calcular_recompensa_mejorada(self, accion):
 
         distancia_actual = min(
@@ -659,7 +796,8 @@ class PersecucionPygameEnv(gym.Env):
         self.pantalla.blit(minimap_label, (self.ancho_pantalla - 65, minimap_rect.bottom + 5))
 
     def cambiar_modo_ia(self, nuevo_modo):
-        modos_validos = ["hibrido", "predictivo", "campo_potencial", "genetico"]
+        modos_validos = ["hibrido", "predictivo", "campo_potencial", "genetico", "flujo", "incremental",
+                         "jerarquico", "visibilidad", "cooperativo"]
         if nuevo_modo in modos_validos:
             self.modo_ia = nuevo_modo
             print(f"Modo IA cambiado a: {nuevo_modo}")
@@ -671,6 +809,9 @@ class PersecucionPygameEnv(gym.Env):
         return self._render_frame()
 
     def close(self):
+        if self.planificador_asincrono is not None:
+            self.planificador_asincrono.cerrar()
+            self.planificador_asincrono = None
         if self.pantalla is not None:
             pygame.display.quit()
             pygame.quit()
\ No newline at end of file
@@ -0,0 +1,342 @@
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env import VecEnv
+
+from src.ia.campo_flujo import MOVIMIENTOS, ACCION_QUIETO
+from src.envs.observaciones import EstadoDerivado, ConstructorRaster, crear_constructor_observacion
+from src.model.simulacion import SimulacionLote
+from src.utils.banco_escenarios import BancoEscenarios, MAX_OBSTACULOS
+
+DESPLAZAMIENTOS = np.array(MOVIMIENTOS, dtype=np.float64)
+# Vecinos del campo de flujo en el orden de las acciones: (di, dj) en el grid y coste del paso.
+_DI = np.array([dy for dx, dy in MOVIMIENTOS[:ACCION_QUIETO]])
+_DJ = np.array([dx for dx, dy in MOVIMIENTOS[:ACCION_QUIETO]])
+_COSTES = np.where((_DI != 0) & (_DJ != 0), 1.414, 1.0)
+
+INTENTOS_POR_RONDA = 50
+
+
+class PersecucionVecEnv(VecEnv):
+    # `num_entornos` partidas de entrenamiento en arrays apilados: movimiento, IA de los enemigos, capturas,
+    # recompensas, observaciones y reinicios se calculan para todas a la vez. Reproduce el modo de
+    # entrenamiento de PersecucionPygameEnv; la IA de los enemigos es el campo de flujo ("flujo"), con un
+    # Dijkstra por partida resuelto en lote por relajación sobre todos los grids apilados.
+
+    def __init__(self, num_entornos=8, ancho_pantalla=600, alto_pantalla=400, num_enemigos=4, max_pasos=1500,
+                 tam_celda=15, margen_inflacion=15, semilla=None, k_enemigos_obs=None, resumen_densidad=False,
+                 radio_raster=None, banco_escenarios=None):
+        self.ancho_pantalla = ancho_pantalla
+        self.alto_pantalla = alto_pantalla
+        self.num_enemigos = num_enemigos
+        self.max_pasos = max_pasos
+        self.render_mode = None
+
+        self._constructor_obs = crear_constructor_observacion((num_entornos,), num_enemigos, ancho_pantalla,
+                                                              alto_pantalla, k_enemigos_obs, resumen_densidad)
+        observation_space = spaces.Box(low=-1.0, high=1.0, shape=(self._constructor_obs.dimension,),
+                                       dtype=np.float32)
+        # Con `radio_raster`, observación Dict con la ventana del grid alrededor de cada jugador, como en
+        # PersecucionPygameEnv (aquí no hay power-ups y su canal queda vacío).
+        self._raster = None
+        if radio_raster is not None:
+            self._raster = ConstructorRaster((num_entornos,), radio_raster, alto_pantalla // tam_celda,
+                                             ancho_pantalla // tam_celda, tam_celda)
+            lado = self._raster.lado
+            observation_space = spaces.Dict({
+                "vector": observation_space,
+                "raster": spaces.Box(low=0, high=255, shape=(ConstructorRaster.CANALES, lado, lado), dtype=np.uint8)
+            })
+        super().__init__(num_entornos, observation_space, spaces.Discrete(9))
+
+        self.rng = np.random.default_rng(semilla)
+        # Como en PersecucionPygameEnv: con un banco, los reinicios toman escenarios ya generados.
+        self.banco_escenarios = banco_escenarios
+        if banco_escenarios is not None:
+            if not isinstance(banco_escenarios, BancoEscenarios):
+                self.banco_escenarios = BancoEscenarios(banco_escenarios)
+            self.banco_escenarios.comprobar(ancho_pantalla, alto_pantalla, num_enemigos, tam_celda, margen_inflacion)
+        self.simulacion = SimulacionLote(num_entornos, ancho_pantalla, alto_pantalla, num_enemigos, MAX_OBSTACULOS)
+
+        self.tam_celda = tam_celda
+        self.margen_inflacion = margen_inflacion
+        self.rows = alto_pantalla // tam_celda
+        self.cols = ancho_pantalla // tam_celda
+        self.centros_x = np.arange(self.cols) * tam_celda + tam_celda // 2
+        self.centros_y = np.arange(self.rows) * tam_celda + tam_celda // 2
+        # Grids con un borde bloqueado de una celda y la distancia de cada celda al jugador, por partida.
+        self._libres = np.zeros((num_entornos, self.rows + 2, self.cols + 2), dtype=bool)
+        self._distancias = np.full((num_entornos, self.rows + 2, self.cols + 2), np.inf)
+        self._metas = np.full((num_entornos, 2), -1, dtype=np.intp)
+
+        self.pasos = np.zeros(num_entornos, dtype=np.int64)
+        # NaN equivale al `None` de la versión por objetos: aún no hay distancia anterior.
+        self.distancia_anterior = np.full(num_entornos, np.nan)
+        self.capturas = np.zeros(num_entornos, dtype=np.int64)
+        self._acciones = None
+        self._mascaras_acciones = np.ones((num_entornos, 9), dtype=bool)
+
+        # Estado derivado del tick, reservado una sola vez como en PersecucionPygameEnv.
+        self._estado = EstadoDerivado((num_entornos, num_enemigos), self.simulacion.radio)
+        self._vivos = np.ones((num_entornos, 1 + num_enemigos), dtype=bool)
+        self._progreso = np.zeros(num_entornos)
+
+    def reset(self):
+        self._reiniciar(np.arange(self.num_envs))
+        self._calcular_mascaras_acciones()
+        return self._observaciones()
+
+    def step_async(self, actions):
+        # Como en PersecucionPygameEnv en modo entrenamiento, el jugador no se mueve con la acción; allí
+        # solo sustituye a la IA si esta falla, y la IA en lote no tiene ese caso.
+        self._acciones = np.asarray(actions)
+
+    def step_wait(self):
+        simulacion = self.simulacion
+        self.pasos += 1
+
+        acciones_enemigos = self._acciones_enemigos()
+        simulacion.mover_enemigos(DESPLAZAMIENTOS[acciones_enemigos])
+
+        estado = self._estado.calcular(simulacion.pos, self._vivos)
+        capturado = estado.contacto.any(axis=1)
+        min_dist = estado.min_dist
+
+        factor_dist = 1.0 + (200 - np.minimum(min_dist, 200)) / 200
+        progreso = np.nan_to_num((self.distancia_anterior - min_dist) * factor_dist * 3.0)
+        recompensas = np.where(capturado, 300.0, progreso - 0.01).astype(np.float32)
+        self.distancia_anterior = np.where(capturado, self.distancia_anterior, min_dist)
+        self.capturas += capturado
+
+        truncado = self.pasos >= self.max_pasos
+        terminados = capturado | truncado
+        observaciones = self._observaciones(calcular_estado=False)
+
+        infos = [{"pasos": int(p), "capturas": int(c)} for p, c in zip(self.pasos, self.capturas)]
+        finalizadas = np.flatnonzero(terminados)
+        if len(finalizadas):
+            for k in finalizadas:
+                infos[k]["terminal_observation"] = (
+                    observaciones[k].copy() if self._raster is None
+                    else {clave: valor[k].copy() for clave, valor in observaciones.items()})
+                infos[k]["TimeLimit.truncated"] = bool(truncado[k] and not capturado[k])
+            self._reiniciar(finalizadas)
+            observaciones = self._observaciones(mismo_buffer=True)
+
+        mascaras = self._calcular_mascaras_acciones()
+        for info, mascara in zip(infos, mascaras):
+            info["mascara_acciones"] = mascara
+        return observaciones, recompensas, terminados, infos
+
+    def _calcular_mascaras_acciones(self):
+        # Como PersecucionPygameEnv.action_masks (acciones que mueven a algún enemigo), para todas las partidas.
+        self._mascaras_acciones = self.simulacion.acciones_validas_enemigos(DESPLAZAMIENTOS).any(axis=1)
+        self._mascaras_acciones[:, ACCION_QUIETO] = True
+        return self._mascaras_acciones
+
+    def action_masks(self):
+        return self._mascaras_acciones
+
+    def _observaciones(self, calcular_estado=True, mismo_buffer=False):
+        # Mismo vector que PersecucionPygameEnv._get_obs, para todas las partidas.
+        pos = self.simulacion.pos
+        if calcular_estado:
+            self._estado.calcular(pos, self._vivos)
+        np.divide(self.pasos, self.max_pasos, out=self._progreso)
+        vector = self._constructor_obs.escribir(pos, self._estado, self._progreso, mismo_buffer)
+        if self._raster is None:
+            return vector
+        return {"vector": vector, "raster": self._raster.escribir(pos, self._vivos, mismo_buffer=mismo_buffer)}
+
+    def _acciones_enemigos(self):
+        simulacion = self.simulacion
+        celda_jugador = np.stack((simulacion.pos[:, 0, 1] // self.tam_celda,
+                                  simulacion.pos[:, 0, 0] // self.tam_celda), axis=1).astype(np.intp)
+        cambiadas = np.flatnonzero((celda_jugador != self._metas).any(axis=1))
+        if len(cambiadas):
+            self._calcular_campos(cambiadas, celda_jugador[cambiadas])
+
+        pos = simulacion.pos[:, 1:]
+        i = np.clip((pos[..., 1] // self.tam_celda).astype(np.intp), 0, self.rows - 1)
+        j = np.clip((pos[..., 0] // self.tam_celda).astype(np.intp), 0, self.cols - 1)
+        partidas = np.arange(self.num_envs)[:, None, None]
+        candidatos = self._distancias[partidas, i[..., None] + 1 + _DI, j[..., None] + 1 + _DJ] + _COSTES
+
+        acciones = np.argmin(candidatos, axis=2)
+        sin_ruta = np.isinf(candidatos.min(axis=2))
+        en_meta = (i == self._metas[:, :1]) & (j == self._metas[:, 1:])
+        acciones[sin_ruta | en_meta] = ACCION_QUIETO
+        return acciones
+
+    def _calcular_campos(self, partidas, metas):
+        # Distancias al jugador en el grid de cada partida. Bellman-Ford por barridos sobre todas las partidas
+        # a la vez; converge al mismo resultado que el Dijkstra de CampoFlujo.
+        k = len(partidas)
+        rows, cols = self.rows, self.cols
+        libres = self._libres[partidas]
+        distancias = np.full((k, rows + 2, cols + 2), np.inf)
+        validas = ((metas[:, 0] >= 0) & (metas[:, 0] < rows) & (metas[:, 1] >= 0) & (metas[:, 1] < cols))
+        filas = np.flatnonzero(validas)
+        filas = filas[libres[filas, metas[filas, 0] + 1, metas[filas, 1] + 1]]
+        distancias[filas, metas[filas, 0] + 1, metas[filas, 1] + 1] = 0.0
+
+        interior = distancias[:, 1:-1, 1:-1]
+        libres_interior = libres[:, 1:-1, 1:-1]
+        while True:
+            previo = distancias.copy()
+            for di, dj, coste in zip(_DI, _DJ, _COSTES):
+                vecinos = distancias[:, 1 + di:1 + di + rows, 1 + dj:1 + dj + cols]
+                np.minimum(interior, vecinos + coste, out=interior, where=libres_interior)
+            if np.array_equal(distancias, previo):
+                break
+
+        self._distancias[partidas] = distancias
+        self._metas[partidas] = metas
+
+    def _reiniciar(self, partidas):
+        if self.banco_escenarios is not None:
+            banco = self.banco_escenarios
+            registros = banco.registros[np.sort(self.rng.integers(len(banco), size=len(partidas)))]
+            jugador, enemigos = registros["jugador"], registros["enemigos"]
+            rects = registros["obstaculos"].astype(np.int64)
+            num_obstaculos = registros["num_obstaculos"].astype(np.intp)
+            self._libres[partidas, 1:-1, 1:-1] = banco.grid(registros) == 0
+        else:
+            jugador, enemigos = self._colocar_agentes(len(partidas))
+            rects, num_obstaculos = self._colocar_obstaculos(jugador, enemigos)
+            self._libres[partidas] = self._rejilla_libre(rects, num_obstaculos)
+        pos = np.concatenate((jugador[:, None], enemigos), axis=1).astype(np.float64)
+        self.simulacion.cargar(partidas, pos, rects, num_obstaculos)
+        if self._raster is not None:
+            self._raster.cargar_obstaculos(~self._libres[partidas, 1:-1, 1:-1], partidas)
+        self._metas[partidas] = -1
+
+        self.pasos[partidas] = 0
+        self.distancia_anterior[partidas] = np.nan
+
+    def _colocar_agentes(self, k):
+        # Misma regla que PersecucionPygameEnv.reset, probando muchos intentos de golpe: el jugador no toca a
+        # ningún enemigo, los enemigos están a 80 o más entre sí y a más de 150 del jugador.
+        ancho, alto, n = self.ancho_pantalla, self.alto_pantalla, self.num_enemigos
+        jugador = np.zeros((k, 2), dtype=np.int64)
+        enemigos = np.zeros((k, n, 2), dtype=np.int64)
+        pendientes = np.arange(k)
+        triangulo = np.triu(np.ones((n, n), dtype=bool), 1)
+
+        for _ in range(-(-200 // INTENTOS_POR_RONDA)):
+            forma = (len(pendientes), INTENTOS_POR_RONDA)
+            pj = np.stack((self.rng.integers(50, ancho - 50, forma, endpoint=True),
+                           self.rng.integers(50, alto - 50, forma, endpoint=True)), axis=-1)
+            pe = np.stack((self.rng.integers(50, ancho - 50, forma + (n,), endpoint=True),
+                           self.rng.integers(50, alto - 50, forma + (n,), endpoint=True)), axis=-1)
+
+            toca_jugador = ((pe - 12 < pj[:, :, None] + 10) & (pj[:, :, None] - 10 < pe + 12)).all(axis=3).any(axis=2)
+            entre = pe[:, :, :, None] - pe[:, :, None, :]
+            juntos = ((np.hypot(entre[..., 0], entre[..., 1]) < 80) & triangulo).any(axis=(2, 3))
+            hasta_jugador = pe - pj[:, :, None]
+            cerca = (np.hypot(hasta_jugador[..., 0], hasta_jugador[..., 1]) <= 150).any(axis=2)
+
+            valido = ~(toca_jugador | juntos | cerca)
+            resueltas = valido.any(axis=1)
+            primero = valido.argmax(axis=1)[resueltas]
+            jugador[pendientes[resueltas]] = pj[resueltas, primero]
+            enemigos[pendientes[resueltas]] = pe[resueltas, primero]
+            pendientes = pendientes[~resueltas]
+            if not len(pendientes):
+                return jugador, enemigos
+
+        raise RuntimeError("No se encontraron posiciones válidas para jugador y enemigos tras 200 intentos")
+
+    def _colocar_obstaculos(self, jugador, enemigos):
+        # Obstáculo central si no pisa a nadie y de 2 a 4 más, con las mismas zonas prohibidas que el entorno.
+        ancho, alto = self.ancho_pantalla, self.alto_pantalla
+        k = len(jugador)
+        rect_jugador = np.concatenate((jugador - 10, np.full((k, 2), 20)), axis=1)
+        rects_enemigos = np.concatenate((enemigos - 12, np.full(enemigos.shape, 24)), axis=2)
+
+        def choca(rects, otros):
+            # rects (k x c x 4) contra otros (k x o x 4): ¿toca cada rect a alguno de los otros?
+            a, b = rects[:, :, None], otros[:, None]
+            return ((a[..., 0] < b[..., 0] + b[..., 2]) & (b[..., 0] < a[..., 0] + a[..., 2])
+                    & (a[..., 1] < b[..., 1] + b[..., 3]) & (b[..., 1] < a[..., 1] + a[..., 3])).any(axis=2)
+
+        agentes = np.concatenate((rect_jugador[:, None], rects_enemigos), axis=1)
+        rects = np.zeros((k, MAX_OBSTACULOS, 4), dtype=np.int64)
+        central = np.array([ancho // 2 - 40, alto // 2 - 60, 80, 120])
+        con_central = ~choca(np.broadcast_to(central, (k, 1, 4)), agentes)[:, 0]
+        rects[con_central, 0] = central
+        cuenta = con_central.astype(np.intp)
+        objetivo = cuenta + self.rng.integers(2, 4, k, endpoint=True)
+
+        intentos = 100
+        candidatos = np.stack((self.rng.integers(50, ancho - 100, (k, intentos), endpoint=True),
+                               self.rng.integers(50, alto - 80, (k, intentos), endpoint=True),
+                               self.rng.integers(30, 60, (k, intentos), endpoint=True),
+                               self.rng.integers(30, 60, (k, intentos), endpoint=True)), axis=-1)
+        zonas = np.array([[ancho // 4 - 30, alto // 2 - 30, 60, 60],
+                          [3 * ancho // 4 - 30, alto // 2 - 30, 60, 60]])
+        centros = candidatos[..., :2] + candidatos[..., 2:] // 2
+        hasta_agentes = centros[:, :, None] - np.concatenate((jugador[:, None], enemigos), axis=1)[:, None]
+        prohibido = (choca(candidatos, np.broadcast_to(zonas, (k, 2, 4))) | choca(candidatos, agentes)
+                     | (np.hypot(hasta_agentes[..., 0], hasta_agentes[..., 1]) < 30).any(axis=2))
+
+        # Los huecos libres de `rects` se mueven fuera del mapa para que no cuenten como solapamiento.
+        fuera = np.array([-10 ** 6, -10 ** 6, 1, 1])
+        filas = np.arange(k)
+        ocupados = np.arange(MAX_OBSTACULOS)[None, :]
+        for t in range(intentos):
+            candidato = candidatos[:, t]
+            existentes = np.where((ocupados < cuenta[:, None])[..., None], rects, fuera)
+            solapa = choca(candidato[:, None], existentes)[:, 0]
+            acepta = ~prohibido[:, t] & ~solapa & (cuenta < objetivo)
+            rects[filas[acepta], cuenta[acepta]] = candidato[acepta]
+            cuenta += acepta
+            if (cuenta >= objetivo).all():
+                break
+        return rects, cuenta
+
+    def _rejilla_libre(self, rects, num_obstaculos):
+        # Misma regla que GridOcupacion.reconstruir: celda bloqueada si su centro cae en el obstáculo inflado.
+        margen = self.margen_inflacion
+        izquierda = rects[..., 0] - margen
+        arriba = rects[..., 1] - margen
+        derecha = izquierda + rects[..., 2] + 2 * margen
+        abajo = arriba + rects[..., 3] + 2 * margen
+        activos = np.arange(rects.shape[1])[None, :] < num_obstaculos[:, None]
+
+        en_columnas = (self.centros_x >= izquierda[..., None]) & (self.centros_x < derecha[..., None])
+        en_filas = (self.centros_y >= arriba[..., None]) & (self.centros_y < abajo[..., None])
+        bloqueadas = (en_filas[:, :, :, None] & en_columnas[:, :, None, :] & activos[..., None, None]).any(axis=1)
+
+        libres = np.zeros((len(rects), self.rows + 2, self.cols + 2), dtype=bool)
+        libres[:, 1:-1, 1:-1] = ~bloqueadas
+        return libres
+
+    def seed(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+        return [seed] * self.num_envs
+
+    def close(self):
+        pass
+
+    def _indices(self, indices):
+        if indices is None:
+            return range(self.num_envs)
+        if isinstance(indices, int):
+            return [indices]
+        return indices
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name) for _ in self._indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        resultado = getattr(self, method_name)(*method_args, **method_kwargs)
+        if method_name == "action_masks":
+            # Es el único método con un resultado distinto por partida (sb3-contrib lo pide con env_method).
+            return [resultado[i] for i in self._indices(indices)]
+        return [resultado for _ in self._indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._indices(indices)]
@@ -0,0 +1,87 @@
+from collections import OrderedDict
+
+
+class CacheRutas:
+    # Caché LRU de rutas A* indexada por (inicio, meta, versión del grid). Además de los aciertos exactos,
+    # un enemigo situado sobre una ruta ya calculada hacia la misma meta reutiliza el tramo restante.
+
+    def __init__(self, capacidad=256):
+        self.capacidad = capacidad
+        self.version = None
+        self._rutas = OrderedDict()
+        # Por meta: celda -> clave de una ruta guardada que pasa por esa celda.
+        self._por_meta = {}
+
+        self.aciertos = 0
+        self.aciertos_sufijo = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def buscar(self, inicio, meta, version):
+        self._comprobar_version(version)
+        clave = (inicio, meta, version)
+        ruta = self._rutas.get(clave)
+        if ruta is not None:
+            self._rutas.move_to_end(clave)
+            self.aciertos += 1
+            return ruta
+
+        clave = self._por_meta.get(meta, {}).get(inicio)
+        if clave is not None:
+            self._rutas.move_to_end(clave)
+            ruta = self._rutas[clave]
+            self.aciertos_sufijo += 1
+            return ruta[ruta.index(inicio):]
+
+        self.fallos += 1
+        return None
+
+    def guardar(self, inicio, meta, version, ruta):
+        self._comprobar_version(version)
+        clave = (inicio, meta, version)
+        if clave in self._rutas:
+            self._rutas.move_to_end(clave)
+            return
+        if len(self._rutas) >= self.capacidad:
+            self._desalojar()
+
+        ruta = tuple(ruta)
+        self._rutas[clave] = ruta
+        # Solo se indexan rutas que terminan en la meta; una ruta vacía (sin camino) solo acierta exacta.
+        if ruta and ruta[-1] == meta:
+            indice = self._por_meta.setdefault(meta, {})
+            for celda in ruta[:-1]:
+                indice[celda] = clave
+
+    def estadisticas(self):
+        return {
+            "capacidad": self.capacidad,
+            "entradas": len(self._rutas),
+            "aciertos": self.aciertos,
+            "aciertos_sufijo": self.aciertos_sufijo,
+            "fallos": self.fallos,
+            "desalojos": self.desalojos
+        }
+
+    def limpiar(self):
+        self._rutas.clear()
+        self._por_meta.clear()
+
+    def _comprobar_version(self, version):
+        # Las rutas de otra versión del grid ya no pueden acertar, así que se descartan de golpe.
+        if version != self.version:
+            self.limpiar()
+            self.version = version
+
+    def _desalojar(self):
+        clave, ruta = self._rutas.popitem(last=False)
+        self.desalojos += 1
+        meta = clave[1]
+        indice = self._por_meta.get(meta)
+        if indice is None:
+            return
+        for celda in ruta:
+            if indice.get(celda) == clave:
+                del indice[celda]
+        if not indice:
+            del self._por_meta[meta]
@@ -0,0 +1,128 @@
+import heapq
+import math
+import sys
+import time
+
+import numpy as np
+
+# Mismo orden que la lista de movimientos del entorno: la posición en la lista es la acción (dx, dy).
+MOVIMIENTOS = [
+    (0, -1), (1, -1), (1, 0), (1, 1),
+    (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, 0)
+]
+ACCION_QUIETO = 8
+# Cada cuántas expansiones se consulta el reloj cuando la búsqueda tiene límite de tiempo.
+INTERVALO_RELOJ = 128
+
+
+def _iniciar_dijkstra(grid, origen):
+    # Distancias (lista plana con borde) y montículo iniciales de un Dijkstra desde `origen`.
+    libres = grid.libres_con_borde()
+    distancias = [math.inf] * len(libres)
+    heap = []
+    if 0 <= origen[0] < grid.rows and 0 <= origen[1] < grid.cols:
+        inicio = grid.indice_borde(origen[0], origen[1])
+        if libres[inicio]:
+            distancias[inicio] = 0.0
+            heap.append((0.0, inicio))
+    return distancias, heap
+
+
+def _expandir(grid, distancias, heap, max_expansiones=None, limite_tiempo=None):
+    # Avanza el Dijkstra (costes 1 y 1.414) hasta vaciar el montículo o agotar los límites; se puede retomar
+    # con las mismas listas. Devuelve (celdas expandidas, truncado).
+    libres = grid.libres_con_borde()
+    cols_borde = grid.cols_borde
+    vecinos = [(dy * cols_borde + dx, 1.414 if dx != 0 and dy != 0 else 1.0)
+               for dx, dy in MOVIMIENTOS[:ACCION_QUIETO]]
+    limite = sys.maxsize if max_expansiones is None else max_expansiones
+    expansiones = 0
+
+    # El borde bloqueado evita comprobar límites en cada vecino.
+    while heap:
+        if expansiones >= limite or (limite_tiempo is not None and expansiones % INTERVALO_RELOJ == 0
+                                     and expansiones and time.perf_counter() >= limite_tiempo):
+            return expansiones, True
+        dist, actual = heapq.heappop(heap)
+        if dist > distancias[actual]:
+            continue
+        expansiones += 1
+        for desplazamiento, coste in vecinos:
+            vecino = actual + desplazamiento
+            if libres[vecino]:
+                nueva = dist + coste
+                if nueva < distancias[vecino]:
+                    distancias[vecino] = nueva
+                    heapq.heappush(heap, (nueva, vecino))
+    return expansiones, False
+
+
+def distancias_con_borde(grid, origen):
+    # Dijkstra completo desde `origen` sobre el grid con borde; devuelve el array con borde.
+    # Como los costes son simétricos, sirve igual como distancia hacia `origen` que desde él.
+    distancias, heap = _iniciar_dijkstra(grid, origen)
+    _expandir(grid, distancias, heap)
+    return np.array(distancias).reshape(grid.rows + 2, grid.cols_borde)
+
+
+class CampoFlujo:
+    def __init__(self, grid_ocupacion):
+        self.grid_ocupacion = grid_ocupacion
+        self.meta = None
+        self.version_grid = -1
+        self.distancias = None
+        self.acciones = None
+        # Número de búsquedas completas realizadas; útil para comprobar que se calcula una vez por meta.
+        self.calculos = 0
+        # Celdas expandidas en la última llamada a `actualizar` y si la búsqueda quedó a medias.
+        self.expansiones = 0
+        self.truncado = False
+        self._busqueda = None
+
+    def actualizar(self, meta, max_expansiones=None, limite_tiempo=None):
+        # Con límites, el Dijkstra se corta al agotarlos y la siguiente llamada con la misma meta continúa donde
+        # quedó; mientras tanto el campo solo guía desde las celdas ya alcanzadas.
+        grid = self.grid_ocupacion
+        self.expansiones = 0
+        vigente = meta == self.meta and self.version_grid == grid.version
+        if vigente and not self.truncado:
+            return False
+        if not vigente:
+            self._busqueda = _iniciar_dijkstra(grid, meta)
+            self.meta = meta
+            self.version_grid = grid.version
+        self.expansiones, self.truncado = _expandir(grid, *self._busqueda, max_expansiones, limite_tiempo)
+        self._publicar()
+        return True
+
+    def accion(self, celda):
+        # Devuelve None si desde `celda` no hay ruta a la meta o si ya se está en ella.
+        grid = self.grid_ocupacion
+        i = min(max(celda[0], 0), grid.rows - 1)
+        j = min(max(celda[1], 0), grid.cols - 1)
+        accion = int(self.acciones[i, j])
+        return None if accion == ACCION_QUIETO else accion
+
+    def _publicar(self):
+        grid = self.grid_ocupacion
+        meta = self.meta
+        con_borde = np.array(self._busqueda[0]).reshape(grid.rows + 2, grid.cols_borde)
+        self.distancias = con_borde[1:-1, 1:-1]
+        self.acciones = self._direcciones(con_borde)
+        if 0 <= meta[0] < grid.rows and 0 <= meta[1] < grid.cols:
+            self.acciones[meta[0], meta[1]] = ACCION_QUIETO
+        if not self.truncado:
+            self._busqueda = None
+            self.calculos += 1
+
+    def _direcciones(self, con_borde):
+        # Para cada celda (libre o no) se elige el vecino con menor coste restante.
+        rows, cols = self.grid_ocupacion.rows, self.grid_ocupacion.cols
+        candidatos = np.empty((ACCION_QUIETO, rows, cols))
+        for accion, (dx, dy) in enumerate(MOVIMIENTOS[:ACCION_QUIETO]):
+            coste = 1.414 if dx != 0 and dy != 0 else 1.0
+            candidatos[accion] = con_borde[1 + dy:1 + dy + rows, 1 + dx:1 + dx + cols] + coste
+
+        acciones = np.argmin(candidatos, axis=0).astype(np.int8)
+        acciones[np.isinf(candidatos.min(axis=0))] = ACCION_QUIETO
+        return acciones
@@ -0,0 +1,96 @@
+import numpy as np
+
+from src.ia.campo_flujo import MOVIMIENTOS, ACCION_QUIETO
+
+_ACCION_POR_SIGNO = np.full((3, 3), ACCION_QUIETO, dtype=np.int8)
+for _accion, (_dx, _dy) in enumerate(MOVIMIENTOS):
+    _ACCION_POR_SIGNO[_dy + 1, _dx + 1] = _accion
+
+
+def fuerzas_a_acciones(fx, fy):
+    # Versión vectorizada de `_fuerza_a_accion`: cada componente normalizada por encima de 0.5 cuenta.
+    fx = np.asarray(fx, dtype=np.float64)
+    fy = np.asarray(fy, dtype=np.float64)
+    magnitud = np.hypot(fx, fy)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dx = np.where(fx / magnitud > 0.5, 1, np.where(fx / magnitud < -0.5, -1, 0))
+        dy = np.where(fy / magnitud > 0.5, 1, np.where(fy / magnitud < -0.5, -1, 0))
+    acciones = _ACCION_POR_SIGNO[dy + 1, dx + 1]
+    return np.where(magnitud < 0.1, ACCION_QUIETO, acciones)
+
+
+class CampoRepulsion:
+    # Transformada de distancia a la superficie de los obstáculos y su gradiente, muestreados cada
+    # `resolucion` píxeles. Se calcula una vez por mapa y cada consulta es una lectura del array.
+
+    def __init__(self, ancho_mapa, alto_mapa, resolucion=5, radio=25, intensidad=500):
+        self.resolucion = resolucion
+        self.radio = radio
+        self.intensidad = intensidad
+        self.filas = max(1, -(-alto_mapa // resolucion))
+        self.columnas = max(1, -(-ancho_mapa // resolucion))
+        self.centros_x = np.arange(self.columnas) * resolucion + resolucion / 2
+        self.centros_y = np.arange(self.filas) * resolucion + resolucion / 2
+
+        self.version = -1
+        self.distancias = np.full((self.filas, self.columnas), float(radio))
+        self.fuerza_x = np.zeros((self.filas, self.columnas))
+        self.fuerza_y = np.zeros((self.filas, self.columnas))
+
+    def sincronizar(self, obstaculos, version):
+        if version != self.version:
+            self.reconstruir(obstaculos)
+            self.version = version
+
+    def reconstruir(self, obstaculos):
+        # Distancia con signo a la unión de rectángulos: positiva fuera, negativa dentro. Más allá del
+        # radio de repulsión no hace falta el valor exacto, así que cada obstáculo solo actualiza una
+        # ventana a su alrededor y el resto queda saturado en `tope`.
+        res = self.resolucion
+        tope = self.radio + 2 * res
+        distancias = np.full((self.filas, self.columnas), float(tope))
+        for o in obstaculos:
+            x0, y0, x1, y1 = o.x, o.y, o.x + o.ancho, o.y + o.alto
+            i0 = max(int((y0 - tope) // res), 0)
+            i1 = min(int((y1 + tope) // res) + 1, self.filas)
+            j0 = max(int((x0 - tope) // res), 0)
+            j1 = min(int((x1 + tope) // res) + 1, self.columnas)
+            if i0 >= i1 or j0 >= j1:
+                continue
+            px = self.centros_x[np.newaxis, j0:j1]
+            py = self.centros_y[i0:i1, np.newaxis]
+            fuera_x = np.maximum(np.maximum(x0 - px, px - x1), 0)
+            fuera_y = np.maximum(np.maximum(y0 - py, py - y1), 0)
+            dentro = np.minimum(np.minimum(px - x0, x1 - px), np.minimum(py - y0, y1 - py))
+            signada = np.where(dentro > 0, -dentro, np.hypot(fuera_x, fuera_y))
+            ventana = distancias[i0:i1, j0:j1]
+            np.minimum(ventana, signada, out=ventana)
+        self.distancias = distancias
+
+        self.fuerza_x = np.zeros_like(distancias)
+        self.fuerza_y = np.zeros_like(distancias)
+        if min(self.filas, self.columnas) < 2:
+            return
+
+        gy, gx = np.gradient(distancias, res)
+        norma = np.hypot(gx, gy)
+        cerca = (distancias < self.radio) & (norma > 0)
+        # La fuerza empuja en la dirección en que crece la distancia, igual que la repulsión original.
+        factor = np.where(cerca, self.intensidad / np.maximum(distancias, 1.0) ** 2, 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.fuerza_x = np.where(cerca, gx / norma * factor, 0.0)
+            self.fuerza_y = np.where(cerca, gy / norma * factor, 0.0)
+
+    def _indices(self, x, y):
+        i = np.clip((np.asarray(y) // self.resolucion).astype(np.intp), 0, self.filas - 1)
+        j = np.clip((np.asarray(x) // self.resolucion).astype(np.intp), 0, self.columnas - 1)
+        return i, j
+
+    def fuerza(self, x, y):
+        i = min(max(int(y // self.resolucion), 0), self.filas - 1)
+        j = min(max(int(x // self.resolucion), 0), self.columnas - 1)
+        return float(self.fuerza_x[i, j]), float(self.fuerza_y[i, j])
+
+    def fuerzas(self, xs, ys):
+        i, j = self._indices(xs, ys)
+        return self.fuerza_x[i, j], self.fuerza_y[i, j]
@@ -0,0 +1,71 @@
+from src.ia.d_star_lite import PlanificadorDStarLite
+from src.ia.genetico_vectorizado import PlanificadorGenetico
+
+# Una ruta anterior solo se reaprovecha si el enemigo está en alguna de sus primeras celdas.
+MAX_AVANCE_RUTA = 3
+
+
+class ContextoPlanificador:
+    # Estado de planificación propio de un enemigo: su población genética, su última ruta y su búsqueda
+    # incremental. Cada tick arranca desde lo que se calculó en el anterior en lugar de desde cero.
+
+    def __init__(self, grid_ocupacion):
+        self.grid_ocupacion = grid_ocupacion
+        self.genetico = None
+        self.d_star = None
+
+        self.ultima_ruta = []
+        self.ultima_meta = None
+        self.version_ruta = -1
+        # Ruta que puede seguir el programador de replanificación hasta el próximo replan; None si el
+        # último planificador usado no produce rutas (campo potencial).
+        self.ruta_plan = None
+
+        self.reutilizaciones = 0
+
+    def obtener_genetico(self):
+        if self.genetico is None:
+            self.genetico = PlanificadorGenetico(self.grid_ocupacion)
+        return self.genetico
+
+    def obtener_d_star(self):
+        if self.d_star is None:
+            self.d_star = PlanificadorDStarLite(self.grid_ocupacion)
+        return self.d_star
+
+    def guardar_ruta(self, ruta, meta):
+        self.ultima_ruta = list(ruta)
+        self.ultima_meta = meta
+        self.version_ruta = self.grid_ocupacion.version
+
+    def ruta_reutilizable(self, inicio, meta):
+        # Devuelve la ruta anterior recortada hasta la celda actual, o None si hay que buscar de nuevo.
+        ruta = self.ultima_ruta
+        if len(ruta) < 2 or self.version_ruta != self.grid_ocupacion.version:
+            return None
+        try:
+            k = ruta.index(inicio, 0, MAX_AVANCE_RUTA)
+        except ValueError:
+            return None
+
+        resto = ruta[k:]
+        if meta != self.ultima_meta:
+            # La meta predicha suele desplazarse a una celda vecina; basta con prolongar la ruta un paso.
+            anterior = self.ultima_meta
+            if max(abs(meta[0] - anterior[0]), abs(meta[1] - anterior[1])) > 1:
+                return None
+            if not self.grid_ocupacion.esta_libre(meta):
+                return None
+            if len(resto) >= 2 and max(abs(meta[0] - resto[-2][0]), abs(meta[1] - resto[-2][1])) <= 1:
+                resto[-1] = meta
+            else:
+                resto.append(meta)
+            if meta in resto[:-1]:
+                return None
+
+        if len(resto) < 2:
+            return None
+        self.ultima_ruta = resto
+        self.ultima_meta = meta
+        self.reutilizaciones += 1
+        return resto
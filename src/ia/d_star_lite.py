@@ -0,0 +1,240 @@
+import heapq
+import math
+import sys
+import time
+
+import numpy as np
+
+from src.ia.campo_flujo import MOVIMIENTOS, ACCION_QUIETO
+
+INF = math.inf
+CLAVE_INFINITA = (INF, INF)
+# Costes enteros (1.0 y 1.414 escalados): con flotantes los redondeos de las sumas pueden dejar una clave
+# ligeramente por encima de la del inicio y cortar la reparación antes de tiempo.
+COSTE_RECTO = 1000
+COSTE_DIAGONAL = 1414
+
+
+class PlanificadorDStarLite:
+    # D* Lite con la búsqueda enraizada en la meta: el árbol se conserva entre ticks y solo se reparan
+    # los nodos afectados cuando se mueve el enemigo, se mueve la meta o cambia el grid de ocupación.
+
+    def __init__(self, grid_ocupacion, max_fraccion_cambios=0.25):
+        self.grid_ocupacion = grid_ocupacion
+        cols_borde = grid_ocupacion.cols_borde
+        self._vecinos = [
+            (dy * cols_borde + dx, COSTE_DIAGONAL if dx != 0 and dy != 0 else COSTE_RECTO, accion)
+            for accion, (dx, dy) in enumerate(MOVIMIENTOS[:ACCION_QUIETO])
+        ]
+        interior = np.zeros((grid_ocupacion.rows + 2, cols_borde), dtype=bool)
+        interior[1:-1, 1:-1] = True
+        self._interior = interior.ravel().tolist()
+
+        # Si un cambio de mapa toca más de esta fracción de celdas sale más barato empezar de cero.
+        self.max_fraccion_cambios = max_fraccion_cambios
+
+        self.inicio = None
+        self.meta = None
+        self._celdas = None
+        self._libres = None
+        self._version_grid = -1
+        self._g = {}
+        self._rhs = {}
+        self._cola = []
+        self._en_cola = {}
+        self._km = 0
+
+        self.nodos_expandidos = 0
+        self.reinicios = 0
+        self.truncado = False
+
+    def accion(self, inicio, meta, max_expansiones=None, limite_tiempo=None):
+        # Con presupuesto la reparación puede quedar a medias; la cola se conserva y el siguiente tick la
+        # continúa donde se quedó.
+        grid = self.grid_ocupacion
+        if not (0 <= inicio[0] < grid.rows and 0 <= inicio[1] < grid.cols):
+            return None
+        if not grid.esta_libre(meta):
+            return None
+        if inicio == meta:
+            return ACCION_QUIETO
+
+        s = grid.indice_borde(inicio[0], inicio[1])
+        m = grid.indice_borde(meta[0], meta[1])
+
+        if self.meta is None:
+            self._reiniciar(s, m)
+        else:
+            if s != self.inicio:
+                self._km += self._heuristica(self.inicio, s)
+                self.inicio = s
+            if grid.version != self._version_grid:
+                self._aplicar_cambios_grid(s, m)
+            if m != self.meta:
+                self._mover_meta(m)
+
+        self.nodos_expandidos = 0
+        self._calcular_ruta_mas_corta(max_expansiones, limite_tiempo)
+        return self._mejor_accion()
+
+    def _reiniciar(self, s, m):
+        grid = self.grid_ocupacion
+        self._celdas = grid.celdas
+        self._libres = grid.libres_con_borde()
+        self._version_grid = grid.version
+        self._g = {}
+        self._rhs = {m: 0}
+        self._cola = []
+        self._en_cola = {}
+        self._km = 0
+        self.inicio = s
+        self.meta = m
+        self._insertar(m, self._clave(m))
+        self.reinicios += 1
+
+    def _aplicar_cambios_grid(self, s, m):
+        grid = self.grid_ocupacion
+        cambiadas = np.argwhere(self._celdas != grid.celdas)
+        if len(cambiadas) > self.max_fraccion_cambios * grid.rows * grid.cols:
+            self._reiniciar(s, m)
+            return
+
+        self._celdas = grid.celdas
+        self._libres = grid.libres_con_borde()
+        self._version_grid = grid.version
+
+        # Cambiar una celda altera el coste de las aristas que entran en ella, es decir, el rhs de sus vecinos.
+        for i, j in cambiadas:
+            celda = grid.indice_borde(int(i), int(j))
+            self._actualizar_vertice(celda)
+            for desplazamiento, _, _ in self._vecinos:
+                vecino = celda - desplazamiento
+                if self._interior[vecino]:
+                    self._actualizar_vertice(vecino)
+
+    def _mover_meta(self, m):
+        anterior = self.meta
+        self.meta = m
+        self._actualizar_vertice(m)
+        self._actualizar_vertice(anterior)
+
+    def _heuristica(self, a, b):
+        cols_borde = self.grid_ocupacion.cols_borde
+        fa, ca = divmod(a, cols_borde)
+        fb, cb = divmod(b, cols_borde)
+        di = abs(fa - fb)
+        dj = abs(ca - cb)
+        return COSTE_RECTO * max(di, dj) + (COSTE_DIAGONAL - COSTE_RECTO) * min(di, dj)
+
+    def _clave(self, u):
+        minimo = min(self._g.get(u, INF), self._rhs.get(u, INF))
+        return (minimo + self._heuristica(self.inicio, u) + self._km, minimo)
+
+    def _insertar(self, u, clave):
+        self._en_cola[u] = clave
+        heapq.heappush(self._cola, (clave, u))
+
+    def _tope(self):
+        # La cola usa borrado perezoso: se descartan las entradas cuya clave ya no es la vigente.
+        cola = self._cola
+        while cola:
+            clave, u = cola[0]
+            if self._en_cola.get(u) == clave:
+                return clave, u
+            heapq.heappop(cola)
+        return CLAVE_INFINITA, None
+
+    def _actualizar_vertice(self, u):
+        if u != self.meta:
+            libres = self._libres
+            g = self._g
+            mejor = INF
+            for desplazamiento, coste, _ in self._vecinos:
+                vecino = u + desplazamiento
+                if libres[vecino]:
+                    valor = coste + g.get(vecino, INF)
+                    if valor < mejor:
+                        mejor = valor
+            self._rhs[u] = mejor
+        else:
+            self._rhs[u] = 0
+
+        self._en_cola.pop(u, None)
+        if self._g.get(u, INF) != self._rhs.get(u, INF):
+            self._insertar(u, self._clave(u))
+
+    def _calcular_ruta_mas_corta(self, max_expansiones=None, limite_tiempo=None):
+        g = self._g
+        rhs = self._rhs
+        inicio = self.inicio
+        limite = sys.maxsize if max_expansiones is None else max_expansiones
+        self.truncado = False
+
+        while True:
+            clave_tope, u = self._tope()
+            if u is None:
+                break
+            if not (clave_tope < self._clave(inicio) or rhs.get(inicio, INF) != g.get(inicio, INF)):
+                break
+            if self.nodos_expandidos >= limite or (limite_tiempo is not None and self.nodos_expandidos % 64 == 0
+                                                   and time.perf_counter() >= limite_tiempo):
+                self.truncado = True
+                break
+
+            heapq.heappop(self._cola)
+            del self._en_cola[u]
+            self.nodos_expandidos += 1
+
+            clave_nueva = self._clave(u)
+            if clave_tope < clave_nueva:
+                self._insertar(u, clave_nueva)
+            elif g.get(u, INF) > rhs.get(u, INF):
+                g[u] = rhs[u]
+                self._actualizar_predecesores(u)
+            else:
+                g[u] = INF
+                self._actualizar_predecesores(u)
+                self._actualizar_vertice(u)
+
+    def _actualizar_predecesores(self, u):
+        # Una celda bloqueada no es alcanzable desde ningún vecino, así que su valor no se propaga.
+        if not self._libres[u]:
+            return
+        for desplazamiento, _, _ in self._vecinos:
+            vecino = u - desplazamiento
+            if self._interior[vecino]:
+                self._actualizar_vertice(vecino)
+
+    def _mejor_accion(self):
+        return self._mejor_vecino(self.inicio)[1]
+
+    def _mejor_vecino(self, u):
+        libres = self._libres
+        g = self._g
+        mejor = INF
+        mejor_vecino = None
+        mejor_accion = None
+        for desplazamiento, coste, accion in self._vecinos:
+            vecino = u + desplazamiento
+            if libres[vecino]:
+                valor = coste + g.get(vecino, INF)
+                if valor < mejor:
+                    mejor = valor
+                    mejor_vecino = vecino
+                    mejor_accion = accion
+        return mejor_vecino, mejor_accion
+
+    def ruta(self, max_pasos):
+        # Celdas que recorre el enemigo bajando por g desde el inicio de la última llamada a `accion`, hasta
+        # la meta o `max_pasos` pasos.
+        grid = self.grid_ocupacion
+        actual = self.inicio
+        ruta = [grid.celda_desde_borde(actual)]
+        for _ in range(max_pasos):
+            if actual == self.meta:
+                break
+            actual = self._mejor_vecino(actual)[0]
+            if actual is None:
+                break
+            ruta.append(grid.celda_desde_borde(actual))
+        return ruta
@@ -0,0 +1,164 @@
+import random
+import time
+
+import numpy as np
+
+from src.ia.campo_flujo import MOVIMIENTOS, ACCION_QUIETO
+
+# Desplazamiento (di, dj) en el grid de cada acción del entorno.
+DESPLAZAMIENTOS = np.array([(dy, dx) for dx, dy in MOVIMIENTOS], dtype=np.int32)
+_ACCION_POR_DESPLAZAMIENTO = np.full((3, 3), ACCION_QUIETO, dtype=np.int8)
+for _accion, (_di, _dj) in enumerate(DESPLAZAMIENTOS):
+    _ACCION_POR_DESPLAZAMIENTO[_di + 1, _dj + 1] = _accion
+
+
+class PlanificadorGenetico:
+    # La población es una matriz (individuos x pasos) de acciones. Como los genes son movimientos relativos
+    # y no celdas absolutas, la misma población sigue siendo válida cuando el enemigo se desplaza.
+
+    def __init__(self, grid_ocupacion, tam_poblacion=64, longitud=15, elite=5, tam_torneo=3,
+                 tasa_mutacion=0.1, prob_voraz=0.7, semilla=None):
+        self.grid_ocupacion = grid_ocupacion
+        self.tam_poblacion = tam_poblacion
+        self.longitud = longitud
+        self.elite = elite
+        self.tam_torneo = tam_torneo
+        self.tasa_mutacion = tasa_mutacion
+        self.prob_voraz = prob_voraz
+        # Se siembra desde `random` para que `random.seed` siga haciendo reproducible una partida.
+        self.rng = np.random.default_rng(random.getrandbits(64) if semilla is None else semilla)
+
+        self.poblacion = None
+        self.fitness = None
+        self.inicio = None
+        self.generaciones = 0
+        self.truncado = False
+
+    def planificar(self, inicio, meta, pos_jugador, generaciones=5, limite_tiempo=None):
+        # Si se alcanza `limite_tiempo` se deja de evolucionar y se usa el mejor individuo hasta el momento.
+        inicio = self._recortar(inicio)
+        meta = self._recortar(meta)
+        if self.poblacion is None:
+            self.poblacion = self._poblacion_inicial(inicio, meta)
+        elif inicio != self.inicio:
+            self._desplazar()
+        self.inicio = inicio
+
+        self.truncado = False
+        for _ in range(generaciones):
+            if limite_tiempo is not None and time.perf_counter() >= limite_tiempo:
+                self.truncado = True
+                break
+            self.fitness = self._evaluar(inicio, meta, pos_jugador)
+            self._reproducir()
+            self._mutar()
+            self.generaciones += 1
+
+        self.fitness = self._evaluar(inicio, meta, pos_jugador)
+        return int(self.poblacion[np.argmax(self.fitness), 0])
+
+    def mejor_ruta(self):
+        # Celdas que recorre el mejor individuo desde el inicio de la última planificación.
+        if self.poblacion is None or self.fitness is None:
+            return []
+        genes = self.poblacion[int(np.argmax(self.fitness))]
+        pos = np.array([self.inicio], dtype=np.int32)
+        ruta = [self.inicio]
+        for accion in genes:
+            pos = self._avanzar(pos, accion)
+            celda = (int(pos[0, 0]), int(pos[0, 1]))
+            if celda != ruta[-1]:
+                ruta.append(celda)
+        return ruta
+
+    def _recortar(self, celda):
+        grid = self.grid_ocupacion
+        return min(max(celda[0], 0), grid.rows - 1), min(max(celda[1], 0), grid.cols - 1)
+
+    def _poblacion_inicial(self, inicio, meta):
+        # Cada paso va hacia la meta con probabilidad `prob_voraz` y en otro caso es aleatorio.
+        n, longitud = self.tam_poblacion, self.longitud
+        poblacion = np.empty((n, longitud), dtype=np.int8)
+        pos = np.tile(np.array(inicio, dtype=np.int32), (n, 1))
+        meta = np.array(meta, dtype=np.int32)
+        voraz = self.rng.random((longitud, n)) < self.prob_voraz
+        aleatorias = self.rng.integers(0, len(MOVIMIENTOS), (longitud, n))
+
+        for paso in range(longitud):
+            signo = np.sign(meta - pos)
+            hacia_meta = _ACCION_POR_DESPLAZAMIENTO[signo[:, 0] + 1, signo[:, 1] + 1]
+            poblacion[:, paso] = np.where(voraz[paso], hacia_meta, aleatorias[paso])
+            pos = self._avanzar(pos, poblacion[:, paso])
+        return poblacion
+
+    def _desplazar(self):
+        # El enemigo ya ha dado el primer paso: se descarta ese gen y se añade uno aleatorio al final,
+        # de modo que la élite del tick anterior sigue describiendo la misma trayectoria.
+        self.poblacion[:, :-1] = self.poblacion[:, 1:]
+        self.poblacion[:, -1] = self.rng.integers(0, len(MOVIMIENTOS), len(self.poblacion))
+
+    def _avanzar(self, pos, acciones):
+        limite = (self.grid_ocupacion.rows - 1, self.grid_ocupacion.cols - 1)
+        return np.minimum(np.maximum(pos + DESPLAZAMIENTOS[acciones], 0), limite)
+
+    def _decodificar(self, inicio):
+        # Celdas visitadas (individuos x pasos x 2); un paso que saldría del mapa deja al individuo en su sitio.
+        n, longitud = self.poblacion.shape
+        celdas = np.empty((n, longitud, 2), dtype=np.int32)
+        pos = np.tile(np.array(inicio, dtype=np.int32), (n, 1))
+        for paso in range(longitud):
+            pos = self._avanzar(pos, self.poblacion[:, paso])
+            celdas[:, paso] = pos
+        return celdas
+
+    def _evaluar(self, inicio, meta, pos_jugador):
+        grid = self.grid_ocupacion
+        n, longitud = self.poblacion.shape
+        celdas = self._decodificar(inicio)
+
+        # La ruta termina en el primer paso que alcanza la meta; los genes posteriores no cuentan.
+        en_meta = (celdas[:, :, 0] == meta[0]) & (celdas[:, :, 1] == meta[1])
+        fin = np.where(en_meta.any(axis=1), en_meta.argmax(axis=1), longitud - 1)
+        activos = np.arange(longitud) <= fin[:, np.newaxis]
+
+        fitness = -2.0 * (fin + 2)
+
+        final = celdas[np.arange(n), fin]
+        cs = grid.cell_size
+        dist_final = np.hypot(final[:, 1] * cs + cs // 2 - pos_jugador[0],
+                              final[:, 0] * cs + cs // 2 - pos_jugador[1])
+        fitness += np.maximum(0.0, 200.0 - dist_final)
+
+        colisiones = (grid.celdas[celdas[:, :, 0], celdas[:, :, 1]].astype(bool) & activos).sum(axis=1)
+        colisiones += grid.celdas[inicio]
+        fitness -= 50.0 * colisiones
+
+        cambios = ((self.poblacion[:, 1:] != self.poblacion[:, :-1]) & activos[:, 1:]).sum(axis=1)
+        fitness -= 5.0 * cambios
+        return fitness
+
+    def _reproducir(self):
+        n, longitud = self.poblacion.shape
+        elite = min(self.elite, n)
+        orden = np.argsort(-self.fitness, kind="stable")
+        hijos = n - elite
+
+        # Torneos de todos los padres a la vez: (2, hijos, tam_torneo) candidatos.
+        candidatos = self.rng.integers(0, n, (2, hijos, self.tam_torneo))
+        ganador = np.argmax(self.fitness[candidatos], axis=2)
+        padres = np.take_along_axis(candidatos, ganador[..., np.newaxis], axis=2)[..., 0]
+
+        cortes = self.rng.integers(1, longitud, hijos) if longitud > 1 else np.zeros(hijos, dtype=int)
+        del_primero = np.arange(longitud) < cortes[:, np.newaxis]
+        descendencia = np.where(del_primero, self.poblacion[padres[0]], self.poblacion[padres[1]])
+
+        self.poblacion = np.concatenate([self.poblacion[orden[:elite]], descendencia]).astype(np.int8)
+
+    def _mutar(self):
+        # La élite se conserva intacta; el resto cambia un gen al azar con probabilidad `tasa_mutacion`.
+        n, longitud = self.poblacion.shape
+        elite = min(self.elite, n)
+        mutan = elite + np.flatnonzero(self.rng.random(n - elite) < self.tasa_mutacion)
+        if len(mutan):
+            genes = self.rng.integers(0, longitud, len(mutan))
+            self.poblacion[mutan, genes] = self.rng.integers(0, len(MOVIMIENTOS), len(mutan))
@@ -0,0 +1,121 @@
+import heapq
+import math
+
+import numpy as np
+
+from src.ia.linea_vision import LineaVision
+
+
+class GrafoVisibilidad:
+    # Grafo sobre las esquinas de los obstáculos inflados. Se reconstruye solo cuando cambia la versión
+    # del grid de ocupación y cada consulta conecta únicamente el origen y el destino.
+
+    def __init__(self, ancho_mapa, alto_mapa, margen_inflacion=15, separacion_esquina=1.0):
+        self.ancho_mapa = ancho_mapa
+        self.alto_mapa = alto_mapa
+        self.margen_inflacion = margen_inflacion
+        self.separacion_esquina = separacion_esquina
+
+        self.version = -1
+        self.linea_vision = LineaVision(margen_inflacion)
+        self.nodos = np.empty((0, 2))
+        self.distancias = np.empty((0, 0))
+        self._adyacencia = []
+        self.reconstrucciones = 0
+
+    def sincronizar(self, obstaculos, version):
+        if version != self.version:
+            self.reconstruir(obstaculos)
+            self.version = version
+
+    def reconstruir(self, obstaculos):
+        vision = self.linea_vision
+        vision.reconstruir(obstaculos)
+
+        e = self.separacion_esquina
+        esquinas = []
+        for x0, y0, x1, y1 in vision.rects:
+            esquinas.extend([(x0 - e, y0 - e), (x1 + e, y0 - e), (x1 + e, y1 + e), (x0 - e, y1 + e)])
+        nodos = np.array(esquinas, dtype=np.float64).reshape(-1, 2)
+
+        if len(nodos):
+            en_mapa = ((nodos[:, 0] >= 0) & (nodos[:, 0] <= self.ancho_mapa) &
+                       (nodos[:, 1] >= 0) & (nodos[:, 1] <= self.alto_mapa))
+            nodos = nodos[en_mapa & ~vision.dentro_de_rects(nodos).any(axis=1)]
+
+        n = len(nodos)
+        distancias = np.full((n, n), np.inf)
+        if n > 1:
+            i, j = np.triu_indices(n, k=1)
+            visibles = ~vision.bloqueados(nodos[i], nodos[j])
+            longitudes = np.hypot(*(nodos[j] - nodos[i]).T)
+            distancias[i[visibles], j[visibles]] = longitudes[visibles]
+            distancias[j[visibles], i[visibles]] = longitudes[visibles]
+
+        self.nodos = nodos
+        self.distancias = distancias
+        self._adyacencia = [
+            [(int(j), float(distancias[i, j])) for j in np.flatnonzero(np.isfinite(distancias[i]))]
+            for i in range(n)
+        ]
+        self.reconstrucciones += 1
+
+    def _visibles_desde(self, punto, destinos, extremos):
+        # Los obstáculos en cuyo margen ya está alguno de los extremos se ignoran para poder salir o llegar.
+        vision = self.linea_vision
+        rects = vision.rects[~vision.dentro_de_rects(extremos).any(axis=0)]
+        return ~vision.bloqueados(np.repeat([punto], len(destinos), axis=0), destinos, rects)
+
+    def buscar(self, inicio, meta):
+        inicio = (float(inicio[0]), float(inicio[1]))
+        meta = (float(meta[0]), float(meta[1]))
+
+        if self._visibles_desde(inicio, np.array([meta]), [inicio, meta])[0]:
+            return [inicio, meta]
+
+        n = len(self.nodos)
+        if n == 0:
+            return []
+
+        desde_inicio = self._visibles_desde(inicio, self.nodos, [inicio])
+        hacia_meta = self._visibles_desde(meta, self.nodos, [meta])
+        coste_inicio = np.where(desde_inicio, np.hypot(*(self.nodos - inicio).T), np.inf)
+        coste_meta = np.where(hacia_meta, np.hypot(*(self.nodos - meta).T), np.inf)
+
+        # Dijkstra sobre unas pocas decenas de nodos; el índice n representa la meta.
+        dist = coste_inicio.tolist() + [math.inf]
+        coste_meta = coste_meta.tolist()
+        padre = [-1] * (n + 1)
+        heap = [(d, k) for k, d in enumerate(dist[:n]) if d < math.inf]
+        heapq.heapify(heap)
+        cerrados = [False] * (n + 1)
+
+        while heap:
+            d, actual = heapq.heappop(heap)
+            if cerrados[actual]:
+                continue
+            cerrados[actual] = True
+            if actual == n:
+                break
+
+            vecinos = self._adyacencia[actual]
+            if coste_meta[actual] < math.inf:
+                vecinos = vecinos + [(n, coste_meta[actual])]
+            for vecino, coste in vecinos:
+                nueva = d + coste
+                if nueva < dist[vecino]:
+                    dist[vecino] = nueva
+                    padre[vecino] = actual
+                    heapq.heappush(heap, (nueva, vecino))
+
+        if dist[n] == math.inf:
+            return []
+
+        ruta = [meta]
+        nodo = padre[n]
+        while nodo != -1:
+            ruta.append((float(self.nodos[nodo, 0]), float(self.nodos[nodo, 1])))
+            nodo = padre[nodo]
+        ruta.append(inicio)
+        ruta.reverse()
+        return ruta
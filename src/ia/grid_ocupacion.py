@@ -0,0 +1,123 @@
+import numpy as np
+
+
+class GridOcupacion:
+    def __init__(self, ancho_mapa, alto_mapa, cell_size=15, margen_inflacion=15):
+        self.ancho_mapa = ancho_mapa
+        self.alto_mapa = alto_mapa
+        self.cell_size = cell_size
+        self.cols = ancho_mapa // cell_size
+        self.rows = alto_mapa // cell_size
+        self.margen_inflacion = margen_inflacion
+
+        # Centros de cada celda en píxeles. Una celda queda bloqueada si su centro cae dentro del obstáculo inflado.
+        self.centros_x = np.arange(self.cols) * cell_size + cell_size // 2
+        self.centros_y = np.arange(self.rows) * cell_size + cell_size // 2
+
+        self.celdas = self._grid_vacio()
+        # `version` cambia cada vez que se reconstruye el grid; los planificadores la usan para invalidar sus cachés.
+        self.version = 0
+        # Vista plana del grid con un borde bloqueado de una celda, para recorrer vecinos sin comprobar límites.
+        self.cols_borde = self.cols + 2
+        self._libres_borde = None
+        self._version_libres_borde = -1
+        self._obstaculos_fuente = None
+        self._num_obstaculos_fuente = -1
+
+    def _grid_vacio(self):
+        celdas = np.zeros((self.rows, self.cols), dtype=np.uint8)
+        celdas.flags.writeable = False
+        return celdas
+
+    def sincronizar(self, obstaculos):
+        # El entorno sustituye la lista completa de obstáculos en `reset` y en el cambio asíncrono de mapa,
+        # así que basta con comparar la identidad de la lista para saber si hay que reconstruir.
+        if (obstaculos is not self._obstaculos_fuente or
+                len(obstaculos) != self._num_obstaculos_fuente):
+            self.reconstruir(obstaculos)
+        return self.celdas
+
+    def invalidar(self):
+        self._obstaculos_fuente = None
+
+    def reconstruir(self, obstaculos):
+        celdas = np.zeros((self.rows, self.cols), dtype=np.uint8)
+        margen = self.margen_inflacion
+
+        for obstaculo in obstaculos:
+            izquierda = int(obstaculo.x - margen)
+            arriba = int(obstaculo.y - margen)
+            derecha = izquierda + int(obstaculo.ancho + 2 * margen)
+            abajo = arriba + int(obstaculo.alto + 2 * margen)
+
+            j0, j1 = np.searchsorted(self.centros_x, (izquierda, derecha))
+            i0, i1 = np.searchsorted(self.centros_y, (arriba, abajo))
+            celdas[i0:i1, j0:j1] = 1
+
+        # Se crea un array nuevo en cada reconstrucción para que quien conserve una versión anterior no la vea mutar.
+        celdas.flags.writeable = False
+        self.celdas = celdas
+        self.version += 1
+        self._obstaculos_fuente = obstaculos
+        self._num_obstaculos_fuente = len(obstaculos)
+        return celdas
+
+    def cargar(self, celdas, obstaculos):
+        # Adopta un grid ya calculado en otro sitio (p. ej. memoria compartida o un banco de escenarios) como el de `obstaculos`.
+        celdas = np.array(celdas, dtype=np.uint8).reshape(self.rows, self.cols)
+        celdas.flags.writeable = False
+        self.celdas = celdas
+        self.version += 1
+        self._obstaculos_fuente = obstaculos
+        self._num_obstaculos_fuente = len(obstaculos)
+        return celdas
+
+    def esta_libre(self, celda):
+        i, j = celda
+        return 0 <= i < self.rows and 0 <= j < self.cols and self.celdas[i, j] == 0
+
+    def libres_con_borde(self):
+        if self._version_libres_borde != self.version:
+            libres = np.zeros((self.rows + 2, self.cols_borde), dtype=bool)
+            libres[1:-1, 1:-1] = self.celdas == 0
+            self._libres_borde = libres.ravel().tolist()
+            self._version_libres_borde = self.version
+        return self._libres_borde
+
+    def indice_borde(self, i, j):
+        return (i + 1) * self.cols_borde + (j + 1)
+
+    def celda_desde_borde(self, indice):
+        fila, col = divmod(indice, self.cols_borde)
+        return fila - 1, col - 1
+
+
+class PiramideOcupacion:
+    # Nivel grueso derivado del grid fino: una celda gruesa (factor x factor celdas finas) está bloqueada
+    # si lo está cualquiera de sus celdas finas, así que toda ruta gruesa es transitable en el nivel fino.
+
+    def __init__(self, grid_fino, factor=3):
+        self.grid_fino = grid_fino
+        self.factor = factor
+        self.grueso = GridOcupacion(grid_fino.ancho_mapa, grid_fino.alto_mapa, grid_fino.cell_size * factor,
+                                    grid_fino.margen_inflacion)
+        self._version_fino = -1
+
+    def sincronizar(self):
+        fino = self.grid_fino
+        if fino.version == self._version_fino:
+            return self.grueso.celdas
+        f = self.factor
+        rows, cols = self.grueso.rows, self.grueso.cols
+        bloques = fino.celdas[:rows * f, :cols * f].reshape(rows, f, cols, f)
+        self.grueso.cargar(bloques.max(axis=(1, 3)), fino._obstaculos_fuente or [])
+        self._version_fino = fino.version
+        return self.grueso.celdas
+
+    def celda_gruesa(self, celda):
+        return celda[0] // self.factor, celda[1] // self.factor
+
+    def centro_fino(self, celda_gruesa):
+        # Celda fina central del bloque grueso.
+        f = self.factor
+        return celda_gruesa[0] * f + f // 2, celda_gruesa[1] * f + f // 2
@@ -0,0 +1,316 @@
+import heapq
+import math
+import sys
+import time
+
+import numpy as np
+
+DIRECCIONES = [(di, dj) for di in (-1, 0, 1) for dj in (-1, 0, 1) if di != 0 or dj != 0]
+# Los segmentos de entrada más largos que esto se conectan por sus dos extremos en lugar de por el centro.
+LONGITUD_ENTRADA_DOBLE = 6
+# Cada cuántos nodos abstractos se consulta el reloj cuando la búsqueda tiene límite de tiempo.
+INTERVALO_RELOJ = 16
+
+
+def _coste(di, dj):
+    return 1.414 if di != 0 and dj != 0 else 1.0
+
+
+def _octil(a, b):
+    di = abs(a[0] - b[0])
+    dj = abs(a[1] - b[1])
+    return max(di, dj) + 0.414 * min(di, dj)
+
+
+class GrafoJerarquico:
+    # HPA*: el grid se divide en clusters, se calculan las entradas entre clusters vecinos y las distancias
+    # dentro de cada cluster una vez por mapa, y las consultas buscan en ese grafo abstracto.
+
+    def __init__(self, grid_ocupacion, tam_cluster=10):
+        self.grid_ocupacion = grid_ocupacion
+        self.tam_cluster = tam_cluster
+        self.filas_cluster = math.ceil(grid_ocupacion.rows / tam_cluster)
+        self.cols_cluster = math.ceil(grid_ocupacion.cols / tam_cluster)
+
+        self._celdas = None
+        self._version_grid = -1
+        # Pares de celdas de transición por frontera; la clave es el par ordenado de clusters vecinos.
+        self._entradas = {}
+        self._parejas = {}
+        self._aristas_intra = {}
+
+        self.clusters_reconstruidos = 0
+        self.nodos_expandidos = 0
+        # Trabajo de la última consulta: nodos abstractos más celdas relajadas en los clusters de inicio y meta.
+        # La reconstrucción de clusters al cambiar el mapa es precálculo y no cuenta.
+        self.expansiones = 0
+        self.truncado = False
+
+    def buscar(self, inicio, meta, max_expansiones=None, limite_tiempo=None):
+        # Devuelve el primer tramo refinado celda a celda seguido de los nodos abstractos restantes. Si se
+        # agotan los límites, la ruta lleva hasta el nodo expandido más cercano a la meta.
+        grid = self.grid_ocupacion
+        self.nodos_expandidos = 0
+        self.expansiones = 0
+        self.truncado = False
+        if inicio == meta:
+            return [inicio]
+        if not (0 <= inicio[0] < grid.rows and 0 <= inicio[1] < grid.cols):
+            return []
+        if not grid.esta_libre(meta):
+            return []
+
+        self._sincronizar()
+
+        cluster_inicio = self._cluster_de(inicio)
+        cluster_meta = self._cluster_de(meta)
+        nodos_inicio = self._nodos_de(cluster_inicio)
+        nodos_meta = self._nodos_de(cluster_meta)
+
+        # Las relajaciones locales no se pueden cortar a medias: si no caben en el presupuesto no se empiezan.
+        limite = sys.maxsize if max_expansiones is None else max_expansiones
+        self.expansiones = self._tam_cluster(cluster_inicio) + self._tam_cluster(cluster_meta)
+        if self.expansiones > limite or (limite_tiempo is not None and time.perf_counter() >= limite_tiempo):
+            self.expansiones = 0
+            self.truncado = True
+            return []
+
+        # Conexión temporal de inicio y meta con los nodos de su cluster.
+        objetivos = list(nodos_inicio)
+        if cluster_inicio == cluster_meta:
+            objetivos.append(meta)
+        dist_inicio = self._distancias_locales(cluster_inicio, [inicio])[0]
+        aristas_inicio = self._aristas_a(cluster_inicio, dist_inicio, inicio, objetivos)
+        aristas_inicio.extend((pareja, 1.0) for pareja in self._parejas.get(inicio, ()))
+
+        dist_meta = self._distancias_locales(cluster_meta, [meta])[0]
+        hacia_meta = {}
+        for nodo, coste in self._aristas_a(cluster_meta, dist_meta, meta, nodos_meta):
+            hacia_meta[nodo] = coste
+
+        ruta = self._buscar_abstracta(inicio, meta, aristas_inicio, hacia_meta, limite - self.expansiones,
+                                      limite_tiempo)
+        self.expansiones += self.nodos_expandidos
+        if len(ruta) < 2:
+            return []
+
+        return self._refinar_primer_tramo(ruta) + ruta[2:]
+
+    def _sincronizar(self):
+        grid = self.grid_ocupacion
+        if grid.version == self._version_grid:
+            return
+
+        if self._celdas is None or self._celdas.shape != grid.celdas.shape:
+            tocados = {(ci, cj) for ci in range(self.filas_cluster) for cj in range(self.cols_cluster)}
+        else:
+            cambiadas = np.argwhere(self._celdas != grid.celdas)
+            tocados = {(int(i) // self.tam_cluster, int(j) // self.tam_cluster) for i, j in cambiadas}
+
+        self._celdas = grid.celdas
+        self._version_grid = grid.version
+        if tocados:
+            self._reconstruir_clusters(tocados)
+
+    def _reconstruir_clusters(self, tocados):
+        # Solo se recalculan las fronteras de los clusters tocados y las distancias internas de estos y de
+        # sus vecinos, cuyos nodos de frontera pueden haber cambiado.
+        fronteras = set()
+        afectados = set(tocados)
+        for cluster in tocados:
+            for vecino in self._clusters_vecinos(cluster):
+                fronteras.add((min(cluster, vecino), max(cluster, vecino)))
+                afectados.add(vecino)
+
+        for frontera in fronteras:
+            self._entradas[frontera] = self._calcular_entradas(*frontera)
+
+        self._parejas = {}
+        for pares in self._entradas.values():
+            for a, b in pares:
+                self._parejas.setdefault(a, []).append(b)
+                self._parejas.setdefault(b, []).append(a)
+
+        for cluster in afectados:
+            nodos = self._nodos_de(cluster)
+            aristas = {}
+            if nodos:
+                distancias = self._distancias_locales(cluster, nodos)
+                for nodo, dist in zip(nodos, distancias):
+                    aristas[nodo] = self._aristas_a(cluster, dist, nodo, nodos)
+            self._aristas_intra[cluster] = aristas
+        self.clusters_reconstruidos += len(afectados)
+
+    def _clusters_vecinos(self, cluster):
+        ci, cj = cluster
+        for vi, vj in ((ci - 1, cj), (ci + 1, cj), (ci, cj - 1), (ci, cj + 1)):
+            if 0 <= vi < self.filas_cluster and 0 <= vj < self.cols_cluster:
+                yield (vi, vj)
+
+    def _limites(self, cluster):
+        t = self.tam_cluster
+        i0, j0 = cluster[0] * t, cluster[1] * t
+        return i0, min(i0 + t, self.grid_ocupacion.rows), j0, min(j0 + t, self.grid_ocupacion.cols)
+
+    def _tam_cluster(self, cluster):
+        i0, i1, j0, j1 = self._limites(cluster)
+        return (i1 - i0) * (j1 - j0)
+
+    def _cluster_de(self, celda):
+        return celda[0] // self.tam_cluster, celda[1] // self.tam_cluster
+
+    def _calcular_entradas(self, cluster_a, cluster_b):
+        celdas = self._celdas
+        i0, i1, j0, j1 = self._limites(cluster_a)
+        if cluster_a[0] == cluster_b[0]:
+            # Frontera vertical: última columna de `a` frente a la primera de `b`.
+            lado_a = [(i, j1 - 1) for i in range(i0, i1)]
+            lado_b = [(i, j1) for i in range(i0, i1)]
+            abiertas = (celdas[i0:i1, j1 - 1] == 0) & (celdas[i0:i1, j1] == 0)
+        else:
+            lado_a = [(i1 - 1, j) for j in range(j0, j1)]
+            lado_b = [(i1, j) for j in range(j0, j1)]
+            abiertas = (celdas[i1 - 1, j0:j1] == 0) & (celdas[i1, j0:j1] == 0)
+
+        abiertas = abiertas.tolist()
+        pares = []
+        k = 0
+        while k < len(abiertas):
+            if not abiertas[k]:
+                k += 1
+                continue
+            fin = k
+            while fin + 1 < len(abiertas) and abiertas[fin + 1]:
+                fin += 1
+            if fin - k + 1 >= LONGITUD_ENTRADA_DOBLE:
+                elegidas = (k, fin)
+            else:
+                elegidas = ((k + fin) // 2,)
+            for idx in elegidas:
+                pares.append((lado_a[idx], lado_b[idx]))
+            k = fin + 1
+        return pares
+
+    def _nodos_de(self, cluster):
+        nodos = set()
+        for vecino in self._clusters_vecinos(cluster):
+            frontera = (min(cluster, vecino), max(cluster, vecino))
+            for a, b in self._entradas.get(frontera, ()):
+                nodos.add(a if self._cluster_de(a) == cluster else b)
+        return sorted(nodos)
+
+    def _distancias_locales(self, cluster, origenes):
+        # Relajación vectorizada (Bellman-Ford por barridos) de todos los orígenes a la vez, sin salir del cluster.
+        i0, i1, j0, j1 = self._limites(cluster)
+        alto, ancho = i1 - i0, j1 - j0
+        libres = self._celdas[i0:i1, j0:j1] == 0
+
+        dist = np.full((len(origenes), alto + 2, ancho + 2), np.inf)
+        for k, (i, j) in enumerate(origenes):
+            dist[k, i - i0 + 1, j - j0 + 1] = 0.0
+
+        interior = dist[:, 1:-1, 1:-1]
+        while True:
+            mejor = interior.copy()
+            for di, dj in DIRECCIONES:
+                np.minimum(mejor, dist[:, 1 + di:1 + di + alto, 1 + dj:1 + dj + ancho] + _coste(di, dj), out=mejor)
+            # Las celdas bloqueadas conservan su valor: infinito, o cero si son el origen.
+            mejor = np.where(libres, mejor, interior)
+            if np.array_equal(mejor, interior):
+                break
+            interior[...] = mejor
+
+        return interior
+
+    def _aristas_a(self, cluster, dist, origen, destinos):
+        i0, _, j0, _ = self._limites(cluster)
+        aristas = []
+        for destino in destinos:
+            valor = dist[destino[0] - i0, destino[1] - j0]
+            if destino != origen and np.isfinite(valor):
+                aristas.append((destino, float(valor)))
+        return aristas
+
+    def _buscar_abstracta(self, inicio, meta, aristas_inicio, hacia_meta, max_expansiones, limite_tiempo):
+        g = {inicio: 0.0}
+        padre = {inicio: None}
+        heap = [(_octil(inicio, meta), inicio)]
+        cerrados = set()
+        mejor_parcial = inicio
+        mejor_h = _octil(inicio, meta)
+
+        while heap:
+            _, actual = heapq.heappop(heap)
+            if actual == meta:
+                break
+            if actual in cerrados:
+                continue
+            expandidos = self.nodos_expandidos
+            if expandidos >= max_expansiones or (limite_tiempo is not None and expandidos % INTERVALO_RELOJ == 0
+                                                 and expandidos and time.perf_counter() >= limite_tiempo):
+                self.truncado = True
+                break
+            cerrados.add(actual)
+            self.nodos_expandidos += 1
+            h = _octil(actual, meta)
+            if h < mejor_h:
+                mejor_h = h
+                mejor_parcial = actual
+
+            if actual == inicio:
+                vecinos = aristas_inicio
+            else:
+                vecinos = list(self._aristas_intra.get(self._cluster_de(actual), {}).get(actual, ()))
+                vecinos.extend((pareja, 1.0) for pareja in self._parejas.get(actual, ()))
+                if actual in hacia_meta:
+                    vecinos.append((meta, hacia_meta[actual]))
+
+            for vecino, coste in vecinos:
+                nuevo = g[actual] + coste
+                if nuevo < g.get(vecino, math.inf):
+                    g[vecino] = nuevo
+                    padre[vecino] = actual
+                    heapq.heappush(heap, (nuevo + _octil(vecino, meta), vecino))
+
+        fin = meta
+        if self.truncado or meta not in padre:
+            if not self.truncado:
+                return []
+            fin = mejor_parcial
+
+        ruta = []
+        nodo = fin
+        while nodo is not None:
+            ruta.append(nodo)
+            nodo = padre[nodo]
+        ruta.reverse()
+        return ruta
+
+    def _refinar_primer_tramo(self, ruta):
+        inicio, destino = ruta[0], ruta[1]
+        cluster = self._cluster_de(inicio)
+        if self._cluster_de(destino) != cluster:
+            # Salto entre celdas de transición adyacentes.
+            return [inicio, destino]
+
+        # Descenso por el campo de distancias hacia el destino dentro del cluster.
+        i0, i1, j0, j1 = self._limites(cluster)
+        dist = self._distancias_locales(cluster, [destino])[0]
+        self.expansiones += self._tam_cluster(cluster)
+        tramo = [inicio]
+        actual = inicio
+        while actual != destino:
+            mejor = None
+            mejor_valor = math.inf
+            for di, dj in DIRECCIONES:
+                ni, nj = actual[0] + di, actual[1] + dj
+                if i0 <= ni < i1 and j0 <= nj < j1:
+                    valor = _coste(di, dj) + dist[ni - i0, nj - j0]
+                    if valor < mejor_valor:
+                        mejor_valor = valor
+                        mejor = (ni, nj)
+            if mejor is None:
+                break
+            tramo.append(mejor)
+            actual = mejor
+        return tramo
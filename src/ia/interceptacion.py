@@ -0,0 +1,75 @@
+import math
+
+import numpy as np
+
+# Anillo de celdas de escape del jugador (en pasos de grid) entre las que se eligen puntos de intercepción.
+RADIO_MIN_ANILLO = 3
+RADIO_MAX_ANILLO = 6
+NUM_SECTORES = 8
+# Un enemigo a esta distancia del jugador (en pasos de grid) va directo a por él. Cubre el anillo entero:
+# quien llega a su punto de intercepción cierra desde ese lado en vez de quedarse esperando.
+RADIO_PERSECUCION_DIRECTA = RADIO_MAX_ANILLO + 1
+# Coste añadido por pisar una celda reservada por otro enemigo, y cuántos pasos de cada ruta se reservan.
+PENALIZACION_RESERVA = 3.0
+HORIZONTE_RESERVA = 6
+
+
+class PlanificadorCooperativo:
+    # Reparte a los enemigos entre la celda del jugador y puntos de intercepción distintos alrededor de
+    # ella. Las distancias del jugador salen de una única búsqueda multi-destino (el campo de flujo hacia
+    # su celda), compartida por todos los enemigos del tick.
+
+    def __init__(self, grid_ocupacion):
+        self.grid_ocupacion = grid_ocupacion
+        self.ultimos_candidatos = []
+        self.ultima_asignacion = []
+
+    def candidatos(self, celda_jugador, distancias_jugador, celda_predicha=None):
+        # Celda del jugador, celda predicha y, por cada sector angular, la celda del anillo de escape más
+        # alejada que el jugador puede alcanzar.
+        grid = self.grid_ocupacion
+        candidatos = [celda_jugador]
+        if (celda_predicha is not None and celda_predicha != celda_jugador
+                and grid.esta_libre(celda_predicha)):
+            candidatos.append(celda_predicha)
+
+        en_anillo = ((distancias_jugador >= RADIO_MIN_ANILLO) & (distancias_jugador <= RADIO_MAX_ANILLO)
+                     & np.isfinite(distancias_jugador))
+        filas, cols = np.nonzero(en_anillo)
+        if len(filas):
+            angulos = np.arctan2(filas - celda_jugador[0], cols - celda_jugador[1])
+            sectores = ((angulos + math.pi) / (2 * math.pi) * NUM_SECTORES).astype(int) % NUM_SECTORES
+            alcance = distancias_jugador[filas, cols]
+            # Orden por sector y, dentro de cada uno, de más a menos lejano: el primero de cada sector gana.
+            orden = np.lexsort((-alcance, sectores))
+            _, primeros = np.unique(sectores[orden], return_index=True)
+            for k in orden[primeros]:
+                celda = (int(filas[k]), int(cols[k]))
+                if celda not in candidatos:
+                    candidatos.append(celda)
+
+        self.ultimos_candidatos = candidatos
+        return candidatos
+
+    def asignar(self, celdas_enemigos, candidatos):
+        # Asignación voraz sobre la matriz enemigos x candidatos (distancia octil): se toma repetidamente el
+        # par más barato y se retiran su fila y su columna. Los enemigos sobrantes quedan sin candidato (None).
+        n = len(celdas_enemigos)
+        asignacion = [None] * n
+        if n == 0 or not candidatos:
+            return asignacion
+
+        enemigos = np.array(celdas_enemigos, dtype=np.float64).reshape(-1, 1, 2)
+        destinos = np.array(candidatos, dtype=np.float64).reshape(1, -1, 2)
+        diferencia = np.abs(enemigos - destinos)
+        costes = diferencia.max(axis=2) + 0.414 * diferencia.min(axis=2)
+
+        for _ in range(min(n, len(candidatos))):
+            indice = int(np.argmin(costes))
+            e, c = divmod(indice, costes.shape[1])
+            asignacion[e] = candidatos[c]
+            costes[e, :] = np.inf
+            costes[:, c] = np.inf
+
+        self.ultima_asignacion = asignacion
+        return asignacion
@@ -0,0 +1,61 @@
+import numpy as np
+
+from src.ia.campo_flujo import distancias_con_borde
+
+
+class TablaLandmarks:
+    # Heurística ALT: distancias exactas desde unos pocos landmarks, recalculadas cuando cambia el grid.
+    # Por la desigualdad triangular, |d(L, meta) - d(L, n)| es una cota inferior de d(n, meta).
+
+    def __init__(self, grid_ocupacion, num_landmarks=4):
+        self.grid_ocupacion = grid_ocupacion
+        self.num_landmarks = num_landmarks
+        self.version = -1
+        self.landmarks = []
+        # (landmarks x rows x cols); infinito en las celdas no alcanzables desde el landmark.
+        self.distancias = np.empty((0, grid_ocupacion.rows, grid_ocupacion.cols))
+
+    def sincronizar(self):
+        if self.grid_ocupacion.version != self.version:
+            self._calcular()
+            self.version = self.grid_ocupacion.version
+
+    def _calcular(self):
+        # Selección por punto más lejano: cada landmark nuevo maximiza la distancia al más cercano de los
+        # ya elegidos, lo que los reparte por los bordes del mapa.
+        grid = self.grid_ocupacion
+        libres = np.argwhere(grid.celdas == 0)
+        self.landmarks = []
+        tablas = []
+        if len(libres):
+            semilla = (int(libres[0, 0]), int(libres[0, 1]))
+            cercania = self._distancias_desde(semilla)
+            for _ in range(self.num_landmarks):
+                alcanzables = np.where(np.isfinite(cercania), cercania, -1.0)
+                indice = int(np.argmax(alcanzables))
+                if alcanzables.flat[indice] <= 0 and self.landmarks:
+                    break
+                landmark = divmod(indice, grid.cols)
+                tabla = self._distancias_desde(landmark)
+                self.landmarks.append(landmark)
+                tablas.append(tabla)
+                cercania = tabla if len(tablas) == 1 else np.minimum(cercania, tabla)
+
+        self.distancias = (np.array(tablas) if tablas
+                           else np.empty((0, grid.rows, grid.cols)))
+
+    def _distancias_desde(self, celda):
+        return distancias_con_borde(self.grid_ocupacion, celda)[1:-1, 1:-1]
+
+    def cota_inferior(self, meta):
+        # Array (rows x cols) con la cota ALT hacia `meta`; 0 donde algún valor no es finito.
+        self.sincronizar()
+        grid = self.grid_ocupacion
+        if len(self.landmarks) == 0 or not (0 <= meta[0] < grid.rows and 0 <= meta[1] < grid.cols):
+            return np.zeros((grid.rows, grid.cols))
+
+        hacia_meta = self.distancias[:, meta[0], meta[1]][:, np.newaxis, np.newaxis]
+        with np.errstate(invalid="ignore"):
+            diferencias = np.abs(hacia_meta - self.distancias)
+        diferencias[~np.isfinite(diferencias)] = 0.0
+        return diferencias.max(axis=0)
@@ -0,0 +1,89 @@
+import numpy as np
+
+
+def segmentos_cortan_rects(origenes, destinos, rects):
+    # Recorte de Liang-Barsky vectorizado: devuelve una matriz (segmentos x rects) que indica si cada
+    # segmento atraviesa el interior abierto de cada rectángulo [x0, y0, x1, y1].
+    origenes = np.asarray(origenes, dtype=np.float64).reshape(-1, 1, 2)
+    destinos = np.asarray(destinos, dtype=np.float64).reshape(-1, 1, 2)
+    rects = np.asarray(rects, dtype=np.float64).reshape(1, -1, 4)
+    delta = destinos - origenes
+
+    t_entrada = np.zeros((origenes.shape[0], rects.shape[1]))
+    t_salida = np.ones_like(t_entrada)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for eje in (0, 1):
+            p = origenes[..., eje]
+            d = delta[..., eje]
+            t1 = (rects[..., eje] - p) / d
+            t2 = (rects[..., eje + 2] - p) / d
+            paralelo = d == 0
+            dentro = (rects[..., eje] < p) & (p < rects[..., eje + 2])
+            t_min = np.where(paralelo, np.where(dentro, -np.inf, np.inf), np.minimum(t1, t2))
+            t_max = np.where(paralelo, np.where(dentro, np.inf, -np.inf), np.maximum(t1, t2))
+            t_entrada = np.maximum(t_entrada, t_min)
+            t_salida = np.minimum(t_salida, t_max)
+
+    return t_entrada < t_salida
+
+
+class LineaVision:
+    # Responde en una sola llamada si hay obstáculo entre muchos pares (origen, destino). Los rectángulos
+    # se recalculan solo cuando cambia la versión del grid de ocupación.
+
+    def __init__(self, margen=0):
+        self.margen = margen
+        self.version = -1
+        self.rects = np.empty((0, 4))
+        self._rects_lista = []
+
+    def sincronizar(self, obstaculos, version):
+        if version != self.version:
+            self.reconstruir(obstaculos)
+            self.version = version
+
+    def reconstruir(self, obstaculos):
+        m = self.margen
+        self.rects = np.array(
+            [(o.x - m, o.y - m, o.x + o.ancho + m, o.y + o.alto + m) for o in obstaculos],
+            dtype=np.float64
+        ).reshape(-1, 4)
+        self._rects_lista = self.rects.tolist()
+
+    def bloqueados(self, origenes, destinos, rects=None):
+        # Vector booleano: True si el segmento i atraviesa algún obstáculo.
+        rects = self.rects if rects is None else rects
+        n = len(origenes)
+        if n == 0 or len(rects) == 0:
+            return np.zeros(n, dtype=bool)
+        return segmentos_cortan_rects(origenes, destinos, rects).any(axis=1)
+
+    def bloqueado(self, origen, destino):
+        # Consulta suelta: para un único segmento el mismo recorte en Python puro es más barato que NumPy.
+        ox, oy = origen
+        dx = destino[0] - ox
+        dy = destino[1] - oy
+        for x0, y0, x1, y1 in self._rects_lista:
+            t_entrada, t_salida = 0.0, 1.0
+            for p, d, bajo, alto in ((ox, dx, x0, x1), (oy, dy, y0, y1)):
+                if d == 0:
+                    if not bajo < p < alto:
+                        t_salida = -1.0
+                        break
+                    continue
+                t1 = (bajo - p) / d
+                t2 = (alto - p) / d
+                if t1 > t2:
+                    t1, t2 = t2, t1
+                t_entrada = max(t_entrada, t1)
+                t_salida = min(t_salida, t2)
+            if t_entrada < t_salida:
+                return True
+        return False
+
+    def dentro_de_rects(self, puntos):
+        # Matriz (puntos x rects) de pertenencia al interior abierto de cada rectángulo.
+        puntos = np.asarray(puntos, dtype=np.float64).reshape(-1, 1, 2)
+        r = self.rects[np.newaxis]
+        return ((r[..., 0] < puntos[..., 0]) & (puntos[..., 0] < r[..., 2]) &
+                (r[..., 1] < puntos[..., 1]) & (puntos[..., 1] < r[..., 3]))
@@ -0,0 +1,197 @@
+import heapq
+import sys
+import time
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+# Vecinos en el mismo orden en que los recorría la implementación original (di externo, dj interno),
+# para que los empates se resuelvan igual y las rutas sean idénticas.
+DIRECCIONES = [(di, dj) for di in (-1, 0, 1) for dj in (-1, 0, 1) if di != 0 or dj != 0]
+PENALIZACION_GIRO = 0.1
+# Cada cuántas expansiones se consulta el reloj cuando la búsqueda tiene límite de tiempo.
+INTERVALO_RELOJ = 128
+
+
+class MotorAEstrella:
+    def __init__(self, grid_ocupacion, max_heuristicas=4, landmarks=None):
+        self.grid_ocupacion = grid_ocupacion
+        cols_borde = grid_ocupacion.cols_borde
+        total = (grid_ocupacion.rows + 2) * cols_borde
+
+        # Buffers reutilizados entre búsquedas. Una celda solo es válida en la búsqueda actual si su
+        # marca coincide con `_generacion`, así no hay que limpiarlos en cada llamada.
+        self._g = array('d', [0.0]) * total
+        self._padre = array('l', [-1]) * total
+        self._direccion = array('b', [-1]) * total
+        self._visto = array('L', [0]) * total
+        self._cerrado = array('L', [0]) * total
+        self._generacion = 0
+
+        # (desplazamiento plano, dirección, coste recto, coste con giro) sobre el grid con borde.
+        self._vecinos = []
+        for direccion, (di, dj) in enumerate(DIRECCIONES):
+            coste = 1.414 if di != 0 and dj != 0 else 1.0
+            self._vecinos.append((di * cols_borde + dj, direccion, coste, coste + PENALIZACION_GIRO))
+
+        self.max_heuristicas = max_heuristicas
+        self._heuristicas = OrderedDict()
+        # Tabla ALT opcional (TablaLandmarks); si está, la heurística es el máximo de ambas cotas.
+        self.landmarks = landmarks
+
+        self.expansiones = 0
+        self.expansiones_totales = 0
+        self.busquedas = 0
+        # True si la última búsqueda agotó su presupuesto y devolvió una ruta parcial.
+        self.truncada = False
+
+    def buscar(self, inicio, meta, max_expansiones=None, limite_tiempo=None, coste_extra=None):
+        # Con presupuesto, si se agota antes de llegar a la meta se devuelve la ruta hasta el nodo
+        # expandido más cercano a ella según la heurística. `coste_extra` (índice con borde -> coste)
+        # encarece pisar ciertas celdas, p. ej. las reservadas por otros enemigos.
+        grid = self.grid_ocupacion
+        self.expansiones = 0
+        self.truncada = False
+        self.busquedas += 1
+
+        if inicio == meta:
+            return [inicio]
+        if not (0 <= meta[0] < grid.rows and 0 <= meta[1] < grid.cols):
+            return []
+
+        libres = grid.libres_con_borde()
+        indice_meta = grid.indice_borde(meta[0], meta[1])
+        if not libres[indice_meta]:
+            return []
+
+        h = self._heuristica_para(meta)
+        generacion = self._nueva_generacion()
+        g = self._g
+        padre = self._padre
+        direccion = self._direccion
+        visto = self._visto
+        cerrado = self._cerrado
+        vecinos = self._vecinos
+
+        heap = []
+        inicio_en_grid = 0 <= inicio[0] < grid.rows and 0 <= inicio[1] < grid.cols
+        if inicio_en_grid:
+            indice_inicio = grid.indice_borde(inicio[0], inicio[1])
+            visto[indice_inicio] = generacion
+            g[indice_inicio] = 0.0
+            padre[indice_inicio] = -1
+            direccion[indice_inicio] = -1
+            heap.append((0, indice_inicio))
+        else:
+            # Un enemigo fuera del grid solo puede entrar por sus vecinos dentro del mapa.
+            for d, (di, dj) in enumerate(DIRECCIONES):
+                ni, nj = inicio[0] + di, inicio[1] + dj
+                if 0 <= ni < grid.rows and 0 <= nj < grid.cols:
+                    vecino = grid.indice_borde(ni, nj)
+                    if libres[vecino]:
+                        coste = vecinos[d][2]
+                        visto[vecino] = generacion
+                        g[vecino] = coste
+                        padre[vecino] = -1
+                        direccion[vecino] = d
+                        heapq.heappush(heap, (coste + h[vecino], vecino))
+
+        limite = sys.maxsize if max_expansiones is None else max_expansiones
+        mejor_parcial = -1
+        mejor_h = float("inf")
+        expansiones = 0
+        while heap:
+            _, actual = heapq.heappop(heap)
+
+            if actual == indice_meta:
+                break
+            if cerrado[actual] == generacion:
+                continue
+            if expansiones >= limite or (limite_tiempo is not None and expansiones % INTERVALO_RELOJ == 0
+                                         and expansiones and time.perf_counter() >= limite_tiempo):
+                self.truncada = True
+                break
+            cerrado[actual] = generacion
+            expansiones += 1
+            if h[actual] < mejor_h:
+                mejor_h = h[actual]
+                mejor_parcial = actual
+
+            g_actual = g[actual]
+            direccion_previa = direccion[actual]
+
+            for desplazamiento, d, coste, coste_giro in vecinos:
+                vecino = actual + desplazamiento
+                if not libres[vecino]:
+                    continue
+
+                if direccion_previa >= 0 and d != direccion_previa:
+                    nuevo = g_actual + coste_giro
+                else:
+                    nuevo = g_actual + coste
+                if coste_extra is not None:
+                    nuevo += coste_extra.get(vecino, 0.0)
+
+                if visto[vecino] != generacion or nuevo < g[vecino]:
+                    visto[vecino] = generacion
+                    g[vecino] = nuevo
+                    padre[vecino] = actual
+                    direccion[vecino] = d
+                    # Si ya estaba cerrado se reabre, igual que hacía la versión con diccionarios.
+                    cerrado[vecino] = 0
+                    heapq.heappush(heap, (nuevo + h[vecino], vecino))
+
+        self.expansiones = expansiones
+        self.expansiones_totales += expansiones
+
+        fin = indice_meta
+        if self.truncada or visto[indice_meta] != generacion:
+            if not self.truncada or mejor_parcial < 0:
+                return []
+            fin = mejor_parcial
+
+        path = []
+        nodo = fin
+        while nodo != -1:
+            path.append(grid.celda_desde_borde(nodo))
+            nodo = padre[nodo]
+        if not inicio_en_grid:
+            path.append(inicio)
+        path.reverse()
+
+        return path
+
+    def _nueva_generacion(self):
+        self._generacion += 1
+        if self._generacion >= 0xFFFFFFFF:
+            total = len(self._visto)
+            self._visto = array('L', [0]) * total
+            self._cerrado = array('L', [0]) * total
+            self._generacion = 1
+        return self._generacion
+
+    def _heuristica_para(self, meta):
+        clave = meta
+        if self.landmarks is not None:
+            self.landmarks.sincronizar()
+            clave = (meta, self.landmarks.version)
+        h = self._heuristicas.get(clave)
+        if h is not None:
+            self._heuristicas.move_to_end(clave)
+            return h
+
+        grid = self.grid_ocupacion
+        di = meta[0] - (np.arange(grid.rows + 2) - 1)[:, np.newaxis]
+        dj = meta[1] - (np.arange(grid.cols_borde) - 1)[np.newaxis, :]
+        h_euclidiana = np.sqrt(di * di + dj * dj)
+        h_manhattan = np.abs(di) + np.abs(dj)
+        h = 0.7 * h_euclidiana + 0.3 * h_manhattan
+        if self.landmarks is not None:
+            np.maximum(h[1:-1, 1:-1], self.landmarks.cota_inferior(meta), out=h[1:-1, 1:-1])
+        h = h.ravel().tolist()
+
+        if len(self._heuristicas) >= self.max_heuristicas:
+            self._heuristicas.popitem(last=False)
+        self._heuristicas[clave] = h
+        return h
@@ -0,0 +1,300 @@
+import itertools
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Cabecera de la memoria compartida: [secuencia, número de obstáculos]. La secuencia es impar mientras el
+# hilo principal escribe, así los trabajadores detectan y repiten una lectura a medias.
+TAM_CABECERA = 2
+# Pausa antes de repetir la lectura mientras el hilo principal tiene el mapa a medio escribir.
+ESPERA_LECTURA_S = 0.00005
+# Modos que reparten objetivos y reservas entre todos los enemigos: se planifican juntos en una sola tarea.
+MODOS_CONJUNTOS = ("cooperativo",)
+
+
+class ObstaculoCompartido:
+    __slots__ = ("x", "y", "ancho", "alto")
+
+    def __init__(self, x, y, ancho, alto):
+        self.x = x
+        self.y = y
+        self.ancho = ancho
+        self.alto = alto
+
+
+class AgenteRemoto:
+    # Sustituto de enemigo o jugador dentro del trabajador: los planificadores solo leen la posición.
+    __slots__ = ("x", "y", "__weakref__")
+
+    def __init__(self, x=0.0, y=0.0):
+        self.x = x
+        self.y = y
+
+
+class MapaCompartido:
+    # Grid de ocupación y rectángulos de los obstáculos en un bloque de memoria compartida.
+
+    def __init__(self, rows, cols, capacidad_obstaculos=256, nombre=None):
+        self.rows = rows
+        self.cols = cols
+        self.capacidad_obstaculos = capacidad_obstaculos
+        tam = TAM_CABECERA * 8 + capacidad_obstaculos * 4 * 8 + rows * cols
+        if nombre is None:
+            self.memoria = shared_memory.SharedMemory(create=True, size=tam)
+            self.propietario = True
+        else:
+            self.memoria = shared_memory.SharedMemory(name=nombre)
+            self.propietario = False
+
+        buffer = self.memoria.buf
+        self.cabecera = np.ndarray((TAM_CABECERA,), dtype=np.int64, buffer=buffer)
+        self.rects = np.ndarray((capacidad_obstaculos, 4), dtype=np.float64, buffer=buffer,
+                                offset=TAM_CABECERA * 8)
+        self.celdas = np.ndarray((rows, cols), dtype=np.uint8, buffer=buffer,
+                                 offset=TAM_CABECERA * 8 + capacidad_obstaculos * 4 * 8)
+        if self.propietario:
+            self.cabecera[:] = 0
+
+    @property
+    def nombre(self):
+        return self.memoria.name
+
+    def publicar(self, celdas, obstaculos):
+        self.cabecera[0] += 1
+        self.celdas[...] = celdas
+        for k, o in enumerate(obstaculos):
+            self.rects[k] = (o.x, o.y, o.ancho, o.alto)
+        self.cabecera[1] = len(obstaculos)
+        self.cabecera[0] += 1
+
+    def leer(self):
+        # Devuelve (secuencia, celdas, obstáculos) con una copia coherente del mapa publicado.
+        while True:
+            secuencia = int(self.cabecera[0])
+            if secuencia % 2:
+                time.sleep(ESPERA_LECTURA_S)
+                continue
+            num = int(self.cabecera[1])
+            celdas = self.celdas.copy()
+            rects = self.rects[:num].tolist()
+            if int(self.cabecera[0]) == secuencia:
+                return secuencia, celdas, [ObstaculoCompartido(*r) for r in rects]
+
+    def cerrar(self):
+        self.cabecera = self.rects = self.celdas = None
+        self.memoria.close()
+        if self.propietario:
+            self.memoria.unlink()
+
+
+# Estado de cada trabajador: su propio algoritmo de persecución, el mapa adjunto y los sustitutos de enemigos.
+_local = threading.local()
+
+
+def _iniciar_trabajador(configuracion):
+    _local.configuracion = configuracion
+
+
+def _estado_trabajador():
+    if getattr(_local, "algoritmo", None) is None:
+        # Importación diferida: evita el ciclo con smart_chase_algorithm al cargar el módulo.
+        from src.ia.smart_chase_algorithm import AlgoritmoPersecucionInteligente
+        _local.algoritmo = AlgoritmoPersecucionInteligente(**_local.configuracion)
+        _local.mapa = None
+        _local.secuencia = -1
+        _local.obstaculos = []
+        _local.enemigos = {}
+    return _local
+
+
+def _preparar_remoto(nombre_mapa, forma, capacidad, vivos, pos_jugador, historial):
+    # Deja el trabajador listo para planificar: mapa al día, historial del jugador y solo los sustitutos de
+    # los enemigos vivos asignados a él, para que su estado de planificación no se acumule entre episodios.
+    estado = _estado_trabajador()
+    algoritmo = estado.algoritmo
+
+    if estado.mapa is None or estado.mapa.nombre != nombre_mapa:
+        if estado.mapa is not None:
+            estado.mapa.cerrar()
+        estado.mapa = MapaCompartido(forma[0], forma[1], capacidad, nombre=nombre_mapa)
+        estado.secuencia = -1
+    if int(estado.mapa.cabecera[0]) != estado.secuencia:
+        estado.secuencia, celdas, estado.obstaculos = estado.mapa.leer()
+        algoritmo.grid_ocupacion.cargar(celdas, estado.obstaculos)
+
+    vivos = set(vivos)
+    for identificador in [i for i in estado.enemigos if i not in vivos]:
+        del estado.enemigos[identificador]
+    algoritmo.historial_jugador = deque(historial, maxlen=algoritmo.historial_jugador.maxlen)
+    return estado, AgenteRemoto(*pos_jugador)
+
+
+def _enemigo_remoto(estado, identificador, posicion):
+    enemigo = estado.enemigos.get(identificador)
+    if enemigo is None:
+        enemigo = estado.enemigos[identificador] = AgenteRemoto()
+    enemigo.x, enemigo.y = posicion
+    return enemigo
+
+
+def _planificar_remoto(nombre_mapa, forma, capacidad, vivos, num_enemigos, id_enemigo, pos_enemigo, pos_jugador,
+                       historial, modo):
+    estado, jugador = _preparar_remoto(nombre_mapa, forma, capacidad, vivos, pos_jugador, historial)
+    algoritmo = estado.algoritmo
+    enemigo = _enemigo_remoto(estado, id_enemigo, pos_enemigo)
+    # Cada tarea recibe la misma parte del presupuesto que tendría el enemigo en el hilo principal.
+    algoritmo.presupuesto.iniciar(num_enemigos)
+    accion = algoritmo.calcular_mejor_accion(enemigo, jugador, estado.obstaculos, modo)
+    algoritmo.presupuesto.finalizar()
+    return accion
+
+
+def _planificar_conjunto_remoto(nombre_mapa, forma, capacidad, ids, posiciones, pos_jugador, historial, modo):
+    estado, jugador = _preparar_remoto(nombre_mapa, forma, capacidad, ids, pos_jugador, historial)
+    algoritmo = estado.algoritmo
+    enemigos = [_enemigo_remoto(estado, i, p) for i, p in zip(ids, posiciones)]
+    algoritmo.presupuesto.iniciar(len(enemigos))
+    acciones = algoritmo.calcular_acciones(enemigos, jugador, estado.obstaculos, modo)
+    algoritmo.presupuesto.finalizar()
+    return dict(zip(ids, acciones))
+
+
+class EstadoAsincrono:
+    def __init__(self, identificador):
+        self.identificador = identificador
+        self.trabajador = None
+        self.futuro = None
+        self.tick_futuro = -1
+        self.accion = None
+        self.tick_accion = -1
+
+
+class PlanificadorAsincrono:
+    # Planifica los enemigos en un pool de procesos (o de hilos) sin bloquear el paso del entorno. Cada
+    # enemigo aplica la última acción terminada; si esa acción tiene más de `max_retraso` ticks se espera
+    # al plan en curso, de modo que el retraso queda acotado. Cada trabajador es un pool de un solo proceso
+    # y cada enemigo se asigna siempre al mismo, así su estado de planificación en caliente sigue en un sitio.
+    # Los modos de MODOS_CONJUNTOS planifican a todos los enemigos en una sola tarea.
+
+    def __init__(self, algoritmo_ia, num_trabajadores=2, max_retraso=2, usar_procesos=True,
+                 capacidad_obstaculos=256):
+        self.algoritmo_ia = algoritmo_ia
+        self.max_retraso = max_retraso
+        self.usar_procesos = usar_procesos
+
+        grid = algoritmo_ia.grid_ocupacion
+        self.mapa = MapaCompartido(grid.rows, grid.cols, capacidad_obstaculos)
+        self._version_publicada = -1
+
+        tipo_pool = ProcessPoolExecutor if usar_procesos else ThreadPoolExecutor
+        self.pools = [tipo_pool(max_workers=1, initializer=_iniciar_trabajador,
+                                initargs=(algoritmo_ia.configuracion,))
+                      for _ in range(num_trabajadores)]
+
+        self._estados = weakref.WeakKeyDictionary()
+        self._identificadores = itertools.count()
+        self._conjunto = EstadoAsincrono(None)
+        self.tick = 0
+        self.esperas = 0
+
+    def calcular_acciones(self, enemigos, jugador, obstaculos, modo="hibrido"):
+        self.tick += 1
+        self._publicar_mapa(obstaculos)
+        historial = list(self.algoritmo_ia.historial_jugador)
+        estados = [self._estado(enemigo) for enemigo in enemigos]
+        if modo in MODOS_CONJUNTOS:
+            return self._calcular_conjunto(enemigos, estados, jugador, historial, modo)
+
+        vivos = [[] for _ in self.pools]
+        for estado in estados:
+            vivos[estado.trabajador].append(estado.identificador)
+
+        for enemigo, estado in zip(enemigos, estados):
+            self._recoger(estado)
+            if estado.futuro is None:
+                estado.futuro = self.pools[estado.trabajador].submit(
+                    _planificar_remoto, self.mapa.nombre, (self.mapa.rows, self.mapa.cols),
+                    self.mapa.capacidad_obstaculos, vivos[estado.trabajador], len(enemigos), estado.identificador,
+                    (enemigo.x, enemigo.y), (jugador.x, jugador.y), historial, modo
+                )
+                estado.tick_futuro = self.tick
+
+        acciones = []
+        for estado in estados:
+            if estado.accion is None or self.tick - estado.tick_accion > self.max_retraso:
+                self._esperar(estado)
+            acciones.append(estado.accion)
+        return acciones
+
+    def _calcular_conjunto(self, enemigos, estados, jugador, historial, modo):
+        # `accion` guarda aquí un diccionario identificador -> acción con el último plan conjunto terminado.
+        conjunto = self._conjunto
+        ids = [estado.identificador for estado in estados]
+
+        def lanzar():
+            conjunto.futuro = self.pools[0].submit(
+                _planificar_conjunto_remoto, self.mapa.nombre, (self.mapa.rows, self.mapa.cols),
+                self.mapa.capacidad_obstaculos, ids, [(e.x, e.y) for e in enemigos], (jugador.x, jugador.y),
+                historial, modo
+            )
+            conjunto.tick_futuro = self.tick
+
+        self._recoger(conjunto)
+        if conjunto.futuro is None:
+            lanzar()
+        if (conjunto.accion is None or self.tick - conjunto.tick_accion > self.max_retraso or
+                any(i not in conjunto.accion for i in ids)):
+            self._esperar(conjunto)
+            if any(i not in conjunto.accion for i in ids):
+                # El plan en curso se lanzó antes de que apareciera algún enemigo.
+                lanzar()
+                self._esperar(conjunto)
+        return [conjunto.accion[i] for i in ids]
+
+    def _estado(self, enemigo):
+        estado = self._estados.get(enemigo)
+        if estado is None:
+            estado = EstadoAsincrono(next(self._identificadores))
+            estado.trabajador = estado.identificador % len(self.pools)
+            self._estados[enemigo] = estado
+        return estado
+
+    def _esperar(self, estado):
+        self.esperas += 1
+        estado.accion = estado.futuro.result()
+        estado.tick_accion = estado.tick_futuro
+        estado.futuro = None
+
+    def _recoger(self, estado):
+        futuro = estado.futuro
+        if futuro is None or not futuro.done():
+            return
+        estado.futuro = None
+        if futuro.exception() is None:
+            estado.accion = futuro.result()
+            estado.tick_accion = estado.tick_futuro
+
+    def _publicar_mapa(self, obstaculos):
+        grid = self.algoritmo_ia.grid_ocupacion
+        self.algoritmo_ia._obtener_grid(obstaculos)
+        if grid.version == self._version_publicada:
+            return
+        if len(obstaculos) > self.mapa.capacidad_obstaculos:
+            # Se crea un bloque mayor; los trabajadores se adjuntan al nuevo al ver que cambia el nombre.
+            anterior = self.mapa
+            self.mapa = MapaCompartido(grid.rows, grid.cols, 2 * len(obstaculos))
+            anterior.cerrar()
+        self.mapa.publicar(grid.celdas, obstaculos)
+        self._version_publicada = grid.version
+
+    def cerrar(self):
+        for pool in self.pools:
+            pool.shutdown(wait=True, cancel_futures=True)
+        if self.mapa is not None:
+            self.mapa.cerrar()
+            self.mapa = None
@@ -0,0 +1,61 @@
+import time
+
+
+class PresupuestoTick:
+    # Presupuesto de planificación compartido por todos los enemigos de un paso del entorno. Cada enemigo
+    # recibe una parte proporcional de lo que queda, así el primero no deja sin tiempo a los demás.
+
+    def __init__(self, limite_ms=None, max_expansiones=None):
+        self.limite_ms = limite_ms
+        self.max_expansiones = max_expansiones
+
+        self._inicio = time.perf_counter()
+        self._pendientes = 0
+        self.usado_ms = 0.0
+        self.expansiones = 0
+        self.planes_truncados = 0
+        self.enemigos_planificados = 0
+
+    def iniciar(self, num_enemigos):
+        self._inicio = time.perf_counter()
+        self._pendientes = num_enemigos
+        self.usado_ms = 0.0
+        self.expansiones = 0
+        self.planes_truncados = 0
+        self.enemigos_planificados = 0
+
+    def finalizar(self):
+        self.usado_ms = (time.perf_counter() - self._inicio) * 1000.0
+
+    def siguiente_enemigo(self):
+        # Devuelve (instante límite en perf_counter, máximo de expansiones) para el próximo enemigo;
+        # None en cualquiera de los dos significa sin límite.
+        pendientes = max(self._pendientes, 1)
+        self._pendientes = max(self._pendientes - 1, 0)
+        self.enemigos_planificados += 1
+
+        limite_tiempo = None
+        if self.limite_ms is not None:
+            ahora = time.perf_counter()
+            restante = max(self.limite_ms / 1000.0 - (ahora - self._inicio), 0.0)
+            limite_tiempo = ahora + restante / pendientes
+
+        limite_expansiones = None
+        if self.max_expansiones is not None:
+            limite_expansiones = max(self.max_expansiones - self.expansiones, 0) // pendientes
+        return limite_tiempo, limite_expansiones
+
+    def registrar(self, expansiones, truncado):
+        self.expansiones += expansiones
+        if truncado:
+            self.planes_truncados += 1
+
+    def informe(self):
+        return {
+            "limite_ms": self.limite_ms,
+            "usado_ms": self.usado_ms,
+            "max_expansiones": self.max_expansiones,
+            "expansiones": self.expansiones,
+            "planes_truncados": self.planes_truncados,
+            "enemigos_planificados": self.enemigos_planificados
+        }
@@ -0,0 +1,117 @@
+import weakref
+
+from src.ia.campo_flujo import ACCION_QUIETO
+
+# Un enemigo que sigue su ruta solo puede haber avanzado unas pocas celdas desde el último replan.
+MAX_AVANCE_RUTA = 3
+
+
+class EstadoReplan:
+    def __init__(self):
+        self.ruta = None
+        self.celda_jugador = None
+        self.celda_predicha = None
+        self.version_grid = -1
+        self.edad = 0
+        self.accion = ACCION_QUIETO
+        # Orden en que se le atendió por última vez; decide el turno entre enemigos con la misma prioridad.
+        self.ultimo_servicio = -1
+
+
+class ProgramadorReplanes:
+    # Envuelve al algoritmo de persecución: cada enemigo sigue la ruta de su último plan y solo se
+    # replanifica cuando algo la invalida. Como mucho `replanes_por_tick` enemigos planifican en cada paso,
+    # por turnos: primero los que no pueden seguir su ruta y, dentro de cada grupo, los atendidos hace más
+    # tiempo. Quien no tiene ruta y no entra en el tick repite su última acción hasta que le toque.
+
+    def __init__(self, algoritmo_ia, replanes_por_tick=2, edad_maxima=20):
+        self.algoritmo_ia = algoritmo_ia
+        self.replanes_por_tick = replanes_por_tick
+        self.edad_maxima = edad_maxima
+        self._estados = weakref.WeakKeyDictionary()
+        self._servicios = 0
+
+        self.replanes_tick = 0
+        self.replanes_totales = 0
+        self.seguimientos_totales = 0
+
+    def calcular_acciones(self, enemigos, jugador, obstaculos, modo="hibrido"):
+        algoritmo = self.algoritmo_ia
+        grid = algoritmo.grid_ocupacion
+        algoritmo._obtener_grid(obstaculos)
+        pos_predicha = algoritmo._predecir_posicion_jugador()
+        celda_jugador = algoritmo._pos_a_grid(jugador.x, jugador.y)
+        celda_predicha = algoritmo._pos_a_grid(pos_predicha[0], pos_predicha[1])
+
+        acciones = [None] * len(enemigos)
+        obligatorios = []
+        pendientes = []
+        for k, enemigo in enumerate(enemigos):
+            estado = self._estados.get(enemigo)
+            if estado is None:
+                estado = EstadoReplan()
+                self._estados[enemigo] = estado
+            estado.edad += 1
+
+            inicio = algoritmo._pos_a_grid(enemigo.x, enemigo.y)
+            resto = self._resto_ruta(estado, inicio)
+            if resto is None:
+                acciones[k] = estado.accion
+                obligatorios.append(k)
+                continue
+
+            acciones[k] = algoritmo._path_a_accion(resto, inicio)
+            if (estado.celda_jugador != celda_jugador or estado.celda_predicha != celda_predicha
+                    or estado.edad >= self.edad_maxima):
+                pendientes.append(k)
+
+        def turno(k):
+            return self._estados[enemigos[k]].ultimo_servicio
+
+        obligatorios.sort(key=turno)
+        pendientes.sort(key=turno)
+        replanificar = (obligatorios + pendientes)[:self.replanes_por_tick]
+
+        if replanificar:
+            lote = [enemigos[k] for k in replanificar]
+            for enemigo in lote:
+                algoritmo._contexto(enemigo).ruta_plan = None
+            nuevas = algoritmo.calcular_acciones(lote, jugador, obstaculos, modo)
+            for k, enemigo, accion in zip(replanificar, lote, nuevas):
+                acciones[k] = accion
+                estado = self._estados[enemigo]
+                ruta = algoritmo._contexto(enemigo).ruta_plan
+                estado.ruta = list(ruta) if ruta and len(ruta) >= 2 else None
+                estado.celda_jugador = celda_jugador
+                estado.celda_predicha = celda_predicha
+                estado.version_grid = grid.version
+                estado.edad = 0
+                estado.ultimo_servicio = self._servicios
+                self._servicios += 1
+        for enemigo, accion in zip(enemigos, acciones):
+            self._estados[enemigo].accion = accion
+
+        self.replanes_tick = len(replanificar)
+        self.replanes_totales += len(replanificar)
+        self.seguimientos_totales += len(enemigos) - len(replanificar)
+        return acciones
+
+    def _resto_ruta(self, estado, inicio):
+        # Tramo de la ruta guardada que queda por delante del enemigo, o None si ya no se puede seguir.
+        ruta = estado.ruta
+        if not ruta:
+            return None
+        try:
+            k = ruta.index(inicio, 0, MAX_AVANCE_RUTA)
+        except ValueError:
+            return None
+        grid = self.algoritmo_ia.grid_ocupacion
+        resto = ruta[k:]
+        if len(resto) < 2 or not grid.esta_libre(resto[1]):
+            return None
+        if estado.version_grid != grid.version:
+            if not all(grid.esta_libre(celda) for celda in resto[1:]):
+                return None
+            estado.version_grid = grid.version
+        estado.ruta = resto
+        return resto
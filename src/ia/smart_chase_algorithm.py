@@ -1,23 +1,119 @@
-import heapq
-import pygame
-import random
-from collections import deque
+from collections import deque, OrderedDict
 import math
+import weakref
+
+import numpy as np
+
+from src.ia.grid_ocupacion import GridOcupacion, PiramideOcupacion
+from src.ia.campo_flujo import CampoFlujo, MOVIMIENTOS, ACCION_QUIETO
+from src.ia.motor_a_estrella import MotorAEstrella
+from src.ia.hpa_estrella import GrafoJerarquico
+from src.ia.grafo_visibilidad import GrafoVisibilidad
+from src.ia.linea_vision import LineaVision
+from src.ia.campo_repulsion import CampoRepulsion, fuerzas_a_acciones
+from src.ia.presupuesto import PresupuestoTick
+from src.ia.cache_rutas import CacheRutas
+from src.ia.landmarks_alt import TablaLandmarks
+from src.ia.interceptacion import (PlanificadorCooperativo, RADIO_PERSECUCION_DIRECTA, PENALIZACION_RESERVA,
+                                   HORIZONTE_RESERVA)
+from src.ia.contexto_planificador import ContextoPlanificador
+
+# Pasos de la ruta gruesa hasta el punto de paso que se refina en el grid fino.
+PASOS_REFINADO = 2
+# Celdas que se trazan de la ruta de los planificadores sin ruta explícita (campo de flujo, D* Lite, grafo de
+# visibilidad) para que el programador de replanes pueda seguirla entre replanes.
+PASOS_RUTA_TRAZADA = 12
 
 
 class AlgoritmoPersecucionInteligente:
-    def __init__(self, ancho_mapa, alto_mapa, cell_size=15):
+    def __init__(self, ancho_mapa, alto_mapa, cell_size=15, backend_busqueda="a_star", max_campos_flujo=4,
+                 tam_cluster=10, presupuesto_ms=None, presupuesto_expansiones=None, capacidad_cache_rutas=256,
+                 usar_landmarks=False, num_landmarks=4, factor_grueso=3):
         self.ancho_mapa = ancho_mapa
         self.alto_mapa = alto_mapa
         self.cell_size = cell_size
         self.cols = ancho_mapa // cell_size
         self.rows = alto_mapa // cell_size
+        # Parámetros de construcción, para crear en otro proceso un planificador equivalente.
+        self.configuracion = dict(ancho_mapa=ancho_mapa, alto_mapa=alto_mapa, cell_size=cell_size,
+                                  backend_busqueda=backend_busqueda, max_campos_flujo=max_campos_flujo,
+                                  tam_cluster=tam_cluster, presupuesto_ms=presupuesto_ms,
+                                  presupuesto_expansiones=presupuesto_expansiones,
+                                  capacidad_cache_rutas=capacidad_cache_rutas, usar_landmarks=usar_landmarks,
+                                  num_landmarks=num_landmarks, factor_grueso=factor_grueso)
         
         self.historial_jugador = deque(maxlen=10) # Historial de posiciones del jugador para la predicción de movimiento.
-        self.poblacion_rutas = []
+        # Grid de ocupación compartido por todos los modos; solo se reconstruye cuando cambian los obstáculos.
+        self.grid_ocupacion = GridOcupacion(ancho_mapa, alto_mapa, cell_size)
+        # Con `usar_landmarks` el A* añade la cota ALT, que se recalcula solo cuando cambia el mapa.
+        self.landmarks = TablaLandmarks(self.grid_ocupacion, num_landmarks) if usar_landmarks else None
+        self.motor_a_estrella = MotorAEstrella(self.grid_ocupacion, landmarks=self.landmarks)
+        self.cache_rutas = CacheRutas(capacidad_cache_rutas)
+        # Nivel grueso para los enemigos lejanos; se deriva del grid fino cuando cambia su versión.
+        self.piramide = PiramideOcupacion(self.grid_ocupacion, factor_grueso)
+        self.motor_grueso = MotorAEstrella(self.piramide.grueso)
+
+        # "a_star" busca una ruta por enemigo; "flujo" comparte un campo de direcciones por meta entre todos.
+        self.backend_busqueda = backend_busqueda
+        self.max_campos_flujo = max_campos_flujo
+        self._campos_flujo = OrderedDict()
+        # Estado de planificación por enemigo; desaparece junto con el enemigo al reiniciar el episodio.
+        self._contextos = weakref.WeakKeyDictionary()
+        # Con la población del tick anterior como punto de partida bastan menos generaciones.
+        self.generaciones_calientes = 2
+        # La abstracción jerárquica solo se construye si se usa el modo "jerarquico".
+        self.tam_cluster = tam_cluster
+        self.grafo_jerarquico = None
+        self.grafo_visibilidad = None
+
+        self.linea_vision = LineaVision()
+        # Visibilidad enemigo -> jugador del tick actual: se resuelve en lote para todos los enemigos la
+        # primera vez que alguno la necesita.
+        self._bloqueo_directo = {}
+        self._tick_vision = None
+        self.campo_repulsion = CampoRepulsion(ancho_mapa, alto_mapa)
+        self.cooperativo = PlanificadorCooperativo(self.grid_ocupacion)
+
+        # Presupuesto por tick repartido entre los enemigos; sin límites solo mide el consumo.
+        self.presupuesto = PresupuestoTick(presupuesto_ms, presupuesto_expansiones)
+        self._limite_tiempo = None
+        self._limite_expansiones = None
+        # Si la última ruta de _a_star_con_heuristica_mejorada quedó cortada por el presupuesto.
+        self.ruta_truncada = False
+
+    def actualizar_obstaculos(self, obstaculos):
+        return self.grid_ocupacion.reconstruir(obstaculos)
+
+    def iniciar_tick(self, jugador, enemigos=(), obstaculos=None):
+        # Lo llama el entorno una vez por paso, antes de planificar para cada enemigo.
+        self._actualizar_historial_jugador(jugador)
+        self.presupuesto.iniciar(len(enemigos))
+
+        self._bloqueo_directo = {}
+        self._tick_vision = (jugador, list(enemigos), obstaculos) if enemigos and obstaculos is not None else None
+
+    def _resolver_vision_tick(self):
+        jugador, enemigos, obstaculos = self._tick_vision
+        self._tick_vision = None
+        self._sincronizar_linea_vision(obstaculos)
+        origenes = [(e.x, e.y) for e in enemigos]
+        bloqueados = self.linea_vision.bloqueados(origenes, [(jugador.x, jugador.y)] * len(enemigos))
+        self._bloqueo_directo = dict(zip(enemigos, bloqueados.tolist()))
+
+    def _sincronizar_linea_vision(self, obstaculos):
+        self._obtener_grid(obstaculos)
+        self.linea_vision.sincronizar(obstaculos, self.grid_ocupacion.version)
+
+    def _contexto(self, enemigo):
+        contexto = self._contextos.get(enemigo)
+        if contexto is None:
+            contexto = ContextoPlanificador(self.grid_ocupacion)
+            self._contextos[enemigo] = contexto
+        return contexto
 
     def calcular_mejor_accion(self, enemigo, jugador, obstaculos, modo="hibrido"):
 
+        self._asignar_presupuesto()
         if modo == "hibrido":
             return self._algoritmo_hibrido(enemigo, jugador, obstaculos)
         elif modo == "predictivo":
@@ -26,12 +122,54 @@ class AlgoritmoPersecucionInteligente:
             return self._campo_potencial(enemigo, jugador, obstaculos)
         elif modo == "genetico":
             return self._algoritmo_genetico(enemigo, jugador, obstaculos)
+        elif modo == "flujo":
+            return self._flujo_predictivo(enemigo, jugador, obstaculos)
+        elif modo == "incremental":
+            return self._d_star_incremental(enemigo, jugador, obstaculos)
+        elif modo == "jerarquico":
+            return self._a_star_jerarquico(enemigo, jugador, obstaculos)
+        elif modo == "visibilidad":
+            return self._grafo_visibilidad(enemigo, jugador, obstaculos)
+        elif modo == "cooperativo":
+            return self._interceptacion_cooperativa([enemigo], jugador, obstaculos)[0]
         else:
             return self._a_star_predictivo(enemigo, jugador, obstaculos)
 
-    def _algoritmo_hibrido(self, enemigo, jugador, obstaculos):
+    def calcular_acciones(self, enemigos, jugador, obstaculos, modo="hibrido"):
+        # Acciones de todos los enemigos de un tick; los que usan el campo potencial se evalúan en lote.
+        if modo == "campo_potencial":
+            return self._campo_potencial_lote(enemigos, jugador, obstaculos)
+        if modo == "cooperativo":
+            # El campo de flujo compartido gasta la parte del primer enemigo.
+            self._asignar_presupuesto()
+            return self._interceptacion_cooperativa(enemigos, jugador, obstaculos)
+        if modo != "hibrido":
+            return [self.calcular_mejor_accion(enemigo, jugador, obstaculos, modo) for enemigo in enemigos]
+
+        acciones = [None] * len(enemigos)
+        cercanos = []
+        for k, enemigo in enumerate(enemigos):
+            self._asignar_presupuesto()
+            submodo = self._submodo_hibrido(enemigo, jugador, obstaculos)
+            if submodo == "campo_potencial":
+                cercanos.append(k)
+            else:
+                acciones[k] = self._accion_submodo(enemigo, jugador, obstaculos, submodo)
+        if cercanos:
+            lote = self._campo_potencial_lote([enemigos[k] for k in cercanos], jugador, obstaculos)
+            for k, accion in zip(cercanos, lote):
+                acciones[k] = accion
+        return acciones
+
+    def _asignar_presupuesto(self):
+        self._limite_tiempo, self._limite_expansiones = self.presupuesto.siguiente_enemigo()
+
+    def _consumir_expansiones(self, expansiones, truncado):
+        self.presupuesto.registrar(expansiones, truncado)
+        if self._limite_expansiones is not None:
+            self._limite_expansiones = max(self._limite_expansiones - expansiones, 0)
 
-        self._actualizar_historial_jugador(jugador)  # Actualiza el historial de posiciones del jugador para la predicción.
+    def _submodo_hibrido(self, enemigo, jugador, obstaculos):
 
         dx = jugador.x - enemigo.x
         dy = jugador.y - enemigo.y
@@ -39,33 +177,40 @@ class AlgoritmoPersecucionInteligente:
 
         UMBRAL_LEJOS_GEN = 300
         UMBRAL_LEJOS = 200
-        UMBRAL_CERCA = 80
 
         if distancia > UMBRAL_LEJOS_GEN:
-            return self._algoritmo_genetico(enemigo, jugador, obstaculos, generaciones=3)
+            return "genetico"
         elif distancia > UMBRAL_LEJOS:
-            return self._a_star_predictivo(enemigo, jugador, obstaculos)
+            return "multinivel"
+        elif not self._hay_obstaculo_directo(enemigo, jugador, obstaculos):
+            return "campo_potencial"
         else:
-            if not self._hay_obstaculo_directo(enemigo, jugador, obstaculos):
-                return self._campo_potencial(enemigo, jugador, obstaculos)
-            else:
-                return self._a_star_predictivo(enemigo, jugador, obstaculos)
+            return "predictivo"
 
-    def _hay_obstaculo_directo(self, enemigo, jugador, obstaculos):
+    def _algoritmo_hibrido(self, enemigo, jugador, obstaculos):
+
+        submodo = self._submodo_hibrido(enemigo, jugador, obstaculos)
+        return self._accion_submodo(enemigo, jugador, obstaculos, submodo)
+
+    def _accion_submodo(self, enemigo, jugador, obstaculos, submodo):
+        if submodo == "genetico":
+            return self._algoritmo_genetico(enemigo, jugador, obstaculos, generaciones=3)
+        elif submodo == "campo_potencial":
+            return self._campo_potencial(enemigo, jugador, obstaculos)
+        elif submodo == "multinivel":
+            return self._a_star_multinivel(enemigo, jugador, obstaculos)
+        else:
+            return self._a_star_predictivo(enemigo, jugador, obstaculos)
 
-        steps = int(max(abs(enemigo.x - jugador.x), abs(enemigo.y - jugador.y)) // self.cell_size)
-        if steps == 0:
-            return False
+    def _hay_obstaculo_directo(self, enemigo, jugador, obstaculos):
 
-        for i in range(1, steps + 1):
-            t = i / float(steps)
-            x_inter = enemigo.x + (jugador.x - enemigo.x) * t
-            y_inter = enemigo.y + (jugador.y - enemigo.y) * t
-            punto = pygame.Rect(int(x_inter), int(y_inter), 2, 2)
-            for obs in obstaculos:
-                if punto.colliderect(obs.rect):
-                    return True
-        return False
+        if self._tick_vision is not None and self._tick_vision[0] is jugador:
+            self._resolver_vision_tick()
+        bloqueado = self._bloqueo_directo.get(enemigo)
+        if bloqueado is None:
+            self._sincronizar_linea_vision(obstaculos)
+            bloqueado = self.linea_vision.bloqueado((enemigo.x, enemigo.y), (jugador.x, jugador.y))
+        return bloqueado
 
     def _predecir_posicion_jugador(self):
         if len(self.historial_jugador) < 3:
@@ -95,253 +240,336 @@ class AlgoritmoPersecucionInteligente:
         return predicciones[2] if len(predicciones) > 2 else predicciones[0]
 
     def _a_star_predictivo(self, enemigo, jugador, obstaculos):
+        if self.backend_busqueda == "flujo":
+            return self._flujo_predictivo(enemigo, jugador, obstaculos)
+
         pos_predicha = self._predecir_posicion_jugador()
-        grid = self._crear_grid_mejorado(obstaculos)
+        self._obtener_grid(obstaculos)
         start = self._pos_a_grid(enemigo.x, enemigo.y)
         goal_pred = self._pos_a_grid(pos_predicha[0], pos_predicha[1])
         goal_actual = self._pos_a_grid(jugador.x, jugador.y)
-        path = self._a_star_con_heuristica_mejorada(grid, start, goal_pred)
+        contexto = self._contexto(enemigo)
+        path = self._ruta_en_caliente(contexto, start, goal_pred)
 
         if not path or len(path) < 2:
-            path = self._a_star_con_heuristica_mejorada(grid, start, goal_actual)
+            path = self._ruta_en_caliente(contexto, start, goal_actual)
 
         return self._path_a_accion(path, start)
 
-    def _campo_potencial(self, enemigo, jugador, obstaculos):
-        fx_atractiva = (jugador.x - enemigo.x)
-        fy_atractiva = (jugador.y - enemigo.y)
-
-        dist_jugador = max(math.sqrt(fx_atractiva ** 2 + fy_atractiva ** 2), 1)
-        fx_atractiva = fx_atractiva / dist_jugador * 10
-        fy_atractiva = fy_atractiva / dist_jugador * 10
-
-        fx_repulsiva = 0
-        fy_repulsiva = 0
-
-        radio_evitacion = 25
-        for obstaculo in obstaculos:
-            dist_x = enemigo.x - (obstaculo.x + obstaculo.ancho / 2)
-            dist_y = enemigo.y - (obstaculo.y + obstaculo.alto / 2)
-            distancia = math.sqrt(dist_x ** 2 + dist_y ** 2)
-
-            if distancia < 25:
-                factor_repulsion = 500 / max(distancia ** 2, 1)
-                fx_repulsiva += (dist_x / max(distancia, 1)) * factor_repulsion
-                fy_repulsiva += (dist_y / max(distancia, 1)) * factor_repulsion
-
-        fx_total = fx_atractiva + fx_repulsiva
-        fy_total = fy_atractiva + fy_repulsiva
-
-        return self._fuerza_a_accion(fx_total, fy_total)
-
-    def _algoritmo_genetico(self, enemigo, jugador, obstaculos, generaciones=5):
+    def _ruta_en_caliente(self, contexto, start, goal):
+        path = contexto.ruta_reutilizable(start, goal)
+        if path is None:
+            path = self._a_star_con_heuristica_mejorada(start, goal)
+            # Una ruta parcial por falta de presupuesto no termina en la meta y no sirve para el siguiente tick.
+            contexto.guardar_ruta([] if self.ruta_truncada else path, goal)
+        contexto.ruta_plan = path
+        return path
 
-        if not self.poblacion_rutas:
-            self._inicializar_poblacion_genetica(enemigo, jugador)
+    def _a_star_multinivel(self, enemigo, jugador, obstaculos):
+        # Ruta completa en el nivel grueso y refinamiento en el fino solo hasta el siguiente punto de paso.
+        if self.backend_busqueda == "flujo":
+            return self._flujo_predictivo(enemigo, jugador, obstaculos)
 
-        for _ in range(generaciones):
-            self._evaluar_poblacion(enemigo, jugador, obstaculos)
-            self._seleccion_y_reproduccion()
-            self._mutacion()
+        pos_predicha = self._predecir_posicion_jugador()
+        self._obtener_grid(obstaculos)
+        piramide = self.piramide
+        piramide.sincronizar()
+        start = self._pos_a_grid(enemigo.x, enemigo.y)
+        goal_pred = self._pos_a_grid(pos_predicha[0], pos_predicha[1])
 
-        mejor_ruta = max(self.poblacion_rutas, key=lambda r: r['fitness'])
+        motor = self.motor_grueso
+        ruta_gruesa = motor.buscar(piramide.celda_gruesa(start), piramide.celda_gruesa(goal_pred),
+                                   self._limite_expansiones, self._limite_tiempo)
+        self._consumir_expansiones(motor.expansiones, motor.truncada)
+        if len(ruta_gruesa) <= PASOS_REFINADO:
+            # Meta ya cercana, o sin ruta gruesa porque un hueco estrecho se cierra al agregar celdas.
+            return self._a_star_predictivo(enemigo, jugador, obstaculos)
 
-        if mejor_ruta['path'] and len(mejor_ruta['path']) > 1:
-            return self._path_a_accion(mejor_ruta['path'], self._pos_a_grid(enemigo.x, enemigo.y))
-        return 8
+        intermedio = piramide.centro_fino(ruta_gruesa[PASOS_REFINADO])
+        path = self._a_star_con_heuristica_mejorada(start, intermedio)
+        if len(path) < 2:
+            return self._a_star_predictivo(enemigo, jugador, obstaculos)
 
-    def _inicializar_poblacion_genetica(self, enemigo, jugador, tamaño_poblacion=20):
+        self._contexto(enemigo).ruta_plan = path
+        return self._path_a_accion(path, start)
 
-        self.poblacion_rutas = []
+    def _flujo_predictivo(self, enemigo, jugador, obstaculos):
+        pos_predicha = self._predecir_posicion_jugador()
+        self._obtener_grid(obstaculos)
         start = self._pos_a_grid(enemigo.x, enemigo.y)
-        goal = self._pos_a_grid(jugador.x, jugador.y)
-
-        for _ in range(tamaño_poblacion):
-            ruta = self._generar_ruta_aleatoria(start, goal)
-            self.poblacion_rutas.append({
-                'path': ruta,
-                'fitness': 0 })
-
-    def _generar_ruta_aleatoria(self, start, goal, max_pasos=15):
+        goal_pred = self._pos_a_grid(pos_predicha[0], pos_predicha[1])
+        goal_actual = self._pos_a_grid(jugador.x, jugador.y)
 
-        ruta = [start]
-        pos_actual = start
+        campo = self._obtener_campo_flujo(goal_pred)
+        accion = campo.accion(start)
+        if accion is None:
+            campo = self._obtener_campo_flujo(goal_actual)
+            accion = campo.accion(start)
 
-        for _ in range(max_pasos):
-            if pos_actual == goal:
-                break
-
-            if random.random() < 0.7:
-                dx = 1 if goal[1] > pos_actual[1] else (-1 if goal[1] < pos_actual[1] else 0)
-                dy = 1 if goal[0] > pos_actual[0] else (-1 if goal[0] < pos_actual[0] else 0)
+        if accion is None:
+            self._contexto(enemigo).ruta_plan = None
+            return 8
+        self._contexto(enemigo).ruta_plan = self._trazar_campo(campo, start, PASOS_RUTA_TRAZADA)
+        return accion
+
+    def _obtener_campo_flujo(self, meta):
+        # Todos los enemigos persiguen la misma meta en un tick, así que el campo se calcula una sola vez.
+        campo = self._campos_flujo.get(meta)
+        if campo is None:
+            if len(self._campos_flujo) >= self.max_campos_flujo:
+                _, campo = self._campos_flujo.popitem(last=False)
             else:
-                dx = random.choice([-1, 0, 1])
-                dy = random.choice([-1, 0, 1])
-
-            nueva_pos = (pos_actual[0] + dy, pos_actual[1] + dx)
-
-            if (0 <= nueva_pos[0] < self.rows and
-                    0 <= nueva_pos[1] < self.cols):
-                ruta.append(nueva_pos)
-                pos_actual = nueva_pos
-
-        return ruta
-
-    def _evaluar_poblacion(self, enemigo, jugador, obstaculos):
-
-        grid = self._crear_grid_mejorado(obstaculos)
-
-        for individuo in self.poblacion_rutas:
-            ruta = individuo['path']
-            fitness = 0
-
-            if not ruta:
-                individuo['fitness'] = -1000
+                campo = CampoFlujo(self.grid_ocupacion)
+            self._campos_flujo[meta] = campo
+        else:
+            self._campos_flujo.move_to_end(meta)
+
+        campo.actualizar(meta, self._limite_expansiones, self._limite_tiempo)
+        self._consumir_expansiones(campo.expansiones, campo.truncado)
+        return campo
+
+    def _interceptacion_cooperativa(self, enemigos, jugador, obstaculos):
+        # Un único campo de flujo hacia el jugador da sus distancias a todo el mapa y la acción de los
+        # perseguidores cercanos; el resto se reparte entre puntos de intercepción distintos y planifica con
+        # A* penalizando las celdas que ya han reservado los enemigos planificados antes.
+        self._obtener_grid(obstaculos)
+        grid = self.grid_ocupacion
+        celda_jugador = self._pos_a_grid(jugador.x, jugador.y)
+        pos_predicha = self._predecir_posicion_jugador()
+        celda_predicha = self._pos_a_grid(pos_predicha[0], pos_predicha[1])
+        campo = self._obtener_campo_flujo(celda_jugador)
+
+        celdas = [self._pos_a_grid(enemigo.x, enemigo.y) for enemigo in enemigos]
+        directos = []
+        interceptores = []
+        for k, (i, j) in enumerate(celdas):
+            i = min(max(i, 0), grid.rows - 1)
+            j = min(max(j, 0), grid.cols - 1)
+            if campo.distancias[i, j] <= RADIO_PERSECUCION_DIRECTA:
+                directos.append(k)
+            else:
+                interceptores.append(k)
+
+        candidatos = self.cooperativo.candidatos(celda_jugador, campo.distancias, celda_predicha)
+        if directos:
+            # La celda del jugador ya la cubren los perseguidores directos.
+            candidatos = candidatos[1:]
+        asignacion = self.cooperativo.asignar([celdas[k] for k in interceptores], candidatos)
+
+        acciones = [ACCION_QUIETO] * len(enemigos)
+        reservas = {}
+        for k in directos:
+            acciones[k] = self._seguir_campo(campo, enemigos[k], celdas[k], reservas)
+
+        # Primero los interceptores más cercanos a su objetivo: sus rutas son las más fiables para reservar.
+        pendientes = sorted(zip(interceptores, asignacion),
+                            key=lambda par: self._distancia_octil(celdas[par[0]], par[1] or celda_jugador))
+        motor = self.motor_a_estrella
+        for k, objetivo in pendientes:
+            if objetivo is None or objetivo == celda_jugador:
+                acciones[k] = self._seguir_campo(campo, enemigos[k], celdas[k], reservas)
                 continue
+            self._asignar_presupuesto()
+            start = celdas[k]
+            path = motor.buscar(start, objetivo, self._limite_expansiones, self._limite_tiempo,
+                                coste_extra=reservas)
+            self._consumir_expansiones(motor.expansiones, motor.truncada)
+            self._contexto(enemigos[k]).ruta_plan = path
+            self._reservar(reservas, path)
+            acciones[k] = self._path_a_accion(path, start)
+        return acciones
+
+    def _seguir_campo(self, campo, enemigo, celda, reservas):
+        # Acción del campo de flujo hacia el jugador; la ruta que traza se guarda y se reserva.
+        ruta = self._trazar_campo(campo, celda, HORIZONTE_RESERVA)
+        self._contexto(enemigo).ruta_plan = ruta
+        self._reservar(reservas, ruta)
+        return self._path_a_accion(ruta, celda)
+
+    def _trazar_campo(self, campo, celda, pasos):
+        ruta = [celda]
+        i, j = celda
+        for _ in range(pasos):
+            accion = campo.accion((i, j))
+            if accion is None:
+                break
+            dx, dy = MOVIMIENTOS[accion]
+            i, j = i + dy, j + dx
+            ruta.append((i, j))
+        return ruta
 
-            fitness -= len(ruta) * 2
-
-            if ruta:
-                pos_final = ruta[-1]
-                pos_final_real = self._grid_a_pos(pos_final[0], pos_final[1])
-                dist_final = math.sqrt((pos_final_real[0] - jugador.x) ** 2 +
-                                       (pos_final_real[1] - jugador.y) ** 2)
-                fitness += max(0, 200 - dist_final)
-
-            for pos in ruta:
-                if (0 <= pos[0] < self.rows and 0 <= pos[1] < self.cols and
-                        grid[pos[0]][pos[1]] == 1):
-                    fitness -= 50
-
-            if len(ruta) > 2:
-                cambios_direccion = 0
-                for i in range(2, len(ruta)):
-                    dir1 = (ruta[i - 1][0] - ruta[i - 2][0], ruta[i - 1][1] - ruta[i - 2][1])
-                    dir2 = (ruta[i][0] - ruta[i - 1][0], ruta[i][1] - ruta[i - 1][1])
-                    if dir1 != dir2:
-                        cambios_direccion += 1
-                fitness -= cambios_direccion * 5
-            individuo['fitness'] = fitness
-
-    def _seleccion_y_reproduccion(self):
-        nueva_poblacion = []
-
-        self.poblacion_rutas.sort(key=lambda x: x['fitness'], reverse=True)
-        nueva_poblacion.extend(self.poblacion_rutas[:5])
-
-        while len(nueva_poblacion) < len(self.poblacion_rutas):
-            padre1 = self._seleccion_torneo()
-            padre2 = self._seleccion_torneo()
-            hijo = self._cruce(padre1, padre2)
-            nueva_poblacion.append(hijo)
-
-        self.poblacion_rutas = nueva_poblacion
-
-    def _seleccion_torneo(self, tamaño_torneo=3):
-        candidatos = random.sample(self.poblacion_rutas,
-                                   min(tamaño_torneo, len(self.poblacion_rutas)))
-        return max(candidatos, key=lambda x: x['fitness'])
-
-    def _cruce(self, padre1, padre2):
-        if not padre1['path'] or not padre2['path']:
-            return {'path': [], 'fitness': 0}
-
-        punto_cruce = random.randint(1, min(len(padre1['path']), len(padre2['path'])) - 1)
-
-        nueva_ruta = padre1['path'][:punto_cruce] + padre2['path'][punto_cruce:]
-
-        return {'path': nueva_ruta, 'fitness': 0}
-
-    def _mutacion(self, tasa_mutacion=0.1):
-
-        for individuo in self.poblacion_rutas:
-            if random.random() < tasa_mutacion and individuo['path']:
-                idx = random.randint(0, len(individuo['path']) - 1)
-                pos_actual = individuo['path'][idx]
-
-                dx = random.choice([-1, 0, 1])
-                dy = random.choice([-1, 0, 1])
-                nueva_pos = (pos_actual[0] + dy, pos_actual[1] + dx)
-
-                if (0 <= nueva_pos[0] < self.rows and
-                        0 <= nueva_pos[1] < self.cols):
-                        individuo['path'][idx] = nueva_pos
+    def _reservar(self, reservas, ruta):
+        grid = self.grid_ocupacion
+        for i, j in ruta[1:HORIZONTE_RESERVA + 1]:
+            indice = grid.indice_borde(i, j)
+            reservas[indice] = reservas.get(indice, 0.0) + PENALIZACION_RESERVA
 
-    def _crear_grid_mejorado(self, obstaculos, margen_inflacion=15):
+    def _distancia_octil(self, a, b):
+        di = abs(a[0] - b[0])
+        dj = abs(a[1] - b[1])
+        return max(di, dj) + 0.414 * min(di, dj)
 
-        grid = [[0 for _ in range(self.cols)] for _ in range(self.rows)]
+    def _d_star_incremental(self, enemigo, jugador, obstaculos):
+        pos_predicha = self._predecir_posicion_jugador()
+        self._obtener_grid(obstaculos)
+        start = self._pos_a_grid(enemigo.x, enemigo.y)
+        goal_pred = self._pos_a_grid(pos_predicha[0], pos_predicha[1])
+        goal_actual = self._pos_a_grid(jugador.x, jugador.y)
+        goal = goal_pred if self.grid_ocupacion.esta_libre(goal_pred) else goal_actual
+
+        contexto = self._contexto(enemigo)
+        d_star = contexto.obtener_d_star()
+        accion = d_star.accion(start, goal, self._limite_expansiones, self._limite_tiempo)
+        self._consumir_expansiones(d_star.nodos_expandidos, d_star.truncado)
+        if accion is None:
+            # Enemigo fuera del grid o meta inalcanzable: se delega en la búsqueda completa.
+            return self._a_star_predictivo(enemigo, jugador, obstaculos)
+        contexto.ruta_plan = None if accion == ACCION_QUIETO else d_star.ruta(PASOS_RUTA_TRAZADA)
+        return accion
 
-        for obstaculo in obstaculos:
-            rect_inflado = pygame.Rect(
-                obstaculo.x - margen_inflacion,
-                obstaculo.y - margen_inflacion,
-                obstaculo.ancho + 2 * margen_inflacion,
-                obstaculo.alto + 2 * margen_inflacion
-            )
+    def _a_star_jerarquico(self, enemigo, jugador, obstaculos):
+        pos_predicha = self._predecir_posicion_jugador()
+        self._obtener_grid(obstaculos)
+        start = self._pos_a_grid(enemigo.x, enemigo.y)
+        goal_pred = self._pos_a_grid(pos_predicha[0], pos_predicha[1])
+        goal_actual = self._pos_a_grid(jugador.x, jugador.y)
 
-            for i in range(self.rows):
-                for j in range(self.cols):
-                    x, y = self._grid_a_pos(i, j)
-                    if rect_inflado.collidepoint(x, y):
-                        grid[i][j] = 1
+        if self.grafo_jerarquico is None:
+            self.grafo_jerarquico = GrafoJerarquico(self.grid_ocupacion, self.tam_cluster)
 
-        return grid
+        grafo = self.grafo_jerarquico
+        path = grafo.buscar(start, goal_pred, self._limite_expansiones, self._limite_tiempo)
+        self._consumir_expansiones(grafo.expansiones, grafo.truncado)
+        if not path or len(path) < 2:
+            path = grafo.buscar(start, goal_actual, self._limite_expansiones, self._limite_tiempo)
+            self._consumir_expansiones(grafo.expansiones, grafo.truncado)
 
-    def _a_star_con_heuristica_mejorada(self, grid, start, goal):
-        heap = []
-        heapq.heappush(heap, (0, start))
-        came_from = {start: None}
-        cost_so_far = {start: 0}
+        # Solo el primer tramo está refinado celda a celda; después vienen nodos abstractos sueltos.
+        self._contexto(enemigo).ruta_plan = self._tramo_contiguo(path)
+        return self._path_a_accion(path, start)
 
-        while heap:
-            _, current = heapq.heappop(heap)
+    def _tramo_contiguo(self, ruta):
+        for k in range(1, len(ruta)):
+            if max(abs(ruta[k][0] - ruta[k - 1][0]), abs(ruta[k][1] - ruta[k - 1][1])) > 1:
+                return ruta[:k]
+        return ruta
 
-            if current == goal:
-                break
+    def _grafo_visibilidad(self, enemigo, jugador, obstaculos):
+        pos_predicha = self._predecir_posicion_jugador()
+        self._obtener_grid(obstaculos)
+
+        if self.grafo_visibilidad is None:
+            self.grafo_visibilidad = GrafoVisibilidad(self.ancho_mapa, self.alto_mapa,
+                                                      self.grid_ocupacion.margen_inflacion)
+        self.grafo_visibilidad.sincronizar(obstaculos, self.grid_ocupacion.version)
+
+        inicio = (enemigo.x, enemigo.y)
+        ruta = self.grafo_visibilidad.buscar(inicio, pos_predicha)
+        if len(ruta) < 2:
+            ruta = self.grafo_visibilidad.buscar(inicio, (jugador.x, jugador.y))
+
+        self._contexto(enemigo).ruta_plan = self._ruta_continua_a_celdas(ruta, PASOS_RUTA_TRAZADA)
+        return self._ruta_continua_a_accion(ruta)
+
+    def _ruta_continua_a_celdas(self, ruta, max_pasos):
+        # Recorre los segmentos de la ruta celda a celda, con el paso de las ocho direcciones más cercano a
+        # cada segmento, y se detiene en la primera celda bloqueada.
+        if len(ruta) < 2:
+            return None
+        grid = self.grid_ocupacion
+        actual = self._pos_a_grid(*ruta[0])
+        celdas = [actual]
+        for punto in ruta[1:]:
+            destino = self._pos_a_grid(*punto)
+            while actual != destino and len(celdas) <= max_pasos:
+                di = destino[0] - actual[0]
+                dj = destino[1] - actual[1]
+                paso_i = (di > 0) - (di < 0) if 2 * abs(di) >= abs(dj) else 0
+                paso_j = (dj > 0) - (dj < 0) if 2 * abs(dj) >= abs(di) else 0
+                actual = (actual[0] + paso_i, actual[1] + paso_j)
+                if not grid.esta_libre(actual):
+                    return celdas
+                celdas.append(actual)
+        return celdas
+
+    def _ruta_continua_a_accion(self, ruta, tolerancia=2.0):
+        # Se apunta al primer punto de paso que no se haya alcanzado ya.
+        for punto in ruta[1:]:
+            fx = punto[0] - ruta[0][0]
+            fy = punto[1] - ruta[0][1]
+            if math.hypot(fx, fy) > tolerancia:
+                return self._fuerza_a_accion(fx, fy)
+        return 8
 
-            for di in [-1, 0, 1]:
-                for dj in [-1, 0, 1]:
-                    if di == 0 and dj == 0:
-                        continue
+    def _campo_potencial(self, enemigo, jugador, obstaculos):
+        fx_atractiva = (jugador.x - enemigo.x)
+        fy_atractiva = (jugador.y - enemigo.y)
 
-                    ni, nj = current[0] + di, current[1] + dj
+        dist_jugador = max(math.sqrt(fx_atractiva ** 2 + fy_atractiva ** 2), 1)
+        fx_atractiva = fx_atractiva / dist_jugador * 10
+        fy_atractiva = fy_atractiva / dist_jugador * 10
 
-                    if (0 <= ni < self.rows and 0 <= nj < self.cols and
-                            grid[ni][nj] == 0):
+        # La repulsión se lee del campo precalculado por mapa, con la distancia a la superficie del obstáculo.
+        self._sincronizar_campo_repulsion(obstaculos)
+        fx_repulsiva, fy_repulsiva = self.campo_repulsion.fuerza(enemigo.x, enemigo.y)
 
-                        move_cost = 1.414 if di != 0 and dj != 0 else 1.0
+        fx_total = fx_atractiva + fx_repulsiva
+        fy_total = fy_atractiva + fy_repulsiva
 
-                        if current in came_from and came_from[current]:
-                            prev = came_from[current]
-                            prev_dir = (current[0] - prev[0], current[1] - prev[1])
-                            curr_dir = (di, dj)
-                            if prev_dir != curr_dir:
-                                move_cost += 0.1
+        return self._fuerza_a_accion(fx_total, fy_total)
 
-                        new_cost = cost_so_far[current] + move_cost
-                        neighbor = (ni, nj)
+    def _campo_potencial_lote(self, enemigos, jugador, obstaculos):
+        if not enemigos:
+            return []
+        xs = np.array([e.x for e in enemigos], dtype=np.float64)
+        ys = np.array([e.y for e in enemigos], dtype=np.float64)
 
-                        if neighbor not in cost_so_far or new_cost < cost_so_far[neighbor]:
-                            cost_so_far[neighbor] = new_cost
+        fx = jugador.x - xs
+        fy = jugador.y - ys
+        dist = np.maximum(np.hypot(fx, fy), 1)
+        fx = fx / dist * 10
+        fy = fy / dist * 10
 
-                            h_manhattan = abs(goal[0] - ni) + abs(goal[1] - nj)
-                            h_euclidiana = math.sqrt((goal[0] - ni) ** 2 + (goal[1] - nj) ** 2)
-                            heuristica = 0.7 * h_euclidiana + 0.3 * h_manhattan
+        self._sincronizar_campo_repulsion(obstaculos)
+        fx_repulsiva, fy_repulsiva = self.campo_repulsion.fuerzas(xs, ys)
 
-                            priority = new_cost + heuristica
-                            heapq.heappush(heap, (priority, neighbor))
-                            came_from[neighbor] = current
+        return fuerzas_a_acciones(fx + fx_repulsiva, fy + fy_repulsiva).tolist()
 
-        if goal not in came_from:
-            return []
+    def _sincronizar_campo_repulsion(self, obstaculos):
+        self._obtener_grid(obstaculos)
+        self.campo_repulsion.sincronizar(obstaculos, self.grid_ocupacion.version)
 
-        path = []
-        node = goal
-        while node is not None:
-            path.append(node)
-            node = came_from.get(node)
-        path.reverse()
+    def _algoritmo_genetico(self, enemigo, jugador, obstaculos, generaciones=5):
 
+        self._obtener_grid(obstaculos)
+        start = self._pos_a_grid(enemigo.x, enemigo.y)
+        goal = self._pos_a_grid(jugador.x, jugador.y)
+        genetico = self._contexto(enemigo).obtener_genetico()
+        if genetico.poblacion is not None:
+            generaciones = min(generaciones, self.generaciones_calientes)
+        accion = genetico.planificar(start, goal, (jugador.x, jugador.y), generaciones, self._limite_tiempo)
+        self._consumir_expansiones(0, genetico.truncado)
+        self._contexto(enemigo).ruta_plan = genetico.mejor_ruta()
+        return accion
+
+    def _obtener_grid(self, obstaculos):
+
+        return self.grid_ocupacion.sincronizar(obstaculos)
+
+    def _a_star_con_heuristica_mejorada(self, start, goal):
+
+        version = self.grid_ocupacion.version
+        ruta = self.cache_rutas.buscar(start, goal, version)
+        if ruta is not None:
+            self.ruta_truncada = False
+            return list(ruta)
+
+        motor = self.motor_a_estrella
+        path = motor.buscar(start, goal, self._limite_expansiones, self._limite_tiempo)
+        self.ruta_truncada = motor.truncada
+        self._consumir_expansiones(motor.expansiones, motor.truncada)
+        if not motor.truncada:
+            self.cache_rutas.guardar(start, goal, version, path)
         return path
 
     def _actualizar_historial_jugador(self, jugador):
@@ -414,6 +642,9 @@ class AlgoritmoPersecucionInteligente:
 
 def calcular_accion_inteligente(enemigo, jugador, obstaculos, algoritmo_ia, modo="hibrido"):
     return algoritmo_ia.calcular_mejor_accion(enemigo, jugador, obstaculos, modo)
+
+def calcular_acciones_inteligentes(enemigos, jugador, obstaculos, algoritmo_ia, modo="hibrido"):
+    return algoritmo_ia.calcular_acciones(enemigos, jugador, obstaculos, modo)
     
 
     
@@ -5,6 +5,7 @@ import random
 
 
 from src.model.proyectil import Proyectil
+from src.model.simulacion import rect_colisiona
 from src.utils.visual_effects import VisualEffects
 
 class Agente:
@@ -29,14 +30,17 @@ class Agente:
         self.glow_color = self._calculate_glow_color()
         self.core_color = self._calculate_core_color()
 
-    def recibir_dano(self, cantidad = 20):
+    def recibir_dano(self, cantidad = 20, tiempo_ms = None):
+        # `tiempo_ms` permite usar un reloj simulado; por defecto se usa el de pygame.
+        if tiempo_ms is None:
+            tiempo_ms = pygame.time.get_ticks()
         if not self.esta_vivo:
             return False
-        if pygame.time.get_ticks() - self.tiempo_dano < 500:
+        if tiempo_ms - self.tiempo_dano < 500:
             return None
 
         self.vida_actual -= cantidad
-        self.tiempo_dano = pygame.time.get_ticks()
+        self.tiempo_dano = tiempo_ms
 
         if self.vida_actual <= 0:
             self.vida_actual = 0
@@ -183,21 +187,19 @@ class Agente:
                 center[1] + (self.radio - 2) * math.sin(angle)
             )
             pygame.draw.line(superficie, (255, 50, 50), line_start, line_end, 1)
-    def mover(self, dx, dy, obstaculos = None, otros_agentes = None):
+    def mover(self, dx, dy, obstaculos = None, otros_agentes = None, ancho_mapa = 800, alto_mapa = 600):
+        # Versión por objetos del movimiento de SimulacionPersecucion.mover; el entorno usa la simulación.
         factor_diag = 0.707 if dx != 0 and dy != 0 else 1.0
         nueva_x = self.x + dx * self.velocidad * factor_diag
         nueva_y = self.y + dy * self.velocidad * factor_diag
 
-        rect_futuro = pygame.Rect(
-            int(nueva_x - self.radio), int(nueva_y - self.radio),
-            self.radio * 2, self.radio * 2
-        )
+        rect_futuro = (int(nueva_x - self.radio), int(nueva_y - self.radio), self.radio * 2, self.radio * 2)
 
         colision = False
 
         if obstaculos:
             for obst in obstaculos:
-                if rect_futuro.colliderect(obst.rect):
+                if rect_colisiona(rect_futuro, obst.rect):
                     colision = True
                     break
 
@@ -205,17 +207,14 @@ class Agente:
             for otro in otros_agentes:
                 if otro is self:
                     continue
-                rect_otro = pygame.Rect(
-                    int(otro.x - otro.radio), int(otro.y - otro.radio),
-                    otro.radio * 2, otro.radio * 2
-                )
-                if rect_futuro.colliderect(rect_otro):
+                rect_otro = (int(otro.x - otro.radio), int(otro.y - otro.radio), otro.radio * 2, otro.radio * 2)
+                if rect_colisiona(rect_futuro, rect_otro):
                     colision = True
                     break
 
         if not colision:
-            self.x = max(self.radio, min(nueva_x, 800 - self.radio))
-            self.y = max(self.radio, min(nueva_y, 600 - self.radio))
+            self.x = max(self.radio, min(nueva_x, ancho_mapa - self.radio))
+            self.y = max(self.radio, min(nueva_y, alto_mapa - self.radio))
             self.update_effects()
 
 
@@ -241,8 +240,8 @@ class Jugador(Agente):
         self.tiempo_ultimo_disparo = 0
         self.cadencia_disparo = 200
 
-    def disparar(self, target_x, target_y):
-        tiempo_actual = pygame.time.get_ticks()
+    def disparar(self, target_x, target_y, tiempo_ms = None):
+        tiempo_actual = pygame.time.get_ticks() if tiempo_ms is None else tiempo_ms
         if tiempo_actual - self.tiempo_ultimo_disparo >= self.cadencia_disparo:
             proyectil = Proyectil(self.x, self.y, target_x, target_y)
             self.proyectiles.append(proyectil)
@@ -259,14 +258,22 @@ class Jugador(Agente):
             proyectil.dibujar(superficie)
 
     def manejar_input(self, obstaculos =  None, otros_agentes = None):
+        dx, dy, objetivo = self.leer_input()
+        if objetivo is not None:
+            self.disparar(*objetivo)
+        self.mover(dx, dy, obstaculos, otros_agentes)
+
+    def leer_input(self):
+        # Lee teclado y ratón sin mover al jugador: devuelve (dx, dy, objetivo del disparo o None) y ajusta
+        # la velocidad según el turbo.
         dx = 0
         dy = 0
+        objetivo = None
         keys = pygame.key.get_pressed()
 
         mouse_buttons = pygame.mouse.get_pressed()
         if mouse_buttons[0]:
-            mouse_x, mouse_y = pygame.mouse.get_pos()
-            self.disparar(mouse_x, mouse_y)
+            objetivo = pygame.mouse.get_pos()
 
         l_shift_pressed = keys[pygame.K_LSHIFT]
 
@@ -295,5 +302,5 @@ class Jugador(Agente):
                 self.boost_energy = min(100, self.boost_energy + 1)
             self.velocidad = 5
 
-        self.mover(dx, dy, obstaculos, otros_agentes)
+        return dx, dy, objetivo
 
@@ -3,6 +3,7 @@ import math
 
 
 from src.utils.visual_effects import VisualEffects
+from src.model.simulacion import rect_colisiona
 
 class Proyectil:
     def __init__(self, x, y, target_x, target_y, velocidad=8):
@@ -34,20 +35,23 @@ class Proyectil:
         self.x += self.vel_x
         self.y += self.vel_y
 
-        proyectil_rect = pygame.Rect(int(self.x - self.radio), int(self.y - self.radio), self.radio * 2, self.radio * 2)
+        proyectil_rect = (int(self.x - self.radio), int(self.y - self.radio), self.radio * 2, self.radio * 2)
         for obstaculo in obstaculos:
-            if proyectil_rect.colliderect(obstaculo.rect):
+            if rect_colisiona(proyectil_rect, obstaculo.rect):
                 self.activo = False
                 return
 
-        self.pulse_phase += 0.3
-        self.trail_positions.pop()
-        self.trail_positions.insert(0, (self.x, self.y))
+        self.actualizar_estela()
 
         if (self.x < 0 or self.x > ancho_pantalla or
             self.y < 0 or self.y > alto_pantalla):
             self.activo = False
 
+    def actualizar_estela(self):
+        self.pulse_phase += 0.3
+        self.trail_positions.pop()
+        self.trail_positions.insert(0, (self.x, self.y))
+
     def dibujar(self, superficie):
         if not self.activo:
             return
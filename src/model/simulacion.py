@@ -0,0 +1,350 @@
+import numpy as np
+
+# Estadísticas de cada tipo de agente: (radio, velocidad, vida máxima). Coinciden con Jugador y Enemigo.
+STATS_JUGADOR = (10, 5, 100)
+STATS_ENEMIGO = (12, 3, 60)
+
+INVULNERABILIDAD_MS = 500
+CADENCIA_DISPARO_MS = 200
+RADIO_PROYECTIL = 3
+VELOCIDAD_PROYECTIL = 8
+DANO_PROYECTIL = 20
+FACTOR_DIAGONAL = 0.707
+# Factor del paso según cuántas componentes de la dirección son distintas de cero.
+FACTORES_PASO = np.array([1.0, 1.0, FACTOR_DIAGONAL])
+
+
+def rects_agentes(pos, radios):
+    # Rectángulo entero (x, y, ancho, alto) que ocupa cada agente, truncado igual que pygame.Rect(int(...)).
+    rects = np.empty((len(pos), 4), dtype=np.int64)
+    rects[:, 0] = np.trunc(pos[:, 0] - radios)
+    rects[:, 1] = np.trunc(pos[:, 1] - radios)
+    rects[:, 2] = 2 * radios
+    rects[:, 3] = 2 * radios
+    return rects
+
+
+def rects_colisionan(a, b):
+    # Misma regla que pygame.Rect.colliderect: solapamiento estricto en ambos ejes. Admite broadcasting.
+    return ((a[..., 0] < b[..., 0] + b[..., 2]) & (b[..., 0] < a[..., 0] + a[..., 2])
+            & (a[..., 1] < b[..., 1] + b[..., 3]) & (b[..., 1] < a[..., 1] + a[..., 3]))
+
+
+def rect_colisiona(a, b):
+    # Versión escalar de rects_colisionan para tuplas (x, y, ancho, alto).
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+class SimulacionPersecucion:
+    # Núcleo de la partida sin pygame: posiciones, radios, velocidades y vida de los agentes, rectángulos de
+    # los obstáculos y proyectiles en arrays de NumPy. El agente 0 es el jugador y los demás los enemigos.
+    # El tiempo lo lleva un reloj simulado que avanza un fotograma por paso.
+
+    def __init__(self, ancho, alto, fps=60, capacidad_proyectiles=64):
+        self.ancho = ancho
+        self.alto = alto
+        self.ms_por_paso = 1000.0 / fps
+        self.tiempo_ms = 0.0
+
+        self.pos = np.zeros((1, 2))
+        self.radio = np.zeros(1)
+        self.velocidad = np.zeros(1)
+        self.vida = np.zeros(1)
+        self.vida_maxima = np.zeros(1)
+        self.vivo = np.zeros(1, dtype=bool)
+        self.tiempo_dano = np.zeros(1)
+
+        self.rects_obstaculos = np.empty((0, 4), dtype=np.int64)
+        self._bajos_obstaculos = np.empty((0, 2))
+        self._altos_obstaculos = np.empty((0, 2))
+        self._limites = np.array([ancho, alto], dtype=np.float64)
+
+        self.proy_pos = np.zeros((capacidad_proyectiles, 2))
+        self.proy_vel = np.zeros((capacidad_proyectiles, 2))
+        self.proy_activo = np.zeros(capacidad_proyectiles, dtype=bool)
+        self.tiempo_ultimo_disparo = -np.inf
+
+    @property
+    def num_enemigos(self):
+        return len(self.pos) - 1
+
+    def cargar(self, pos_jugador, pos_enemigos, obstaculos=()):
+        n = 1 + len(pos_enemigos)
+        self.pos = np.empty((n, 2))
+        self.pos[0] = pos_jugador
+        if len(pos_enemigos):
+            self.pos[1:] = pos_enemigos
+
+        stats = np.array([STATS_JUGADOR] + [STATS_ENEMIGO] * len(pos_enemigos), dtype=np.float64)
+        self.radio = stats[:, 0].copy()
+        self.velocidad = stats[:, 1].copy()
+        self.vida_maxima = stats[:, 2].copy()
+        self.vida = self.vida_maxima.copy()
+        self.vivo = np.ones(n, dtype=bool)
+        # Nadie ha recibido daño todavía: así el primer golpe nunca cae dentro de la invulnerabilidad.
+        self.tiempo_dano = np.full(n, -np.inf)
+
+        self.proy_activo[:] = False
+        self.tiempo_ultimo_disparo = -np.inf
+        self.tiempo_ms = 0.0
+        self.cargar_obstaculos(obstaculos)
+
+    def cargar_obstaculos(self, obstaculos):
+        self.rects_obstaculos = np.array([(o.rect.x, o.rect.y, o.rect.width, o.rect.height) for o in obstaculos],
+                                         dtype=np.int64).reshape(-1, 4)
+        r = self.rects_obstaculos.astype(np.float64)
+        self._bajos_obstaculos = r[:, :2]
+        self._altos_obstaculos = r[:, :2] + r[:, 2:]
+
+    def avanzar_reloj(self):
+        self.tiempo_ms += self.ms_por_paso
+
+    def mover(self, indices, direcciones, otros=None):
+        # Mueve a la vez a los agentes `indices` según `direcciones` (k x 2, valores -1/0/1). Un agente no se
+        # mueve si su rectángulo futuro toca un obstáculo o a alguno de `otros`. Para imitar el movimiento en
+        # orden de la versión por objetos, contra los que se mueven antes en `indices` se usa su posición nueva.
+        indices = np.asarray(indices, dtype=np.intp)
+        k = len(indices)
+        if k == 0:
+            return np.zeros(0, dtype=bool)
+        direcciones = np.asarray(direcciones, dtype=np.float64).reshape(k, 2)
+
+        radios = self.radio[indices, None]
+        paso = self.velocidad[indices, None] * FACTORES_PASO[np.count_nonzero(direcciones, axis=1), None]
+        nuevas = self.pos[indices] + direcciones * paso
+        # Esquinas (x0, y0) y (x1, y1) de cada rectángulo futuro, con el mismo truncado que pygame.Rect(int(...)).
+        bajo = np.trunc(nuevas - radios)
+        alto = bajo + 2 * radios
+
+        bloqueado = ((bajo[:, None] < self._altos_obstaculos) & (self._bajos_obstaculos < alto[:, None])
+                     ).all(axis=2).any(axis=1)
+        destinos = np.clip(nuevas, radios, self._limites - radios)
+
+        if otros is not None and len(otros):
+            otros = np.asarray(otros, dtype=np.intp)
+            radios_otros = self.radio[otros, None]
+            bajo_otros = np.trunc(self.pos[otros] - radios_otros)
+            distinto = indices[:, None] != otros[None, :]
+
+            # Orden de cada uno de `otros` dentro de `indices` (k si no se mueve). Los que se mueven antes que
+            # el agente comprobado cuentan con su rectángulo ya movido, si es que pudieron moverse.
+            orden = np.full(len(self.pos), k, dtype=np.intp)
+            orden[indices] = np.arange(k)
+            orden_otros = orden[otros]
+            previo = orden_otros[None, :] < np.arange(k)[:, None]
+            fila = np.minimum(orden_otros, k - 1)
+            bajo_movido = np.trunc(destinos - radios)[fila][None]
+
+            por_obstaculo = bloqueado
+            while True:
+                nuevo = previo & ~bloqueado[fila][None, :]
+                bajo_efectivo = np.where(nuevo[:, :, None], bajo_movido, bajo_otros[None])
+                choca = ((bajo[:, None] < bajo_efectivo + 2 * radios_otros) & (bajo_efectivo < alto[:, None])
+                         ).all(axis=2)
+                actualizado = por_obstaculo | (choca & distinto).any(axis=1)
+                # El punto fijo coincide con el movimiento en orden: el agente i solo depende de los anteriores,
+                # así que cada vuelta fija al menos uno más. Casi siempre basta una.
+                if np.array_equal(actualizado, bloqueado):
+                    break
+                bloqueado = actualizado
+
+        movidos = ~bloqueado
+        self.pos[indices[movidos]] = destinos[movidos]
+        return movidos
+
+    def acciones_validas(self, indices, direcciones, otros=None):
+        # Para cada agente de `indices` y cada dirección candidata (k x 2), si moverse en ella cambiaría su
+        # posición con la regla de `mover`: falso si la bloquea un obstáculo o uno de `otros` (en su posición
+        # actual), o si el borde del mapa lo deja donde está. Devuelve (agentes x direcciones).
+        indices = np.asarray(indices, dtype=np.intp)
+        direcciones = np.asarray(direcciones, dtype=np.float64)
+        radios = self.radio[indices, None, None]
+        paso = self.velocidad[indices, None] * FACTORES_PASO[np.count_nonzero(direcciones, axis=1)]
+        pos = self.pos[indices, None]
+        nuevas = pos + direcciones * paso[..., None]
+        bajo = np.trunc(nuevas - radios)
+        alto = bajo + 2 * radios
+
+        bloqueado = ((bajo[:, :, None] < self._altos_obstaculos) & (self._bajos_obstaculos < alto[:, :, None])
+                     ).all(axis=3).any(axis=2)
+        if otros is not None and len(otros):
+            otros = np.asarray(otros, dtype=np.intp)
+            radios_otros = self.radio[otros, None]
+            bajo_otros = np.trunc(self.pos[otros] - radios_otros)
+            choca = ((bajo[:, :, None] < bajo_otros + 2 * radios_otros) & (bajo_otros < alto[:, :, None])
+                     ).all(axis=3)
+            bloqueado |= (choca & (indices[:, None] != otros[None, :])[:, None, :]).any(axis=2)
+
+        destinos = np.minimum(np.maximum(nuevas, radios), self._limites - radios)
+        return ~bloqueado & (destinos != pos).any(axis=2)
+
+    def aplicar_dano(self, indice, cantidad):
+        # Igual que Agente.recibir_dano: True si muere, False si solo recibe daño y None si aún es invulnerable.
+        if not self.vivo[indice]:
+            return False
+        if self.tiempo_ms - self.tiempo_dano[indice] < INVULNERABILIDAD_MS:
+            return None
+
+        self.vida[indice] -= cantidad
+        self.tiempo_dano[indice] = self.tiempo_ms
+        if self.vida[indice] <= 0:
+            self.vida[indice] = 0
+            self.vivo[indice] = False
+            return True
+        return False
+
+    def enemigos_en_contacto(self):
+        # Índices de los enemigos vivos que tocan al jugador, en orden.
+        delta = self.pos[1:] - self.pos[0]
+        distancias = np.hypot(delta[:, 0], delta[:, 1])
+        contacto = (distancias < self.radio[1:] + self.radio[0]) & self.vivo[1:]
+        return np.flatnonzero(contacto) + 1
+
+    def disparar(self, objetivo_x, objetivo_y):
+        # Devuelve el hueco del nuevo proyectil, o None por cadencia o por falta de huecos libres.
+        if self.tiempo_ms - self.tiempo_ultimo_disparo < CADENCIA_DISPARO_MS:
+            return None
+        libres = np.flatnonzero(~self.proy_activo)
+        if not len(libres):
+            return None
+
+        hueco = int(libres[0])
+        origen = self.pos[0]
+        direccion = np.array([objetivo_x, objetivo_y], dtype=np.float64) - origen
+        distancia = np.hypot(direccion[0], direccion[1])
+        self.proy_pos[hueco] = origen
+        self.proy_vel[hueco] = direccion / distancia * VELOCIDAD_PROYECTIL if distancia > 0 else 0.0
+        self.proy_activo[hueco] = True
+        self.tiempo_ultimo_disparo = self.tiempo_ms
+        return hueco
+
+    def actualizar_proyectiles(self):
+        # Avanza todos los proyectiles activos, los descarta al chocar o salir del mapa y aplica los impactos
+        # sobre enemigos. Devuelve una lista de (enemigo, resultado de aplicar_dano) por impacto.
+        activos = np.flatnonzero(self.proy_activo)
+        if not len(activos):
+            return []
+
+        self.proy_pos[activos] += self.proy_vel[activos]
+        pos = self.proy_pos[activos]
+
+        if len(self.rects_obstaculos):
+            radios = np.full(len(activos), RADIO_PROYECTIL)
+            choque = rects_colisionan(rects_agentes(pos, radios)[:, None, :],
+                                      self.rects_obstaculos[None, :, :]).any(axis=1)
+            self.proy_activo[activos[choque]] = False
+
+        fuera = (pos[:, 0] < 0) | (pos[:, 0] > self.ancho) | (pos[:, 1] < 0) | (pos[:, 1] > self.alto)
+        self.proy_activo[activos[fuera]] = False
+
+        activos = np.flatnonzero(self.proy_activo)
+        if not len(activos) or self.num_enemigos == 0:
+            return []
+
+        # Matriz proyectiles x enemigos; cada proyectil golpea al primer enemigo vivo que toca.
+        delta = self.proy_pos[activos][:, None, :] - self.pos[None, 1:, :]
+        toca = (np.hypot(delta[..., 0], delta[..., 1]) < RADIO_PROYECTIL + self.radio[None, 1:])
+        impactos = []
+        for p, fila in zip(activos, toca):
+            vivos = np.flatnonzero(fila & self.vivo[1:])
+            if len(vivos):
+                enemigo = int(vivos[0]) + 1
+                self.proy_activo[p] = False
+                impactos.append((enemigo, self.aplicar_dano(enemigo, DANO_PROYECTIL)))
+        return impactos
+
+
+class SimulacionLote:
+    # Varias partidas independientes apiladas en la primera dimensión, para entrenar sin un objeto por
+    # partida. Solo cubre lo que usa el modo de entrenamiento: movimiento de enemigos, colisiones y
+    # distancias al jugador (no hay proyectiles ni daño).
+
+    def __init__(self, num_partidas, ancho, alto, num_enemigos, max_obstaculos=8):
+        self.num_partidas = num_partidas
+        self.num_enemigos = num_enemigos
+        self._limites = np.array([ancho, alto], dtype=np.float64)
+
+        stats = np.array([STATS_JUGADOR] + [STATS_ENEMIGO] * num_enemigos, dtype=np.float64)
+        self.radio = stats[:, 0]
+        self.velocidad = stats[:, 1]
+        self.pos = np.zeros((num_partidas, 1 + num_enemigos, 2))
+
+        # Rectángulos de obstáculos con relleno; el relleno tiene esquinas (inf, -inf) y nunca colisiona.
+        self.rects_obstaculos = np.zeros((num_partidas, max_obstaculos, 4), dtype=np.int64)
+        self.num_obstaculos = np.zeros(num_partidas, dtype=np.intp)
+        self._bajos_obstaculos = np.full((num_partidas, max_obstaculos, 2), np.inf)
+        self._altos_obstaculos = np.full((num_partidas, max_obstaculos, 2), -np.inf)
+
+        self._previo = np.tri(num_enemigos, num_enemigos, -1, dtype=bool)
+        self._distinto = ~np.eye(num_enemigos, dtype=bool)
+
+    def cargar(self, partidas, pos, rects, num_obstaculos):
+        # `pos` (k x agentes x 2), `rects` (k x max_obstaculos x 4) y `num_obstaculos` (k) de las partidas dadas.
+        self.pos[partidas] = pos
+        self.rects_obstaculos[partidas] = rects
+        self.num_obstaculos[partidas] = num_obstaculos
+        activos = np.arange(rects.shape[1])[None, :] < np.asarray(num_obstaculos)[:, None]
+        r = rects.astype(np.float64)
+        self._bajos_obstaculos[partidas] = np.where(activos[..., None], r[..., :2], np.inf)
+        self._altos_obstaculos[partidas] = np.where(activos[..., None], r[..., :2] + r[..., 2:], -np.inf)
+
+    def mover_enemigos(self, direcciones):
+        # Misma regla que SimulacionPersecucion.mover con todos los enemigos moviéndose en orden y chocando
+        # entre sí, para todas las partidas a la vez. `direcciones` es (partidas x enemigos x 2).
+        radios = self.radio[1:, None]
+        pos = self.pos[:, 1:]
+        paso = self.velocidad[1:] * FACTORES_PASO[np.count_nonzero(direcciones, axis=2)]
+        nuevas = pos + direcciones * paso[..., None]
+        bajo = np.trunc(nuevas - radios)
+        alto = bajo + 2 * radios
+
+        por_obstaculo = ((bajo[:, :, None] < self._altos_obstaculos[:, None])
+                         & (self._bajos_obstaculos[:, None] < alto[:, :, None])).all(axis=3).any(axis=2)
+        destinos = np.clip(nuevas, radios, self._limites - radios)
+
+        lados = 2 * radios[None, None]
+        bajo_actual = np.trunc(pos - radios)[:, None]
+        bajo_movido = np.trunc(destinos - radios)[:, None]
+        bloqueado = por_obstaculo
+        while True:
+            # (partida, enemigo comprobado, otro enemigo): el otro ya se ha movido si va antes y pudo moverse.
+            nuevo = self._previo[None] & ~bloqueado[:, None, :]
+            bajo_otros = np.where(nuevo[..., None], bajo_movido, bajo_actual)
+            choca = ((bajo[:, :, None] < bajo_otros + lados) & (bajo_otros < alto[:, :, None])).all(axis=3)
+            actualizado = por_obstaculo | (choca & self._distinto).any(axis=2)
+            if np.array_equal(actualizado, bloqueado):
+                break
+            bloqueado = actualizado
+
+        movidos = ~bloqueado
+        self.pos[:, 1:] = np.where(movidos[..., None], destinos, pos)
+        return movidos
+
+    def acciones_validas_enemigos(self, direcciones):
+        # SimulacionPersecucion.acciones_validas para los enemigos de cada partida, contra los obstáculos y
+        # los demás enemigos: (partidas x enemigos x direcciones).
+        direcciones = np.asarray(direcciones, dtype=np.float64)
+        radios = self.radio[1:, None, None]
+        paso = self.velocidad[1:, None] * FACTORES_PASO[np.count_nonzero(direcciones, axis=1)]
+        pos = self.pos[:, 1:, None]
+        nuevas = pos + direcciones * paso[..., None]
+        bajo = np.trunc(nuevas - radios)
+        alto = bajo + 2 * radios
+        # Cada eje por separado: (partida, enemigo, dirección, obstáculo u otro enemigo).
+        bx, by = bajo[..., 0, None], bajo[..., 1, None]
+        ax, ay = alto[..., 0, None], alto[..., 1, None]
+
+        obs_bajo = self._bajos_obstaculos[:, None, None]
+        obs_alto = self._altos_obstaculos[:, None, None]
+        bloqueado = ((bx < obs_alto[..., 0]) & (obs_bajo[..., 0] < ax) & (by < obs_alto[..., 1])
+                     & (obs_bajo[..., 1] < ay)).any(axis=3)
+
+        otros_bajo = np.trunc(self.pos[:, 1:] - self.radio[1:, None])[:, None, None]
+        otros_alto = otros_bajo + 2 * self.radio[1:, None]
+        choca = ((bx < otros_alto[..., 0]) & (otros_bajo[..., 0] < ax) & (by < otros_alto[..., 1])
+                 & (otros_bajo[..., 1] < ay))
+        choca &= self._distinto[None, :, None, :]
+        bloqueado |= choca.any(axis=3)
+
+        destinos = np.minimum(np.maximum(nuevas, radios), self._limites - radios)
+        return ~bloqueado & (destinos != pos).any(axis=3)
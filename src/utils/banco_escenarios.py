@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from src.ia.grid_ocupacion import GridOcupacion
+
+# Obstáculo central más hasta cuatro aleatorios, como en PersecucionPygameEnv.reset.
+MAX_OBSTACULOS = 5
+# Escenarios por tarea. Cada tramo tiene su propia semilla, así que el banco no depende del número de procesos.
+TAM_TRAMO = 500
+# Reinicios fallidos seguidos que se toleran antes de dar la configuración por imposible.
+MAX_FALLOS_SEGUIDOS = 50
+
+
+def tipo_registro(num_enemigos, rows, cols):
+    # Un escenario por registro: posiciones y rectángulos en enteros de 16 bits y el grid de ocupación de la
+    # IA empaquetado a un bit por celda.
+    return np.dtype([
+        ("jugador", np.int16, (2,)),
+        ("enemigos", np.int16, (num_enemigos, 2)),
+        ("obstaculos", np.int16, (MAX_OBSTACULOS, 4)),
+        ("num_obstaculos", np.uint8),
+        ("grid", np.uint8, (rows, (cols + 7) // 8))
+    ])
+
+
+def _ruta_meta(ruta):
+    return Path(ruta).with_suffix(".json")
+
+
+def _generar_tramo(parametros):
+    # Se ejecuta en un proceso aparte: reinicia un entorno de entrenamiento con `random` sembrado y guarda lo
+    # que deja colocado su `reset`, junto con el grid que reconstruye la IA.
+    from src.envs.persecucion_env import PersecucionPygameEnv
+
+    ancho, alto, num_enemigos, tam_celda, semilla, cantidad = parametros
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    env = PersecucionPygameEnv(ancho, alto, modo_entrenamiento=True, num_enemigos=num_enemigos,
+                               tam_celda=tam_celda)
+    grid = env.algoritmo_ia.grid_ocupacion
+    registros = np.zeros(cantidad, dtype=tipo_registro(num_enemigos, grid.rows, grid.cols))
+
+    random.seed(semilla)
+    hechos = 0
+    fallos = 0
+    while hechos < cantidad:
+        try:
+            env.reset()
+        except RuntimeError as e:
+            fallos += 1
+            if fallos >= MAX_FALLOS_SEGUIDOS:
+                env.close()
+                raise RuntimeError(f"{fallos} reinicios fallidos seguidos con {num_enemigos} enemigos en "
+                                   f"{ancho}x{alto}; la configuración no admite escenarios válidos") from e
+            continue
+        fallos = 0
+        registro = registros[hechos]
+        registro["jugador"] = (env.jugador.x, env.jugador.y)
+        registro["enemigos"] = [(e.x, e.y) for e in env.enemigos]
+        registro["num_obstaculos"] = len(env.obstaculos)
+        for k, o in enumerate(env.obstaculos):
+            registro["obstaculos"][k] = (o.rect.x, o.rect.y, o.rect.width, o.rect.height)
+        registro["grid"] = np.packbits(grid.celdas, axis=1)
+        hechos += 1
+    env.close()
+    return registros
+
+
+def generar_banco(ruta, num_escenarios, ancho=600, alto=400, num_enemigos=4, tam_celda=15, semilla=0,
+                  procesos=None):
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tramos = [(ancho, alto, num_enemigos, tam_celda, semilla + k, min(TAM_TRAMO, num_escenarios - inicio))
+              for k, inicio in enumerate(range(0, num_escenarios, TAM_TRAMO))]
+
+    # Mismo grid que construye la IA del entorno en los trabajadores.
+    grid = GridOcupacion(ancho, alto, tam_celda)
+    rows, cols = grid.rows, grid.cols
+    banco = np.lib.format.open_memmap(ruta, mode="w+", dtype=tipo_registro(num_enemigos, rows, cols),
+                                      shape=(num_escenarios,))
+    with ProcessPoolExecutor(max_workers=procesos) as ejecutor:
+        inicio = 0
+        for registros in ejecutor.map(_generar_tramo, tramos):
+            banco[inicio:inicio + len(registros)] = registros
+            inicio += len(registros)
+    banco.flush()
+    del banco
+
+    meta = {"ancho": ancho, "alto": alto, "num_enemigos": num_enemigos, "tam_celda": tam_celda,
+            "margen_inflacion": grid.margen_inflacion, "rows": rows, "cols": cols, "escenarios": num_escenarios,
+            "semilla": semilla}
+    with open(_ruta_meta(ruta), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return ruta
+
+
+class BancoEscenarios:
+    # Banco generado con `generar_banco`, abierto como memmap: elegir un escenario solo lee su registro.
+
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        with open(_ruta_meta(self.ruta), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.registros = np.load(self.ruta, mmap_mode="r")
+        self.cols = self.meta["cols"]
+
+    def __len__(self):
+        return len(self.registros)
+
+    def comprobar(self, ancho, alto, num_enemigos, tam_celda, margen_inflacion):
+        esperado = {"ancho": ancho, "alto": alto, "num_enemigos": num_enemigos, "tam_celda": tam_celda,
+                    "margen_inflacion": margen_inflacion}
+        distintos = {clave: (self.meta[clave], valor) for clave, valor in esperado.items()
+                     if self.meta[clave] != valor}
+        if distintos:
+            raise ValueError(f"El banco {self.ruta} no corresponde al entorno (banco, entorno): {distintos}")
+
+    def grid(self, registros):
+        # Grid de ocupación (... x rows x cols) de uno o varios registros.
+        return np.unpackbits(registros["grid"], axis=-1, count=self.cols)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera un banco de escenarios para los reinicios del entorno")
+    parser.add_argument("salida", help="fichero .npy del banco; los metadatos van al .json del mismo nombre")
+    parser.add_argument("--escenarios", type=int, default=100000)
+    parser.add_argument("--ancho", type=int, default=600)
+    parser.add_argument("--alto", type=int, default=400)
+    parser.add_argument("--enemigos", type=int, default=4)
+    parser.add_argument("--tam-celda", type=int, default=15)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--procesos", type=int, default=None)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    ruta = generar_banco(args.salida, args.escenarios, args.ancho, args.alto, args.enemigos, args.tam_celda,
+                         args.semilla, args.procesos)
+    print(f"{args.escenarios} escenarios en {ruta} ({ruta.stat().st_size / 1e6:.1f} MB, "
+          f"{time.perf_counter() - inicio:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,17 @@ import time
 from stable_baselines3 import DQN
 from stable_baselines3.common.env_util import make_vec_env
 from stable_baselines3.common.monitor import Monitor
+from stable_baselines3.common.vec_env import VecMonitor
 
 
 
 from src.envs.persecucion_env import PersecucionPygameEnv
+from src.envs.persecucion_vec_env import PersecucionVecEnv
 
 
-def entrenar_modelo_mejorado(modelo_path, timesteps=3000000, modo_ia="hibrido", velocidad_juego=240):
+def entrenar_modelo_mejorado(modelo_path, timesteps=3000000, modo_ia="hibrido", velocidad_juego=240,
+                             entorno_lote=False, num_entornos=8, num_enemigos=4, k_enemigos_obs=None,
+                             radio_raster=None, banco_escenarios=None):
 
     print("Iniciando entrenamiento con IA avanzada...")
 
@@ -19,11 +23,25 @@ def entrenar_modelo_mejorado(modelo_path, timesteps=3000000, modo_ia="hibrido",
             render_mode=None,
             modo_entrenamiento=True,
             modo_ia=modo_ia,
-            velocidad_juego=velocidad_juego
+            velocidad_juego=velocidad_juego,
+            num_enemigos=num_enemigos,
+            k_enemigos_obs=k_enemigos_obs,
+            radio_raster=radio_raster,
+            banco_escenarios=banco_escenarios
         )
         return Monitor(env)
 
-    env_vectorizado = make_vec_env(make_env, n_envs=8)
+    if entorno_lote:
+        # Todas las partidas avanzan en una sola llamada con arrays apilados; los enemigos usan el campo de
+        # flujo en lote, así que es un rival distinto salvo con `modo_ia="flujo"`.
+        if modo_ia != "flujo":
+            raise ValueError(f"El entorno en lote solo implementa la IA enemiga 'flujo' (modo_ia={modo_ia!r})")
+        print(f"Entorno en lote con {num_entornos} partidas (IA enemiga: flujo)")
+        env_vectorizado = VecMonitor(PersecucionVecEnv(num_entornos=num_entornos, num_enemigos=num_enemigos,
+                                                       k_enemigos_obs=k_enemigos_obs, radio_raster=radio_raster,
+                                                       banco_escenarios=banco_escenarios))
+    else:
+        env_vectorizado = make_vec_env(make_env, n_envs=num_entornos)
 
     if os.path.exists(modelo_path + ".zip"):
         print(f"Cargando modelo existente de {modelo_path}.zip")
@@ -31,7 +49,8 @@ def entrenar_modelo_mejorado(modelo_path, timesteps=3000000, modo_ia="hibrido",
     else:
         print("Creando modelo nuevo con parámetros optimizados")
         modelo = DQN(
-            "MlpPolicy",
+            # Con la ventana del grid la observación es un Dict (vector + imagen): política multi-entrada.
+            "MultiInputPolicy" if radio_raster is not None else "MlpPolicy",
             env_vectorizado,
             verbose=1,
             learning_rate=0.0003,
@@ -58,7 +77,8 @@ def entrenar_modelo_mejorado(modelo_path, timesteps=3000000, modo_ia="hibrido",
     return modelo
 
 
-def jugar_con_modelo_mejorado(modelo_path, modo_ia="hibrido"):
+def jugar_con_modelo_mejorado(modelo_path, modo_ia="hibrido", num_enemigos=4, k_enemigos_obs=None,
+                              radio_raster=None):
 
     print("Iniciando modo de juego avanzado...")
 
@@ -70,7 +90,11 @@ def jugar_con_modelo_mejorado(modelo_path, modo_ia="hibrido"):
     env_juego = PersecucionPygameEnv(
         render_mode="human",
         modo_entrenamiento=False,
-        modo_ia=modo_ia
+        modo_ia=modo_ia,
+        num_enemigos=num_enemigos,
+        # Un modelo entrenado con `k_enemigos_obs` sirve con cualquier `num_enemigos`.
+        k_enemigos_obs=k_enemigos_obs,
+        radio_raster=radio_raster
     )
 
     modelo = DQN.load(modelo_path)
@@ -96,6 +120,16 @@ def jugar_con_modelo_mejorado(modelo_path, modo_ia="hibrido"):
                     env_juego.cambiar_modo_ia("campo_potencial")
                 elif event.key == pygame.K_4:
                     env_juego.cambiar_modo_ia("genetico")
+                elif event.key == pygame.K_5:
+                    env_juego.cambiar_modo_ia("flujo")
+                elif event.key == pygame.K_6:
+                    env_juego.cambiar_modo_ia("incremental")
+                elif event.key == pygame.K_7:
+                    env_juego.cambiar_modo_ia("jerarquico")
+                elif event.key == pygame.K_8:
+                    env_juego.cambiar_modo_ia("visibilidad")
+                elif event.key == pygame.K_9:
+                    env_juego.cambiar_modo_ia("cooperativo")
 
         action, _states = modelo.predict(obs, deterministic=True)
         obs, reward, terminated, truncated, info = env_juego.step(action)